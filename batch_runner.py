@@ -0,0 +1,219 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from block_cache import DEFAULT_CACHE_PATH, BlockCache
+from daily_plan import (
+    TEMPLATE_PAGE_ID,
+    client_options,
+    compile_week_template,
+    generate_weeks,
+    load_template_blocks,
+    monday_of,
+)
+from instrumentation import ApiRecorder
+from page_index import PageIndex
+from rate_limit import attach_scheduler
+from render_cache import RenderCache
+from template_renderer import CompiledTemplate
+from tree_writer import map_in_context
+from write_journal import WriteJournal
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_WORKERS = 32  # 同時に処理するワークスペース数（待ちはほぼトークンごとのレート制限なのでスレッドで十分）
+APPEND_WORKERS = 2    # 1ワークスペース内の追記の並行数
+
+# Client ごとにハンドラを足されて警告が項目数分重複しないよう、全クライアントで1つのロガーを使う
+LOGGER = logging.getLogger("batch_runner")
+
+# =============================================================================
+# 設定ファイル
+# =============================================================================
+
+def load_batch_config(path: str) -> List[Dict[str, Any]]:
+    """
+    設定ファイル（JSON）を読む。形式:
+      {"workspaces": [{"name": "alice", "token_env": "NOTION_TOKEN_ALICE",
+                       "parent": "<親ページID>", "template": "<テンプレページID>"}, ...]}
+    token は直接書くか token_env で環境変数名を指定する。template 省略時は既定のテンプレ。
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    entries = raw["workspaces"] if isinstance(raw, dict) else raw
+
+    workspaces: List[Dict[str, Any]] = []
+    for i, e in enumerate(entries):
+        name = e.get("name") or f"#{i + 1}"
+        token = e.get("token") or (os.getenv(e["token_env"]) if e.get("token_env") else None)
+        if not token or not e.get("parent"):
+            raise RuntimeError(f"{name}: token（または token_env）と parent は必須です。")
+        workspaces.append({
+            "name": name,
+            "token": token,
+            "parent": e["parent"],
+            "template": e.get("template") or TEMPLATE_PAGE_ID,
+        })
+    return workspaces
+
+# =============================================================================
+# 実行
+# =============================================================================
+
+def _make_client(token: str) -> Tuple[Any, ApiRecorder, Any]:
+    from notion_client import Client
+
+    from http_pool import shared_pool
+
+    # 全ワークスペースのクライアントで1つの接続プールを共有する（認証ヘッダはクライアントごと）
+    notion = shared_pool().attach(Client(**client_options(token), logger=LOGGER))
+    recorder = ApiRecorder().attach(notion)
+    scheduler = attach_scheduler(notion)  # トークンごとのバケット（同じトークンの項目同士は共有）
+    return notion, recorder, scheduler
+
+def _fetch_template(
+    token: str, template_id: str, cache: BlockCache
+) -> Tuple[List[Dict[str, Any]], CompiledTemplate]:
+    notion, _, _ = _make_client(token)
+    blocks = load_template_blocks(notion, template_id, cache)
+    return blocks, compile_week_template(blocks)
+
+def _run_workspace(
+    ws: Dict[str, Any],
+    mondays: List[datetime],
+    template: Any,
+    cache: BlockCache,
+    index: PageIndex,
+    journal: WriteJournal,
+    render_cache: RenderCache,
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"name": ws["name"], "ok": False, "pages": 0, "api_calls": 0, "error": None}
+    recorder: Optional[ApiRecorder] = None
+    try:
+        if isinstance(template, Exception):
+            raise RuntimeError(f"テンプレ取得失敗: {template}")
+        notion, recorder, _ = _make_client(ws["token"])
+        blocks, compiled = template
+        page_ids = generate_weeks(
+            notion, ws["parent"], mondays, template_page_id=ws["template"],
+            cache=cache, index=index, max_workers=APPEND_WORKERS, journal=journal,
+            template_blocks=blocks, compiled=compiled, render_cache=render_cache,
+        )
+        result.update(ok=True, pages=len(page_ids))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_sec"] = round(time.perf_counter() - start, 3)
+    if recorder is not None:
+        result["api_calls"] = len(recorder.records)
+    return result
+
+def run_batch(
+    workspaces: List[Dict[str, Any]],
+    mondays: List[datetime],
+    cache_path: str = DEFAULT_CACHE_PATH,
+    max_workers: int = DEFAULT_WORKERS,
+) -> List[Dict[str, Any]]:
+    """
+    全ワークスペースの週次ページを並行して作成する。
+    同じテンプレを使う項目が複数あっても、テンプレの取得・コンパイルは1回だけ（最初の項目のトークンで取得）、
+    同じ週の展開も render_cache 経由で1回だけ。
+    1項目の失敗は他の項目に影響しない。戻り値: 項目ごとの結果
+    """
+    cache = BlockCache(cache_path)
+    index = PageIndex(cache_path)
+    journal = WriteJournal(cache_path)
+    render_cache = RenderCache()
+
+    first_token: Dict[str, str] = {}
+    for ws in workspaces:
+        first_token.setdefault(ws["template"], ws["token"])
+
+    def fetch(item: Tuple[str, str]) -> Any:
+        template_id, token = item
+        try:
+            return _fetch_template(token, template_id, cache)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        fetched = map_in_context(pool, fetch, list(first_token.items()))
+        templates = dict(zip(first_token, fetched))
+        return map_in_context(
+            pool,
+            lambda ws: _run_workspace(ws, mondays, templates[ws["template"]], cache, index, journal, render_cache),
+            workspaces,
+        )
+
+def batch_report(results: List[Dict[str, Any]], wall_sec: float) -> str:
+    """項目ごとの結果と、成功数・所要時間（中央値 / p95 / 最大）・API 回数の集計"""
+    header = f"{'workspace':<24} {'result':<6} {'pages':>5} {'calls':>6} {'time':>8}  error"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['name']:<24} {'OK' if r['ok'] else 'NG':<6} {r['pages']:>5} {r['api_calls']:>6}"
+            f" {r['elapsed_sec']:>7.2f}s  {r['error'] or ''}"
+        )
+    elapsed = sorted(r["elapsed_sec"] for r in results) or [0.0]
+    ok = sum(1 for r in results if r["ok"])
+    lines.append("-" * len(header))
+    lines.append(
+        f"📊 成功 {ok}/{len(results)} / ページ {sum(r['pages'] for r in results)}"
+        f" / API {sum(r['api_calls'] for r in results)}回"
+        f" / 1件あたり 中央値 {elapsed[len(elapsed) // 2]:.2f}s"
+        f" p95 {elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))]:.2f}s"
+        f" 最大 {elapsed[-1]:.2f}s / 全体 {wall_sec:.2f}s"
+    )
+    return "\n".join(lines)
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="複数ワークスペースの週次ページをまとめて作成する")
+    parser.add_argument("config", help="ワークスペース一覧（JSON）")
+    parser.add_argument(
+        "--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), default=None,
+        help="最初の週に含まれる日付 YYYY-MM-DD（既定: 今日）",
+    )
+    parser.add_argument("--weeks", type=int, default=1, help="作成する週数（既定: 1）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時に処理するワークスペース数")
+    parser.add_argument("--report", default=None, help="結果（JSON）の出力先")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from http_pool import shared_pool
+
+    args = parse_args(argv)
+    load_dotenv()
+    workspaces = load_batch_config(args.config)
+    first_mon = monday_of(args.start or datetime.today())
+    mondays = [first_mon + timedelta(weeks=w) for w in range(args.weeks)]
+
+    start = time.perf_counter()
+    results = run_batch(
+        workspaces, mondays,
+        cache_path=os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH), max_workers=args.workers,
+    )
+    wall = time.perf_counter() - start
+    print(batch_report(results, wall))
+    print(shared_pool().summary())
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"wall_sec": round(wall, 3), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"📝 結果を出力: {args.report}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fake_notion import FakeNotionServer, FakeNotionState, seed_parent, seed_template
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BETA_SCRIPT = os.path.join(ROOT, "test", "beta.py")
+BASELINE_PATH = os.path.join(ROOT, "bench_baseline.json")
+
+PARENT_SIZES = [10, 500, 5000]      # 親ページ直下の週次ページ数
+TEMPLATE_SIZES = [10, 100, 1000]    # テンプレの1日分ブロック数
+
+# 回帰とみなす閾値（API 回数は増えたら即 NG、バイト数は誤差を許容）
+BYTES_TOLERANCE = 0.02
+# 時間はマシン・負荷で大きく揺れるので NG にはせず、基準値の倍 + 0.5 秒を超えたら警告だけ出す
+WALL_TOLERANCE = 1.0
+WALL_SLACK_SEC = 0.5
+
+# =============================================================================
+# 計測対象のフロー
+# =============================================================================
+
+def run_daily_plan_flow(parent_id: str, template_id: str, monday: datetime) -> None:
+    """daily_plan.py の週次生成（前週検索 → Monthly TASK → テンプレ → 作成）"""
+    import daily_plan
+    from block_cache import BlockCache
+    from page_index import PageIndex
+    from rate_limit import attach_scheduler
+
+    notion, _ = daily_plan.init_client()
+    attach_scheduler(notion)
+    cache_path = os.environ["NOTION_CACHE_PATH"]
+    daily_plan.generate_weeks(
+        notion, parent_id, [monday], template_page_id=template_id,
+        cache=BlockCache(cache_path), index=PageIndex(cache_path),
+    )
+
+def run_beta_flow(parent_id: str, template_id: str, monday: datetime) -> None:
+    """test/beta.py（週次ページ + 月別トグル内の月次ページ + リンク）"""
+    runpy.run_path(BETA_SCRIPT)["main"]([])
+
+FLOWS: Dict[str, Callable[[str, str, datetime], None]] = {
+    "daily_plan": run_daily_plan_flow,
+    "beta": run_beta_flow,
+}
+
+# =============================================================================
+# 実行
+# =============================================================================
+
+@contextlib.contextmanager
+def scoped_env(values: Dict[str, str]) -> Iterator[None]:
+    """values を環境変数に設定し、抜けるときに元の値（無かったものは削除）へ戻す"""
+    saved = {k: os.environ.get(k) for k in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+def run_case(
+    flow: str,
+    weekly_pages: int,
+    template_blocks: int,
+    latency: float = 0.0,
+    rate_limit_every: int = 0,
+    connect_latency: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    合成ワークスペースを作り、1フローを代用サーバーに対して実行して計測する。
+    フローが読む環境変数はこのケースの間だけ設定する（次のケースや呼び出し元に残さない）
+    """
+    from daily_plan import monday_of
+
+    monday = monday_of(datetime.today()).replace(hour=0, minute=0, second=0, microsecond=0)
+    state = FakeNotionState()
+    parent_id = seed_parent(state, weekly_pages, monday)
+    template_id = seed_template(state, template_blocks)
+
+    with FakeNotionServer(
+        state, latency=latency, rate_limit_every=rate_limit_every, connect_latency=connect_latency
+    ) as server, \
+            tempfile.TemporaryDirectory() as tmp, \
+            scoped_env({
+                "NOTION_TOKEN": "bench-token",
+                "NOTION_BASE_URL": server.url,
+                "PARENT_PAGE_ID": parent_id,
+                "TEMPLATE_PAGE_ID": template_id,
+                "NOTION_CACHE_PATH": os.path.join(tmp, "cache.sqlite"),
+                "NOTION_RATE_LIMIT": os.environ.get("NOTION_RATE_LIMIT", "1000"),
+            }):
+        server.reset_stats()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            FLOWS[flow](parent_id, template_id, monday)
+        wall = time.perf_counter() - start
+        stats = dict(server.stats)
+
+    return {
+        "flow": flow,
+        "weekly_pages": weekly_pages,
+        "template_blocks": template_blocks,
+        "api_calls": stats["requests"],
+        "bytes_sent": stats["bytes_received"],
+        "connections": stats["connections"],
+        "wall_sec": round(wall, 3),
+        "calls": stats["calls"],
+    }
+
+def case_key(result: Dict[str, Any]) -> str:
+    return f"{result['flow']}/pages={result['weekly_pages']}/template={result['template_blocks']}"
+
+def find_regressions(result: Dict[str, Any], base: Dict[str, Any]) -> List[str]:
+    """NG にする回帰（API 回数・送信バイト数。どちらも実行環境によらず決まる）"""
+    problems = []
+    if result["api_calls"] > base["api_calls"]:
+        problems.append(f"API回数 {base['api_calls']} → {result['api_calls']}")
+    if result["bytes_sent"] > base["bytes_sent"] * (1 + BYTES_TOLERANCE):
+        problems.append(f"送信バイト {base['bytes_sent']} → {result['bytes_sent']}")
+    return problems
+
+def wall_warning(result: Dict[str, Any], base: Dict[str, Any]) -> Optional[str]:
+    """時間が基準値から大きく外れたときの警告（NG にはしない）"""
+    if result["wall_sec"] > base["wall_sec"] * (1 + WALL_TOLERANCE) + WALL_SLACK_SEC:
+        return f"時間 {base['wall_sec']:.2f}s → {result['wall_sec']:.2f}s"
+    return None
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ローカル代用サーバーでページ生成フローを計測する")
+    parser.add_argument("--flows", nargs="+", default=list(FLOWS), choices=list(FLOWS))
+    parser.add_argument("--parents", nargs="+", type=int, default=PARENT_SIZES)
+    parser.add_argument("--templates", nargs="+", type=int, default=TEMPLATE_SIZES)
+    parser.add_argument("--latency", type=float, default=0.0, help="1リクエストあたりの遅延（秒）")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="N 回に1回 429 を返す")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="新規接続1本あたりの遅延（秒）")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="今回の結果で基準値を書き換える")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = []
+    failed = False
+    print(f"{'case':<42} {'calls':>6} {'bytes':>10} {'conns':>6} {'wall':>8}")
+    for flow in args.flows:
+        for pages in args.parents:
+            for blocks in args.templates:
+                r = run_case(flow, pages, blocks, args.latency, args.rate_limit_every, args.connect_latency)
+                results.append(r)
+                key = case_key(r)
+                line = (
+                    f"{key:<42} {r['api_calls']:>6} {r['bytes_sent']:>10} {r['connections']:>6}"
+                    f" {r['wall_sec']:>7.2f}s"
+                )
+                # 遅延・429 注入時は基準値と条件が違うので比較しない
+                if key in baseline and not (args.latency or args.rate_limit_every or args.connect_latency):
+                    problems = find_regressions(r, baseline[key])
+                    if problems:
+                        failed = True
+                        line += "  ❌ " + " / ".join(problems)
+                    warning = wall_warning(r, baseline[key])
+                    if warning:
+                        line += "  ⚠️ " + warning
+                print(line)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({case_key(r): r for r in results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"📝 基準値を更新: {args.baseline}")
+        return 0
+
+    if failed:
+        print("❌ 回帰あり")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_CACHE_PATH = ".notion_cache.sqlite"  # 実行ディレクトリ直下に作るローカルキャッシュ
+
+# =============================================================================
+# ブロックツリーのローカルキャッシュ
+# =============================================================================
+
+class BlockCache:
+    """
+    ブロックID → 子ブロック一覧 を SQLite に保存するローカルキャッシュ。
+    子ブロック一覧と一緒に取得時点の last_edited_time を持ち、
+    呼び出し側は blocks.retrieve の結果と比較して再取得の要否を判断する。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS block_children ("
+                " block_id TEXT PRIMARY KEY,"
+                " last_edited_time TEXT NOT NULL,"
+                " children TEXT NOT NULL)"
+            )
+
+    def get(self, block_id: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """(last_edited_time, 子ブロック一覧) を返す。未登録なら None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_edited_time, children FROM block_children WHERE block_id = ?",
+                (block_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, block_id: str, last_edited_time: str, children: List[Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO block_children (block_id, last_edited_time, children)"
+                " VALUES (?, ?, ?)",
+                (block_id, last_edited_time, json.dumps(children, ensure_ascii=False)),
+            )
+
+    def invalidate(self, block_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM block_children WHERE block_id = ?", (block_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,32 +1,80 @@
+from __future__ import annotations
+
+import argparse
 import os
 import copy
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
-
-from notion_client import Client
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from block_cache import DEFAULT_CACHE_PATH, BlockCache
+from instrumentation import ApiRecorder, traced_step
+from page_index import PageIndex, child_page_entries
+from rate_limit import attach_scheduler
+from render_cache import RenderCache
+from template_renderer import CompiledTemplate, compile_template
+from tree_writer import (
+    append_tree,
+    fetch_block_tree,
+    iter_request_batches,
+    map_in_context,
+    prefetch,
+    resolve_created_ids,
+    split_for_request,
+    write_deferred,
+)
+from week_database import WeekDatabase, week_properties
+from write_journal import WriteJournal, week_run_key
+
+if TYPE_CHECKING:
+    # notion_client（httpx ごと）の import は重いので、実際に Client を作るときまで遅らせる
+    from notion_client import Client
 
 # =============================================================================
 # 設定 / 定数
 # =============================================================================
 
 MONTHLY_TASK_TITLE = "Monthly TASK"
-REPLACE_TEXT = "XXXX"  # テンプレート中の置換対象
+REPLACE_TEXT = "XXXX"  # テンプレート中の置換対象（mmdd）
+WEEKDAYS_JA = "月火水木金土日"  # {{曜日}} の置換値
 TEMPLATE_PAGE_ID = "235337f925e580578bc8c08d97a868b0"  # 既存のテンプレページ（ブロックの束）
-PAGE_SIZE = 100  # Notion APIの1回あたりの上限
+PAGE_SIZE = 100  # 一覧取得1回あたりの上限
+SAME_WEEK_WINDOW_DAYS = 180  # 同名ページを「その週のもの」とみなす作成日時の範囲
+ANCHORS_STEP = "anchors:"  # アンカー方式の追記で置いたアンカーのID（ジャーナルのステップ名に埋め込む）
+ANCHOR_BATCH_SCOPE = "anchor/"  # アンカーを置くリクエストごとの記録（tree_writer._append_level の scope）
 
 # =============================================================================
 # 初期化
 # =============================================================================
 
+def client_options(token: Optional[str]) -> Dict[str, Any]:
+    """
+    Client に渡すオプション。NOTION_BASE_URL があればそちらへ向ける（ローカルの代用サーバー等）。
+    notion_client 内蔵の再送（429 / 5xx）は切る。内蔵の再送は notion.request の内側で起きるため、
+    RequestScheduler（バケット・Retry-After・レート半減）と ApiRecorder を素通りしてしまう。
+    再送はスケジューラだけが行い、1回ずつ記録される。
+    """
+    options: Dict[str, Any] = {"auth": token, "retry": False}
+    base_url = os.getenv("NOTION_BASE_URL")
+    if base_url:
+        options["base_url"] = base_url
+    return options
+
 def init_client() -> Tuple[Client, str]:
+    from dotenv import load_dotenv
+    from notion_client import Client
+
+    from http_pool import shared_pool
+
     load_dotenv()
     token = os.getenv("NOTION_TOKEN")
     parent_id = os.getenv("PARENT_PAGE_ID")
     if not token or not parent_id:
         raise RuntimeError("NOTION_TOKEN / PARENT_PAGE_ID が .env に未設定です。")
 
-    return Client(auth=token), parent_id
+    # 接続はプロセス内で1つの keep-alive プール（HTTP/2・gzip）を共有する
+    return shared_pool().attach(Client(**client_options(token))), parent_id
 
 # =============================================================================
 # 日付ユーティリティ
@@ -48,8 +96,33 @@ def week_title_and_range(base_date: datetime) -> Tuple[str, datetime, datetime]:
 # Notion API ヘルパー（ページネーション/サニタイズ）
 # =============================================================================
 
-def paginate_children(notion: Client, block_id: str) -> List[Dict[str, Any]]:
-    """任意のブロック配下の全子ブロックを取得（ページネーション対応）"""
+def paginate_children(
+    notion: Client,
+    block_id: str,
+    cache: Optional[BlockCache] = None,
+    version: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    任意のブロック配下の全子ブロックを取得（ページネーション対応）。
+    cache を渡すと blocks.retrieve 1回で last_edited_time を確認し、
+    変化が無ければキャッシュを返す。version を渡した場合はそれを検証に使う
+    （トグル配下など、自身の last_edited_time が子の編集で変わらないブロック向け）。
+    ※ last_edited_time は分単位のため、同じ分の中の編集は検知できない。
+    """
+    if cache is None:
+        return _list_all_children(notion, block_id)
+
+    if version is None:
+        version = notion.blocks.retrieve(block_id=block_id)["last_edited_time"]
+    cached = cache.get(block_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    results = _list_all_children(notion, block_id)
+    cache.put(block_id, version, results)
+    return results
+
+def _list_all_children(notion: Client, block_id: str) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
     cursor: Optional[str] = None
     while True:
@@ -101,28 +174,72 @@ def sanitize_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 # ページ/ブロック取得・生成ロジック
 # =============================================================================
 
-def find_child_page_by_title(notion: Client, parent_id: str, title: str) -> Optional[str]:
-    """親ページ直下の child_page を走査して一致タイトルのページIDを返す"""
+@traced_step
+def find_child_page_by_title(
+    notion: Client,
+    parent_id: str,
+    title: str,
+    cache: Optional[BlockCache] = None,
+    index: Optional[PageIndex] = None,
+) -> Optional[str]:
+    """
+    親ページ直下の child_page を走査して一致タイトルのページIDを返す。
+    index を渡すとまずインデックスを引き、未登録のときだけ全走査してインデックスを作り直す。
+    インデックスで見つかったページは取得して確かめ、消えている（ゴミ箱・削除済み・別の親へ移動）なら
+    未登録と同じく全走査する（このプロセスで走査し直した直後のインデックスは確かめない）。
+    未登録のときは親ページの版（container_version）を取り、前回の走査・作成から変わっていなければ
+    走査せずに「無い」と答える（毎週の実行で作成前の週が未登録なのは当然なので、その度に全走査しない）。
+    """
+    version: Optional[str] = None
+    if index is not None:
+        page_id = index.get(parent_id, title)
+        if page_id and (index.rescanned(parent_id) or not page_gone(notion, page_id, parent_id)):
+            return page_id
+        if not page_id and index.rescanned(parent_id):
+            return None
+        version = container_version(notion, parent_id)
+        if not page_id and index.is_current(parent_id, version):
+            return None
+
     # 親ページの直下ブロック（child_page）をページネートで探索
-    children = []
-    cursor = None
-    while True:
-        resp = notion.blocks.children.list(
-            block_id=parent_id, page_size=PAGE_SIZE, start_cursor=cursor
-        )
-        children.extend(resp.get("results", []))
-        cursor = resp.get("next_cursor")
-        if not resp.get("has_more"):
-            break
+    children = paginate_children(notion, parent_id, cache, version)
+    if index is not None:
+        index.replace(parent_id, child_page_entries(children), version)
+    return latest_child_page(children, title)
+
+def container_version(notion: Client, container_id: str) -> str:
+    """親ページの版（last_edited_time。子ページの追加・移動・削除で変わる）"""
+    return notion.blocks.retrieve(block_id=container_id)["last_edited_time"]
 
-    for block in children:
+def page_gone(notion: Client, page_id: str, parent_id: Optional[str] = None) -> bool:
+    """
+    ページが完全に削除済み・共有が外れた（404）、またはゴミ箱 / アーカイブ済みなら True。
+    parent_id を渡すと、その直下に無い（別の親へ移動済み）ときも True。
+    """
+    try:
+        page = notion.pages.retrieve(page_id=page_id)
+    except Exception as e:
+        if getattr(e, "status", 0) == 404:
+            return True
+        raise
+    if page.get("in_trash") or page.get("archived"):
+        return True
+    if parent_id is not None:
+        current = (page.get("parent") or {}).get("page_id") or ""
+        return current.replace("-", "") != parent_id.replace("-", "")
+    return False
+
+def latest_child_page(children: List[Dict[str, Any]], title: str) -> Optional[str]:
+    """タイトルに年が無いので、同名が複数あれば最新（末尾側）を返す"""
+    for block in reversed(children):
         if block.get("type") == "child_page":
             if block["child_page"].get("title") == title:
                 return block["id"]
     return None
 
+@traced_step
 def build_monthly_task_toggle_from_last_week(
-    notion: Client, last_page_id: Optional[str]
+    notion: Client, last_page_id: Optional[str], cache: Optional[BlockCache] = None
 ) -> Dict[str, Any]:
     """
     前週ページから Monthly TASK トグルを見つけ、中身を複製して返す。
@@ -131,144 +248,575 @@ def build_monthly_task_toggle_from_last_week(
     if not last_page_id:
         return empty_monthly_task_toggle()
 
-    blocks = paginate_children(notion, last_page_id)
+    # トグル自身の last_edited_time は子の編集で変わらないため、ページ側で検証する
+    page_version = None
+    if cache is not None:
+        page_version = notion.blocks.retrieve(block_id=last_page_id)["last_edited_time"]
+    blocks = paginate_children(notion, last_page_id, cache, version=page_version)
+
+    blk = find_monthly_task_toggle(blocks)
+    if blk is not None:
+        # このトグルの子孫を全階層取得し、サニタイズして貼り付け準備
+        toggle_id = blk["id"]
+        children = fetch_block_tree(
+            lambda bid: paginate_children(notion, bid, cache, version=page_version), toggle_id
+        )
+        return monthly_task_toggle(sanitize_blocks(children))
 
+    # 見つからなかった場合は空
+    return empty_monthly_task_toggle()
+
+def find_monthly_task_toggle(blocks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     for blk in blocks:
         if blk["type"] != "toggle":
             continue
         rich_text = blk["toggle"].get("rich_text", [])
         title_texts = [rt.get("text", {}).get("content", "").strip() for rt in rich_text if rt.get("type") == "text"]
         if any(t == MONTHLY_TASK_TITLE for t in title_texts):
-            # このトグルの子を取得し、サニタイズして貼り付け準備
-            toggle_id = blk["id"]
-            children = paginate_children(notion, toggle_id)
-            copied_children = sanitize_blocks(children)
-
-            return {
-                "type": "toggle",
-                "toggle": {
-                    "rich_text": [{"type": "text", "text": {"content": MONTHLY_TASK_TITLE}}],
-                    "children": copied_children
-                }
-            }
-
-    # 見つからなかった場合は空
-    return empty_monthly_task_toggle()
+            return blk
+    return None
 
-def empty_monthly_task_toggle() -> Dict[str, Any]:
+def monthly_task_toggle(children: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
         "type": "toggle",
         "toggle": {
             "rich_text": [{"type": "text", "text": {"content": MONTHLY_TASK_TITLE}}],
-            "children": []
+            "children": children
         }
     }
 
-def load_template_blocks(notion: Client, template_page_id: str) -> List[Dict[str, Any]]:
+def empty_monthly_task_toggle() -> Dict[str, Any]:
+    return monthly_task_toggle([])
+
+# =============================================================================
+# Monthly TASK（同期ブロック方式）
+# =============================================================================
+# 月ごとに元の synced_block を1つだけ持ち（その月の最初の週次ページの Monthly TASK 内）、
+# 同じ月の以降の週は参照の synced_block 1ブロックだけを入れる。
+# 中身の取得・再アップロードは月替わりの1回だけで、どの週から編集しても同じリストになる。
+
+def synced_block_source(block: Dict[str, Any]) -> Optional[str]:
+    """synced_block の元ブロックID（元ならそれ自身、参照なら synced_from の ID）。synced_block でなければ None"""
+    if block.get("type") != "synced_block":
+        return None
+    synced_from = (block.get("synced_block") or {}).get("synced_from")
+    return synced_from["block_id"] if synced_from else block["id"]
+
+def drop_completed(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """チェック済みの to_do を（子孫ごと）除く"""
+    kept: List[Dict[str, Any]] = []
+    for blk in blocks:
+        btype = blk["type"]
+        if btype == "to_do" and blk["to_do"].get("checked"):
+            continue
+        obj = blk.get(btype)
+        if isinstance(obj, dict) and obj.get("children"):
+            blk = dict(blk, **{btype: dict(obj, children=drop_completed(obj["children"]))})
+        kept.append(blk)
+    return kept
+
+@traced_step
+def build_synced_monthly_task_toggle(
+    notion: Client,
+    last_page_id: Optional[str],
+    last_monday: Optional[datetime],
+    monday: datetime,
+    cache: Optional[BlockCache] = None,
+) -> Dict[str, Any]:
+    """
+    同期ブロック方式の Monthly TASK トグルを返す（月は週の月曜で判定）。
+    前週と同じ月で、前週の Monthly TASK に synced_block があれば、その元を参照する1ブロックだけ
+    （前週ページとトグルの一覧取得のみで、リストの大きさに関係なく一定）。
+    月が替わった・前週がコピー方式だった場合は、前週の中身（synced_block なら元の中身）から
+    新しい元の synced_block を作る。月替わりでは完了済みの to_do を除き、未完了だけを持ち越す。
+    """
+    if not last_page_id:
+        return monthly_task_toggle([_synced_original([])])
+
+    page_version = None
+    if cache is not None:
+        page_version = notion.blocks.retrieve(block_id=last_page_id)["last_edited_time"]
+    toggle = find_monthly_task_toggle(paginate_children(notion, last_page_id, cache, version=page_version))
+    if toggle is None:
+        return monthly_task_toggle([_synced_original([])])
+    inner = paginate_children(notion, toggle["id"], cache, version=page_version) if toggle.get("has_children") else []
+    original_id = next((synced_block_source(b) for b in inner if b.get("type") == "synced_block"), None)
+
+    same_month = last_monday is not None and last_monday.strftime("%Y-%m") == monday.strftime("%Y-%m")
+    if original_id and same_month:
+        return monthly_task_toggle([
+            {"type": "synced_block", "synced_block": {"synced_from": {"type": "block_id", "block_id": original_id}}}
+        ])
+
+    if original_id:
+        # 元は別のページにありうるので、前週ページの版ではキャッシュを検証できない（月替わりの1回だけ直接取得）
+        items = fetch_block_tree(lambda bid: paginate_children(notion, bid), original_id)
+    else:
+        items = fetch_block_tree(lambda bid: paginate_children(notion, bid, cache, version=page_version), toggle["id"])
+    items = sanitize_blocks(items)
+    if not same_month:
+        items = drop_completed(items)
+    return monthly_task_toggle([_synced_original(items)])
+
+def _synced_original(children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"type": "synced_block", "synced_block": {"synced_from": None, "children": children}}
+
+@traced_step
+def load_template_blocks(
+    notion: Client, template_page_id: str, cache: Optional[BlockCache] = None
+) -> List[Dict[str, Any]]:
     """テンプレページ直下のブロック群をフル取得（ページネーション対応＆サニタイズ）"""
-    raw = paginate_children(notion, template_page_id)
+    raw = paginate_children(notion, template_page_id, cache)
     return sanitize_blocks(raw)
 
+def placeholder_values(day: datetime) -> Dict[str, str]:
+    """1日分のプレースホルダー置換値"""
+    iso_year, iso_week, _ = day.isocalendar()
+    return {
+        REPLACE_TEXT: format_mmdd(day),
+        "{{date}}": day.strftime("%Y-%m-%d"),
+        "{{曜日}}": WEEKDAYS_JA[day.weekday()],
+        "{{weekday}}": day.strftime("%a"),
+        "{{isoweek}}": f"{iso_year}-W{iso_week:02d}",
+    }
+
+def compile_week_template(template_blocks: List[Dict[str, Any]]) -> CompiledTemplate:
+    """テンプレを一度だけ走査してプレースホルダー位置を記録する（複数週で使い回せる）"""
+    return compile_template(template_blocks, placeholder_values(datetime.today()).keys())
+
 def materialize_week_blocks_from_template(
     template_blocks: List[Dict[str, Any]],
-    week_monday: datetime
+    week_monday: datetime,
+    compiled: Optional[CompiledTemplate] = None,
 ) -> List[Dict[str, Any]]:
     """
     テンプレブロック群を 7 日分に展開。
-    各ブロックの rich_text 内の REPLACE_TEXT を mmdd で置換した複製を作る。
+    各ブロックの rich_text（子孫ブロック含む）のプレースホルダーを置換する。
+    置換の無い部分木は日をまたいで共有されるので、戻り値は書き換えないこと。
     """
-    all_blocks: List[Dict[str, Any]] = []
-    for i in range(7):
-        day = week_monday + timedelta(days=i)
-        day_str = format_mmdd(day)
-
-        for src in template_blocks:
-            blk = copy.deepcopy(src)
-            btype = blk["type"]
-            obj = blk[btype]
-
-            # 代表的なtext系プロパティ（paragraph, heading_x, to_do, toggle, callout, quote, etc.）
-            if "rich_text" in obj:
-                for rt in obj["rich_text"]:
-                    if rt.get("type") == "text":
-                        rt["text"]["content"] = rt["text"]["content"].replace(REPLACE_TEXT, day_str)
+    if compiled is None:
+        compiled = compile_week_template(template_blocks)
+    return list(iter_week_blocks(compiled, week_monday))
 
-            # 子を持つテンプレ（例：toggleやcallout内にchildren）も同様に置換（浅い階層に限定）
-            if "children" in obj:
-                for child in obj["children"]:
-                    ctype = child.get("type")
-                    if ctype and ctype in child and "rich_text" in child[ctype]:
-                        for rt in child[ctype]["rich_text"]:
-                            if rt.get("type") == "text":
-                                rt["text"]["content"] = rt["text"]["content"].replace(REPLACE_TEXT, day_str)
-
-            all_blocks.append(blk)
+def iter_week_blocks(compiled: CompiledTemplate, week_monday: datetime) -> Iterator[Dict[str, Any]]:
+    """materialize_week_blocks_from_template の遅延版。1日ずつ展開しながら返す（週全体をリストにしない）"""
+    for i in range(7):
+        yield from compiled.render(placeholder_values(week_monday + timedelta(days=i)))
 
-    return all_blocks
+def cached_week_blocks(
+    template_blocks: List[Dict[str, Any]],
+    week_monday: datetime,
+    compiled: Optional[CompiledTemplate] = None,
+    render_cache: Optional[RenderCache] = None,
+    digest: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    materialize_week_blocks_from_template と同じ結果を、render_cache にあればそこから返す
+    （無ければ展開して保存する）。digest はテンプレのハッシュ（省略時は render_cache.digest で求める）。
+    """
+    if render_cache is None:
+        return materialize_week_blocks_from_template(template_blocks, week_monday, compiled)
+    if digest is None:
+        digest = render_cache.digest(template_blocks)
+    week = week_monday.strftime("%Y-%m-%d")
+    blocks = render_cache.get(digest, week)
+    if blocks is None:
+        blocks = materialize_week_blocks_from_template(template_blocks, week_monday, compiled)
+        render_cache.put(digest, week, blocks)
+    return blocks
+
+def stream_week_blocks(
+    template_blocks: List[Dict[str, Any]],
+    week_monday: datetime,
+    compiled: Optional[CompiledTemplate] = None,
+    render_cache: Optional[RenderCache] = None,
+    digest: Optional[str] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    送信用に1週間分のブロックを返す。ディスク付きの render_cache なら RenderCache.stream で1ブロックずつ読み書きし、
+    メモリだけの render_cache なら cached_week_blocks、無ければ iter_week_blocks（どちらも週全体を持たない経路を優先）
+    """
+    if render_cache is None:
+        return iter_week_blocks(compiled or compile_week_template(template_blocks), week_monday)
+    if render_cache.path is None:
+        return cached_week_blocks(template_blocks, week_monday, compiled, render_cache, digest)
+    if compiled is None:
+        compiled = compile_week_template(template_blocks)
+    if digest is None:
+        digest = render_cache.digest(template_blocks)
+    return render_cache.stream(
+        digest, week_monday.strftime("%Y-%m-%d"), lambda: iter_week_blocks(compiled, week_monday)
+    )
 
+@traced_step
 def create_week_page(
     notion: Client,
     parent_page_id: str,
     title: str,
     monthly_task_toggle: Dict[str, Any],
-    content_blocks: List[Dict[str, Any]],
+    content_blocks: Iterable[Dict[str, Any]],
+    journal: Optional[WriteJournal] = None,
+    append_workers: int = 1,
+    monday: Optional[datetime] = None,
 ) -> str:
     """
-    週次ページを作成し、ブロックを 100件単位で分割して追加。
+    週次ページを作成し、ブロックをリクエスト上限に収まる単位で分割して追加。
     先頭に Monthly TASK トグルを配置。
+    journal を渡すと、途中で失敗した前回の実行を作成済みページ・未完了チャンクから再開する
+    （ジャーナルのキーに週の月曜 monday が必要）。
+    append_workers > 1 なら残りはアンカー方式で並行に追記する（append_week_blocks）。
     戻り値: 作成ページID
     """
-    first_batch = [monthly_task_toggle] + content_blocks[: (PAGE_SIZE - 1)]
-    resp = notion.pages.create(
-        parent={"page_id": parent_page_id},
-        properties={"title": [{"type": "text", "text": {"content": title}}]},
-        children=first_batch,
+    page_id, remaining = start_week_page(
+        notion, parent_page_id, title, monthly_task_toggle, content_blocks, journal, monday=monday
     )
-    page_id = resp["id"]
-    print(f"✅ 今週ページ作成 → {resp['url']}")
+    append_week_blocks(notion, page_id, remaining, journal, append_workers)
+    return page_id
 
-    # 以降の追記
-    remaining = content_blocks[(PAGE_SIZE - 1):]
-    for i in range(0, len(remaining), PAGE_SIZE):
-        chunk = remaining[i : i + PAGE_SIZE]
-        notion.blocks.children.append(block_id=page_id, children=chunk)
-        print(f"🔧 追記: ブロック {i+1}〜{i+len(chunk)}")
+@traced_step
+def start_week_page(
+    notion: Client,
+    parent_page_id: str,
+    title: str,
+    monthly_task_toggle: Dict[str, Any],
+    content_blocks: Iterable[Dict[str, Any]],
+    journal: Optional[WriteJournal] = None,
+    parent: Optional[Dict[str, Any]] = None,
+    properties: Optional[Dict[str, Any]] = None,
+    monday: Optional[datetime] = None,
+) -> Tuple[str, Iterator[List[Dict[str, Any]]]]:
+    """
+    先頭バッチ付きでページだけ作成する（ジャーナルに未完了の作成済みページがあれば作成しない）。
+    ジャーナルは週の月曜 monday をキーにする（同じタイトルの別の年の週と混ざらないように）。
+    完了済みの実行は再開しない（同じ週を作り直すときは新しいページを作る）。
+    API の入れ子上限を超える部分木（深い Monthly TASK など）は外して作成し、作成後に追記する。
+    parent / properties を渡すとそちらで作成する（データベースに作る場合など。
+    parent_page_id はジャーナルのキーにだけ使う）。
+    content_blocks は遅延生成でもよく、ここでは先頭バッチの分だけ読む。
+    戻り値: (作成ページID, 残りのブロックをリクエスト単位に分けたもの（遅延評価）)
+    """
+    # 作成リクエストに載るのはサイズ・件数の上限まで。残りは追記に回す
+    batches = iter_request_batches(itertools.chain([monthly_task_toggle], content_blocks))
+    payload, deferred = split_for_request(next(batches))
+    if journal is not None and monday is None:
+        raise ValueError("journal を使うときは週の月曜 monday が必要です")
+    run_key = week_run_key(parent_page_id, monday) if journal is not None else ""
+    page_id = None
+    if journal is not None and not journal.is_complete(run_key):
+        page_id = journal.page_id(run_key)
+    if page_id:
+        print(f"↩️ {title} は作成済みページから再開")
+    else:
+        resp = notion.pages.create(
+            parent=parent or {"page_id": parent_page_id},
+            properties=properties or {"title": [{"type": "text", "text": {"content": title}}]},
+            children=payload,
+        )
+        page_id = resp["id"]
+        if journal is not None:
+            journal.record_page(run_key, page_id)
+        print(f"✅ {title} ページ作成 → {resp['url']}")
+
+    if deferred and not (journal is not None and journal.is_done(page_id, "first_batch")):
+        ids = resolve_created_ids(notion, page_id, deferred[-1][0] + 1)
+        write_deferred(notion, [(ids[i], children) for i, children in deferred], journal=journal)
+    if journal is not None:
+        journal.mark_done(page_id, "first_batch")
+    return page_id, batches
+
+@traced_step
+def append_week_blocks(
+    notion: Client,
+    page_id: str,
+    remaining: Iterable[List[Dict[str, Any]]],
+    journal: Optional[WriteJournal] = None,
+    workers: int = 1,
+) -> None:
+    """
+    start_week_page が返した残りのチャンク（リクエスト上限いっぱいのブロック列）を順に追記
+    （深い部分木は階層ごとに追記）。
+    次のチャンクの展開・詰め込みは別スレッドで先読みし、送信待ちの間に進める（先読みは PREFETCH_DEPTH 件まで）。
+    journal があれば完了済みチャンクを飛ばし、全チャンク完了でページを完了扱いにする。
+    チャンク分割は内容から決まるため、同じ内容での再実行では同じチャンク番号になる。
+    workers > 1 なら _append_anchored で並行に追記する。途中で止まったページは前回と同じ方式で再開する。
+    """
+    resumed_anchored = journal is not None and bool(
+        journal.done_steps(page_id, ANCHORS_STEP) or journal.done_steps(page_id, ANCHOR_BATCH_SCOPE)
+    )
+    resumed_serial = journal is not None and bool(journal.done_steps(page_id, "chunk:"))
+    if resumed_anchored or (workers > 1 and not resumed_serial):
+        _append_anchored(notion, page_id, list(remaining), journal, max(workers, 2))
+        if journal is not None:
+            journal.complete_page(page_id)
+        return
+
+    end = 0
+    for n, chunk in enumerate(prefetch(remaining)):
+        step = f"chunk:{n}"
+        start, end = end, end + len(chunk)
+        if journal is not None and journal.is_done(page_id, step):
+            continue
+        append_tree(notion, page_id, chunk, journal=journal, scope=step + "/")
+        if journal is not None:
+            journal.mark_done(page_id, step)
+        print(f"🔧 追記: ブロック {start+1}〜{end}")
+    if journal is not None:
+        journal.complete_page(page_id)
+
+def _append_anchored(
+    notion: Client,
+    page_id: str,
+    chunks: List[List[Dict[str, Any]]],
+    journal: Optional[WriteJournal],
+    workers: int,
+) -> None:
+    """
+    各チャンクの先頭ブロックを「アンカー」として先にまとめて追記し（通常1リクエスト）、
+    チャンクの残りを after=そのチャンクのアンカー で並行に追記する。
+    アンカーは順に並び、各チャンクの残りは自分のアンカーの直後に入るため、最終的な並びは順に追記した場合と同じ。
+    リクエストはアンカーの分だけ増えるが、追記の待ち時間はおおむね 1/workers になる。
+    アンカーを置くため残りのチャンクは全部展開してから送る（先読みはしない）。
+    """
+    if not chunks:
+        return
+    recorded = journal.done_steps(page_id, ANCHORS_STEP) if journal is not None else []
+    if recorded:
+        anchor_ids = recorded[0][len(ANCHORS_STEP):].split(",")
+    else:
+        anchor_ids = append_tree(notion, page_id, [chunk[0] for chunk in chunks], journal=journal, scope=ANCHOR_BATCH_SCOPE)
+        if journal is not None:
+            journal.mark_done(page_id, ANCHORS_STEP + ",".join(anchor_ids))  # 全アンカーを1行で記録
+        print(f"⚓ アンカー {len(anchor_ids)} 件を配置")
+
+    def fill(n: int) -> None:
+        step = f"anchored:{n}"
+        if len(chunks[n]) == 1 or (journal is not None and journal.is_done(page_id, step)):
+            return
+        append_tree(notion, page_id, chunks[n][1:], after=anchor_ids[n], journal=journal, scope=step + "/")
+        if journal is not None:
+            journal.mark_done(page_id, step)
+        print(f"🔧 追記: チャンク {n+1}/{len(chunks)}（{len(chunks[n])} ブロック）")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        map_in_context(pool, fill, range(len(chunks)))
 
-    return page_id
+# =============================================================================
+# 複数週の一括生成（先行作成 / 取りこぼしの埋め戻し）
+# =============================================================================
+
+def generate_weeks(
+    notion: Client,
+    parent_id: str,
+    mondays: List[datetime],
+    template_page_id: str = TEMPLATE_PAGE_ID,
+    cache: Optional[BlockCache] = None,
+    index: Optional[PageIndex] = None,
+    max_workers: int = 4,
+    journal: Optional[WriteJournal] = None,
+    template_blocks: Optional[List[Dict[str, Any]]] = None,
+    compiled: Optional[CompiledTemplate] = None,
+    database: Optional[WeekDatabase] = None,
+    render_cache: Optional[RenderCache] = None,
+    synced_monthly: bool = False,
+    append_workers: int = 1,
+) -> Dict[str, str]:
+    """
+    指定した各週（月曜の日付）のページをまとめて作成する。
+    テンプレ取得・コンパイルと親ページのインデックス化は1回だけ行い、
+    （template_blocks / compiled を渡せば取得・コンパイル済みのものを使う）
+    Monthly TASK は週の順に引き継ぐ（既存ページがあればそれ以降はその中身を引き継ぐ）。
+    ページ作成は親ページ内の並びが日付順になるよう順番に行い、残りブロックの追記を並行実行する。
+    テンプレ・前週ページ・引き継ぐ Monthly TASK は、作成する週があって実際に使うときだけ取得する
+    （全週が作成済みの再実行では既存ページの確認だけで終わる）。
+    journal があれば、前回途中で止まった週は作成済みページの未完了チャンクから再開する。
+    database を渡すと週次ページはそのデータベースに作り、前週・既存週は週キーの絞り込み1回で探す
+    （親ページの走査や年の判定が要らない）。
+    各週のブロックは送信に合わせて1日ずつ展開する（週全体を一度に持たない）。
+    render_cache を渡すと、テンプレ内容と週が同じなら展開済みのブロックを使い回す（stream_week_blocks）。
+    synced_monthly なら Monthly TASK は同期ブロック方式（build_synced_monthly_task_toggle）で、
+    各週の直前の週のページ（既存・今回作成のどちらでも）から作る。
+    append_workers > 1 なら各ページの残りブロックもアンカー方式で並行に追記する（append_week_blocks）。
+    戻り値: {タイトル: ページID}（既存でスキップした週も含む）
+    """
+    mondays = sorted({monday_of(m).replace(hour=0, minute=0, second=0, microsecond=0) for m in mondays})
+    if not mondays:
+        return {}
+
+    container_id = database.database_id if database is not None else parent_id
+    last_title, last_monday, _ = week_title_and_range(mondays[0] - timedelta(days=1))
+    last_week: Dict[str, Optional[str]] = {}
+
+    def last_week_page() -> Optional[str]:
+        """最初の週の前週ページ（最初に必要になったときに1回だけ探す）"""
+        if "id" not in last_week:
+            if database is not None:
+                last_week["id"] = database.find_week(last_monday)
+            else:
+                last_week["id"] = find_child_page_by_title(notion, parent_id, last_title, cache, index)
+            if last_week["id"]:
+                print(f"✅ 前週（{last_title}）のMonthly TASKを{'同期' if synced_monthly else 'コピー'}")
+            else:
+                print("ℹ️ 前週ページが見つからないため、空のMonthly TASKを作成")
+        return last_week["id"]
+
+    carries: Dict[Optional[str], Dict[str, Any]] = {}
+
+    def carry_from(page_id: Optional[str]) -> Dict[str, Any]:
+        """コピー方式で引き継ぐ Monthly TASK（同じ元ページからは1回だけ作る）"""
+        if page_id not in carries:
+            carries[page_id] = build_monthly_task_toggle_from_last_week(notion, page_id, cache)
+        return carries[page_id]
+
+    # 引き継ぎ元の直前の週: (既存ページIDを返す関数, 今回作成する週ならそのタイトル, 月曜)
+    # コピー方式は直前の「既存」ページ（carry_source）から、同期ブロック方式は直前の週（作成分も含む）から作る
+    Source = Tuple[Callable[[], Optional[str]], Optional[str], Optional[datetime]]
+    source: Source = (last_week_page, None, last_monday)
+    carry_source: Callable[[], Optional[str]] = last_week_page
+    page_ids: Dict[str, str] = {}
+    planned: List[Tuple[str, datetime, Callable[[], Optional[str]], Source]] = []
+    for mon in mondays:
+        title, _, _ = week_title_and_range(mon)
+        run_key = week_run_key(container_id, mon)
+        if journal is not None and journal.page_id(run_key) and not journal.is_complete(run_key):
+            planned.append((title, mon, carry_source, source))  # 途中で止まったページを再開
+            source = (lambda: None, title, mon)
+            continue
+        if database is not None:
+            existing = database.find_week(mon)
+        else:
+            existing = find_child_page_by_title(notion, parent_id, title, cache, index)
+            if existing and not _created_near(notion, existing, mon):
+                existing = None  # 前年以前の同名ページ
+        if existing:
+            print(f"⏭ {title} は作成済みのためスキップ")
+            page_ids[title] = existing
+            source = (lambda page_id=existing: page_id, None, mon)
+            carry_source = source[0]
+            continue
+        planned.append((title, mon, carry_source, source))
+        source = (lambda: None, title, mon)
+
+    if not planned:
+        return page_ids
+    if template_blocks is None:
+        template_blocks = load_template_blocks(notion, template_page_id, cache)
+    if compiled is None:
+        compiled = compile_week_template(template_blocks)
+    digest = render_cache.digest(template_blocks) if render_cache is not None else None
+
+    pending: List[Tuple[str, Iterator[List[Dict[str, Any]]]]] = []
+    for title, mon, carry_page, (source_page, source_title, source_monday) in planned:
+        if synced_monthly:
+            # 直前の週を今回作成した場合は、その Monthly TASK（作成時に書き込み済み）を元にする
+            source_id = source_page() or (page_ids.get(source_title) if source_title else None)
+            toggle = build_synced_monthly_task_toggle(notion, source_id, source_monday, mon, cache)
+        else:
+            toggle = carry_from(carry_page())
+        week_blocks = stream_week_blocks(template_blocks, mon, compiled, render_cache, digest)
+        if database is not None:
+            page_id, remaining = start_week_page(
+                notion, container_id, title, toggle, week_blocks, journal,
+                parent=database.parent(), properties=week_properties(title, mon), monday=mon,
+            )
+        else:
+            page_id, remaining = start_week_page(notion, parent_id, title, toggle, week_blocks, journal, monday=mon)
+            if index is not None:
+                index.record(parent_id, title, page_id)
+        page_ids[title] = page_id
+        pending.append((page_id, remaining))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(append_week_blocks, notion, pid, rest, journal, append_workers) for pid, rest in pending
+        ]
+        for f in futures:
+            f.result()
+
+    if index is not None and database is None and index.rescanned(parent_id):
+        # 作成した週はインデックスに記録済みなので、作成後の版を覚えて次回の実行で走査し直さないようにする
+        index.mark_current(parent_id, container_version(notion, parent_id))
+    return page_ids
+
+@traced_step
+def _created_near(notion: Client, page_id: str, monday: datetime) -> bool:
+    """
+    同名ページがその週のものか（前年以前の同じ mmdd ではないか）を作成日時で判定する。
+    先行作成・埋め戻しを考慮し、対象週の半年前以降に作られていればその週のページとみなす。
+    """
+    created = notion.blocks.retrieve(block_id=page_id)["created_time"]
+    created_at = datetime.strptime(created[:10], "%Y-%m-%d")
+    return created_at >= monday - timedelta(days=SAME_WEEK_WINDOW_DAYS)
 
 # =============================================================================
 # メインフロー
 # =============================================================================
 
-def main() -> None:
-    notion, parent_id = init_client()
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Notion 週次ページを作成する")
+    parser.add_argument(
+        "--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), default=None,
+        help="最初の週に含まれる日付 YYYY-MM-DD（既定: 今日）",
+    )
+    parser.add_argument("--weeks", type=int, default=1, help="作成する週数（既定: 1）")
+    parser.add_argument("--workers", type=int, default=4, help="追記の並行数")
+    parser.add_argument(
+        "--database", default=None,
+        help="週次ページを作るデータベースID（既定: NOTION_WEEK_DATABASE_ID。未指定なら親ページ直下）",
+    )
+    parser.add_argument(
+        "--synced-monthly", action="store_true",
+        help="Monthly TASK を月ごとの同期ブロック（元1つ + 各週は参照）で持ち越す",
+    )
+    parser.add_argument(
+        "--append-workers", type=int, default=1,
+        help="1ページ内の追記の並行数（2以上でチャンクごとのアンカーを先に置き、after 指定で並行に追記）",
+    )
+    parser.add_argument(
+        "--render-cache", action="store_true",
+        help="展開済みの週をローカルキャッシュ（NOTION_CACHE_PATH）に保存して再実行で使い回す（既定: 毎回展開）",
+    )
+    parser.add_argument(
+        "--metrics-dir", default=None,
+        help="API 計測結果（trace.json / metrics.prom）の出力先ディレクトリ",
+    )
+    return parser.parse_args(argv)
 
-    # 今週/前週タイトル
-    today = datetime.today()
-    this_title, this_mon, _ = week_title_and_range(today)
-    last_title, _, _ = week_title_and_range(this_mon - timedelta(days=1))
-    print(f"今週: {this_title} / 前週: {last_title}")
-
-    # 前週ページ取得 & Monthly TASK 構築
-    last_page_id = find_child_page_by_title(notion, parent_id, last_title)
-    monthly_toggle = build_monthly_task_toggle_from_last_week(notion, last_page_id)
-    if last_page_id:
-        print("✅ 前週のMonthly TASKをコピー（または空で生成）")
-    else:
-        print("ℹ️ 前週ページが見つからないため、空のMonthly TASKを作成")
-
-    # テンプレ読み込み & 7日×展開
-    template_blocks = load_template_blocks(notion, TEMPLATE_PAGE_ID)
-    week_blocks = materialize_week_blocks_from_template(template_blocks, this_mon)
-
-    # ページ作成
-    create_week_page(
-        notion=notion,
-        parent_page_id=parent_id,
-        title=this_title,
-        monthly_task_toggle=monthly_toggle,
-        content_blocks=week_blocks,
+def main(argv: Optional[List[str]] = None) -> None:
+    from http_pool import shared_pool
+
+    args = parse_args(argv)
+    notion, parent_id = init_client()
+    recorder = ApiRecorder().attach(notion)  # スケジューラより内側で再送も1回ずつ記録
+    scheduler = attach_scheduler(notion)
+    cache_path = os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH)
+    cache = BlockCache(cache_path)
+    index = PageIndex(cache_path)
+    journal = WriteJournal(cache_path)
+    render_cache = RenderCache(cache_path) if args.render_cache else None  # 展開済みの週（指定時のみ）
+
+    first_mon = monday_of(args.start or datetime.today())
+    mondays = [first_mon + timedelta(weeks=w) for w in range(args.weeks)]
+    first_title, _, _ = week_title_and_range(mondays[0])
+    last_title, _, _ = week_title_and_range(mondays[-1])
+    print(f"対象: {first_title} 〜 {last_title}（{len(mondays)}週）")
+
+    database_id = args.database or os.getenv("NOTION_WEEK_DATABASE_ID")
+    database = WeekDatabase(notion, database_id) if database_id else None
+    generate_weeks(
+        notion, parent_id, mondays,
+        cache=cache, index=index, max_workers=args.workers, journal=journal, database=database,
+        synced_monthly=args.synced_monthly, append_workers=args.append_workers, render_cache=render_cache,
     )
+    if render_cache is not None:
+        print(render_cache.summary())
+    print(scheduler.summary())
+    print(shared_pool().summary())
+    print(recorder.summary_table())
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+        recorder.write_trace(os.path.join(args.metrics_dir, "trace.json"))
+        recorder.write_prometheus(os.path.join(args.metrics_dir, "metrics.prom"), scheduler.stats)
+        print(f"📝 計測結果を出力: {args.metrics_dir}")
 
 if __name__ == "__main__":
     main()
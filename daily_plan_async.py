@@ -0,0 +1,266 @@
+import asyncio
+import itertools
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from notion_client import AsyncClient
+from dotenv import load_dotenv
+
+from block_cache import DEFAULT_CACHE_PATH, BlockCache
+from http_pool import shared_pool
+from instrumentation import ApiRecorder
+from rate_limit import attach_scheduler
+from tree_writer import (
+    fetch_block_tree_async,
+    iter_request_batches,
+    resolve_created_ids_async,
+    split_for_request,
+    write_deferred_async,
+)
+from daily_plan import (
+    PAGE_SIZE,
+    TEMPLATE_PAGE_ID,
+    build_monthly_task_toggle_from_last_week as build_monthly_task_toggle_sync,
+    client_options,
+    empty_monthly_task_toggle,
+    find_child_page_by_title as find_child_page_by_title_sync,
+    find_monthly_task_toggle,
+    compile_week_template,
+    init_client,
+    iter_week_blocks,
+    latest_child_page,
+    load_template_blocks as load_template_blocks_sync,
+    monthly_task_toggle,
+    sanitize_blocks,
+    week_title_and_range,
+)
+
+# =============================================================================
+# 初期化
+# =============================================================================
+
+def init_async_client() -> Tuple[AsyncClient, str]:
+    load_dotenv()
+    token = os.getenv("NOTION_TOKEN")
+    parent_id = os.getenv("PARENT_PAGE_ID")
+    if not token or not parent_id:
+        raise RuntimeError("NOTION_TOKEN / PARENT_PAGE_ID が .env に未設定です。")
+
+    return shared_pool().attach(AsyncClient(**client_options(token))), parent_id
+
+# =============================================================================
+# Notion API ヘルパー（daily_plan.py のコルーチン版）
+# =============================================================================
+
+async def paginate_children(
+    notion: AsyncClient,
+    block_id: str,
+    cache: Optional[BlockCache] = None,
+    version: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """daily_plan.paginate_children のコルーチン版（キャッシュの扱いも同じ）"""
+    if cache is None:
+        return await _list_all_children(notion, block_id)
+
+    if version is None:
+        version = (await notion.blocks.retrieve(block_id=block_id))["last_edited_time"]
+    cached = cache.get(block_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    results = await _list_all_children(notion, block_id)
+    cache.put(block_id, version, results)
+    return results
+
+async def _list_all_children(notion: AsyncClient, block_id: str) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while True:
+        resp = await notion.blocks.children.list(
+            block_id=block_id, page_size=PAGE_SIZE, start_cursor=cursor
+        )
+        results.extend(resp.get("results", []))
+        cursor = resp.get("next_cursor")
+        if not resp.get("has_more"):
+            break
+    return results
+
+# =============================================================================
+# ページ/ブロック取得・生成ロジック
+# =============================================================================
+
+async def find_child_page_by_title(
+    notion: AsyncClient, parent_id: str, title: str, cache: Optional[BlockCache] = None
+) -> Optional[str]:
+    """親ページ直下の child_page を走査して一致タイトルのページIDを返す（同名が複数あれば最新）"""
+    children = await paginate_children(notion, parent_id, cache)
+    return latest_child_page(children, title)
+
+async def build_monthly_task_toggle_from_last_week(
+    notion: AsyncClient, last_page_id: Optional[str], cache: Optional[BlockCache] = None
+) -> Dict[str, Any]:
+    """前週ページの Monthly TASK トグルを子孫ごと複製して返す。見つからなければ空のトグル"""
+    if not last_page_id:
+        return empty_monthly_task_toggle()
+
+    page_version = None
+    if cache is not None:
+        page_version = (await notion.blocks.retrieve(block_id=last_page_id))["last_edited_time"]
+    blocks = await paginate_children(notion, last_page_id, cache, version=page_version)
+
+    blk = find_monthly_task_toggle(blocks)
+    if blk is None:
+        return empty_monthly_task_toggle()
+    children = await fetch_block_tree_async(
+        lambda bid: paginate_children(notion, bid, cache, version=page_version), blk["id"]
+    )
+    return monthly_task_toggle(sanitize_blocks(children))
+
+async def load_template_blocks(
+    notion: AsyncClient, template_page_id: str, cache: Optional[BlockCache] = None
+) -> List[Dict[str, Any]]:
+    """テンプレページ直下のブロック群をフル取得（ページネーション対応＆サニタイズ）"""
+    raw = await paginate_children(notion, template_page_id, cache)
+    return sanitize_blocks(raw)
+
+async def fetch_week_inputs(
+    notion: AsyncClient,
+    parent_id: str,
+    last_title: str,
+    template_page_id: str,
+    cache: Optional[BlockCache] = None,
+) -> Tuple[Optional[str], Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    週次ページ作成に必要な読み取りを並行実行する。
+    テンプレ取得と「親ページ走査 → 前週 Monthly TASK 取得」の連鎖を同時に走らせる。
+    戻り値: (前週ページID, Monthly TASK トグル, テンプレブロック)
+    """
+    async def last_week_chain() -> Tuple[Optional[str], Dict[str, Any]]:
+        last_page_id = await find_child_page_by_title(notion, parent_id, last_title, cache)
+        toggle = await build_monthly_task_toggle_from_last_week(notion, last_page_id, cache)
+        return last_page_id, toggle
+
+    (last_page_id, toggle), template_blocks = await asyncio.gather(
+        last_week_chain(),
+        load_template_blocks(notion, template_page_id, cache),
+    )
+    return last_page_id, toggle, template_blocks
+
+async def create_week_page(
+    notion: AsyncClient,
+    parent_page_id: str,
+    title: str,
+    monthly_task_toggle: Dict[str, Any],
+    content_blocks: Iterable[Dict[str, Any]],
+) -> str:
+    """
+    週次ページを作成し、ブロックをリクエスト上限（件数・入れ子込みブロック数・サイズ）に収まる単位で分割して追加。
+    分割は daily_plan.start_week_page と同じ（iter_request_batches + split_for_request）で、
+    入れ子上限を超える部分木は子を外して送り、作成後に階層ごとに追記する。
+    content_blocks は遅延生成でもよく、チャンクは送る直前に1つずつ詰める。
+    追記は同じページ末尾への順序依存の書き込みなので、ここは直列のまま。
+    戻り値: 作成ページID
+    """
+    batches = iter_request_batches(itertools.chain([monthly_task_toggle], content_blocks))
+    first = next(batches)
+    payload, deferred = split_for_request(first)
+    resp = await notion.pages.create(
+        parent={"page_id": parent_page_id},
+        properties={"title": [{"type": "text", "text": {"content": title}}]},
+        children=payload,
+    )
+    page_id = resp["id"]
+    print(f"✅ 今週ページ作成 → {resp['url']}")
+    if deferred:
+        ids = await resolve_created_ids_async(notion, page_id, deferred[-1][0] + 1)
+        await write_deferred_async(notion, [(ids[i], children) for i, children in deferred])
+
+    done = len(first) - 1  # 先頭のトグル分を除いた追加済みブロック数
+    for chunk in batches:
+        await write_deferred_async(notion, [(page_id, chunk)])
+        print(f"🔧 追記: ブロック {done+1}〜{done+len(chunk)}")
+        done += len(chunk)
+
+    return page_id
+
+# =============================================================================
+# 同期版との実測比較（読み取りフェーズのみ。ページは作成しない）
+# =============================================================================
+
+def compare_wall_clock(rounds: int = 3) -> None:
+    """
+    同期版（daily_plan.py）と非同期版で読み取りフェーズの所要時間を比較する。
+    キャッシュ無しで同じ入力を取得し、各ラウンドの秒数を表示する。
+    """
+    today = datetime.today()
+    _, this_mon, _ = week_title_and_range(today)
+    last_title, _, _ = week_title_and_range(this_mon - timedelta(days=1))
+
+    notion, parent_id = init_client()
+
+    async def run_async() -> None:
+        async_notion, _ = init_async_client()
+        try:
+            await fetch_week_inputs(async_notion, parent_id, last_title, TEMPLATE_PAGE_ID)
+        finally:
+            await async_notion.aclose()
+
+    for r in range(rounds):
+        start = time.perf_counter()
+        last_page_id = find_child_page_by_title_sync(notion, parent_id, last_title)
+        build_monthly_task_toggle_sync(notion, last_page_id)
+        load_template_blocks_sync(notion, TEMPLATE_PAGE_ID)
+        sync_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(run_async())
+        async_sec = time.perf_counter() - start
+
+        print(f"⏱ round {r+1}: sync {sync_sec:.2f}s / async {async_sec:.2f}s")
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+async def main() -> None:
+    notion, parent_id = init_async_client()
+    recorder = ApiRecorder().attach(notion)
+    scheduler = attach_scheduler(notion)
+    cache = BlockCache(os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH))
+
+    today = datetime.today()
+    this_title, this_mon, _ = week_title_and_range(today)
+    last_title, _, _ = week_title_and_range(this_mon - timedelta(days=1))
+    print(f"今週: {this_title} / 前週: {last_title}")
+
+    try:
+        last_page_id, monthly_toggle, template_blocks = await fetch_week_inputs(
+            notion, parent_id, last_title, TEMPLATE_PAGE_ID, cache
+        )
+        if last_page_id:
+            print("✅ 前週のMonthly TASKをコピー（または空で生成）")
+        else:
+            print("ℹ️ 前週ページが見つからないため、空のMonthly TASKを作成")
+
+        week_blocks = iter_week_blocks(compile_week_template(template_blocks), this_mon)
+        await create_week_page(
+            notion=notion,
+            parent_page_id=parent_id,
+            title=this_title,
+            monthly_task_toggle=monthly_toggle,
+            content_blocks=week_blocks,
+        )
+        print(scheduler.summary())
+        print(shared_pool().summary())
+        print(recorder.summary_table())
+    finally:
+        await notion.aclose()
+
+if __name__ == "__main__":
+    if "--compare" in sys.argv[1:]:
+        compare_wall_clock()
+    else:
+        asyncio.run(main())
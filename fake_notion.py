@@ -0,0 +1,613 @@
+import gzip
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+MAX_PAGE_SIZE = 100
+MAX_NESTING = 2                 # 1リクエストで送れる入れ子の深さ
+MAX_BLOCKS_PER_REQUEST = 1000   # 1リクエストのブロック総数（入れ子含む）
+MAX_BODY_BYTES = 500_000        # 1リクエストのボディサイズ
+GZIP_MIN_BYTES = 1024           # これ以上のレスポンスは Accept-Encoding: gzip なら圧縮して返す
+
+# =============================================================================
+# リクエスト検証（本物の API の上限）
+# =============================================================================
+
+def _children_error(children: List[Dict[str, Any]], depth: int = 0) -> Optional[str]:
+    """children の件数・入れ子の深さが上限を超えていればエラーメッセージを返す"""
+    if len(children) > MAX_PAGE_SIZE:
+        return f"body.children.length should be ≤ `{MAX_PAGE_SIZE}`"
+    for blk in children:
+        obj = blk.get(blk.get("type", ""), {})
+        nested = obj.get("children") if isinstance(obj, dict) else None
+        if nested:
+            if depth >= MAX_NESTING:
+                return f"body.children exceeds nesting depth `{MAX_NESTING}`"
+            err = _children_error(nested, depth + 1)
+            if err:
+                return err
+    return None
+
+def _count_blocks(children: List[Dict[str, Any]]) -> int:
+    total = 0
+    for blk in children:
+        obj = blk.get(blk.get("type", ""), {})
+        total += 1 + _count_blocks((obj.get("children") or []) if isinstance(obj, dict) else [])
+    return total
+
+def _validate_children(children: List[Dict[str, Any]]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    err = _children_error(children)
+    if err is None and _count_blocks(children) > MAX_BLOCKS_PER_REQUEST:
+        err = f"body.children should contain ≤ `{MAX_BLOCKS_PER_REQUEST}` blocks"
+    if err is None:
+        return None
+    return 400, {"object": "error", "status": 400, "code": "validation_error", "message": err}
+
+# =============================================================================
+# インメモリのワークスペース
+# =============================================================================
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+class FakeNotionState:
+    """
+    ブロック/ページをメモリ上に持つ Notion ワークスペースの代用品。
+    ページも child_page ブロックとして親の children に並ぶ（実 API と同じ見え方）。
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.blocks: Dict[str, Dict[str, Any]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.parents: Dict[str, str] = {}
+        self.databases: Dict[str, Dict[str, Any]] = {}      # データベースID → {title, properties, data_source_id}
+        self.data_sources: Dict[str, List[str]] = {}        # データソースID → ページID（作成順）
+        self.properties: Dict[str, Dict[str, Any]] = {}     # ページID → プロパティ値
+
+    # --- 生成 ---
+    def add_page(self, parent_id: Optional[str], title: str) -> str:
+        with self.lock:
+            page_id = _new_id()
+            now = _now()
+            self.blocks[page_id] = {
+                "object": "block", "id": page_id, "type": "child_page",
+                "created_time": now, "last_edited_time": now,
+                "archived": False, "in_trash": False, "has_children": False,
+                "child_page": {"title": title},
+            }
+            self.children[page_id] = []
+            if parent_id is not None:
+                self._attach(parent_id, [page_id], None)
+            return page_id
+
+    def add_blocks(self, parent_id: str, blocks: List[Dict[str, Any]], after: Optional[str] = None) -> List[str]:
+        """ブロック定義（入れ子の children を含む）を parent_id 配下に作成する"""
+        with self.lock:
+            ids = [self._create_block(b) for b in blocks]
+            self._attach(parent_id, ids, after)
+            return ids
+
+    def _create_block(self, src: Dict[str, Any]) -> str:
+        btype = src["type"]
+        obj = dict(src.get(btype) or {})
+        nested = obj.pop("children", None) or []
+        block_id = _new_id()
+        now = _now()
+        self.blocks[block_id] = {
+            "object": "block", "id": block_id, "type": btype,
+            "created_time": now, "last_edited_time": now,
+            "archived": False, "in_trash": False, "has_children": False,
+            btype: obj,
+        }
+        self.children[block_id] = []
+        if btype == "synced_block" and obj.get("synced_from"):
+            self.blocks[block_id]["has_children"] = True  # 参照は元の子を見せる
+        if nested:
+            self._attach(block_id, [self._create_block(c) for c in nested], None)
+        return block_id
+
+    def _attach(self, parent_id: str, ids: List[str], after: Optional[str]) -> None:
+        siblings = self.children.setdefault(parent_id, [])
+        pos = siblings.index(after) + 1 if after else len(siblings)
+        siblings[pos:pos] = ids
+        for i in ids:
+            self.parents[i] = parent_id
+        if parent_id in self.blocks:
+            self.blocks[parent_id]["has_children"] = bool(siblings)
+        self.touch(parent_id)
+
+    def add_database(self, parent_id: str, title: str, properties: Dict[str, Any]) -> str:
+        """parent_id 配下に child_database ブロックとしてデータベース（データソース1つ）を作る"""
+        with self.lock:
+            db_id = _new_id()
+            now = _now()
+            self.blocks[db_id] = {
+                "object": "block", "id": db_id, "type": "child_database",
+                "created_time": now, "last_edited_time": now,
+                "archived": False, "in_trash": False, "has_children": False,
+                "child_database": {"title": title},
+            }
+            self.children[db_id] = []
+            ds_id = _new_id()
+            self.databases[db_id] = {"title": title, "properties": properties, "data_source_id": ds_id}
+            self.data_sources[ds_id] = []
+            self._attach(parent_id, [db_id], None)
+            return db_id
+
+    def add_db_page(self, data_source_id: str, properties: Dict[str, Any]) -> str:
+        with self.lock:
+            title = _property_text(next((v for v in properties.values() if "title" in v), {}))
+            page_id = self.add_page(None, title)
+            self.data_sources[data_source_id].append(page_id)
+            self.parents[page_id] = data_source_id
+            self.properties[page_id] = properties
+            return page_id
+
+    def move(self, page_id: str, parent: Dict[str, Any]) -> None:
+        """ページを別の親ページ / データソースへ移す（データソースへはタイトルを title プロパティにする）"""
+        with self.lock:
+            old = self.parents.pop(page_id, None)
+            if old in self.data_sources:
+                self.data_sources[old].remove(page_id)
+            elif old is not None:
+                self.children[old].remove(page_id)
+            if parent.get("data_source_id"):
+                ds_id = parent["data_source_id"]
+                self.data_sources[ds_id].append(page_id)
+                self.parents[page_id] = ds_id
+                title = self.blocks[page_id]["child_page"]["title"]
+                self.properties.setdefault(page_id, {})["Name"] = {
+                    "type": "title", "title": [{"type": "text", "text": {"content": title}, "plain_text": title}]
+                }
+            else:
+                self._attach(parent.get("page_id") or parent["block_id"], [page_id], None)
+            self.touch(page_id)
+
+    def page_object(self, page_id: str) -> Dict[str, Any]:
+        """ページオブジェクト（pages.retrieve / データソースの query 結果の形）"""
+        blk = self.blocks[page_id]
+        parent_id = self.parents.get(page_id)
+        if parent_id in self.data_sources:
+            parent = {"type": "data_source_id", "data_source_id": parent_id}
+        else:
+            parent = {"type": "page_id", "page_id": parent_id}
+        return {
+            "object": "page", "id": page_id, "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+            "created_time": blk["created_time"], "last_edited_time": blk["last_edited_time"],
+            "archived": blk["archived"], "in_trash": blk["in_trash"], "parent": parent,
+            "properties": self.properties.get(page_id) or {
+                "title": {"type": "title", "title": [{"type": "text", "text": {"content": blk["child_page"]["title"]},
+                                                       "plain_text": blk["child_page"]["title"]}]},
+            },
+        }
+
+    def query(
+        self,
+        data_source_id: str,
+        filter_: Optional[Dict[str, Any]],
+        sorts: List[Dict[str, Any]],
+        start_cursor: Optional[str],
+        page_size: int,
+    ) -> Dict[str, Any]:
+        with self.lock:
+            ids = [i for i in self.data_sources[data_source_id]
+                   if not self.blocks[i]["archived"] and _matches(self.properties.get(i, {}), filter_)]
+            for sort in reversed(sorts):
+                if "timestamp" in sort:  # {"timestamp": "created_time" / "last_edited_time"}
+                    key = lambda i: self.blocks[i][sort["timestamp"]]
+                else:
+                    key = lambda i: _property_text(self.properties.get(i, {}).get(sort["property"], {}))
+                ids.sort(key=key, reverse=sort.get("direction") == "descending")
+            start = ids.index(start_cursor) if start_cursor else 0
+            page = ids[start : start + page_size]
+            has_more = start + page_size < len(ids)
+            return {
+                "object": "list",
+                "results": [self.page_object(i) for i in page],
+                "next_cursor": ids[start + page_size] if has_more else None,
+                "has_more": has_more,
+                "type": "page_or_data_source",
+            }
+
+    def touch(self, block_id: str) -> None:
+        """編集されたブロックと祖先の last_edited_time を更新する"""
+        now = _now()
+        cur: Optional[str] = block_id
+        while cur is not None and cur in self.blocks:
+            self.blocks[cur]["last_edited_time"] = now
+            cur = self.parents.get(cur)
+
+    # --- 参照 ---
+    def list_children(self, block_id: str, start_cursor: Optional[str], page_size: int) -> Dict[str, Any]:
+        with self.lock:
+            blk = self.blocks.get(block_id)
+            if blk is not None and blk["type"] == "synced_block" and blk["synced_block"].get("synced_from"):
+                block_id = blk["synced_block"]["synced_from"]["block_id"]  # 参照の子は元の子
+            ids = [i for i in self.children.get(block_id, []) if not self.blocks[i]["archived"]]
+            start = ids.index(start_cursor) if start_cursor else 0
+            page = ids[start : start + page_size]
+            has_more = start + page_size < len(ids)
+            return {
+                "object": "list",
+                "results": [self.blocks[i] for i in page],
+                "next_cursor": ids[start + page_size] if has_more else None,
+                "has_more": has_more,
+                "type": "block",
+                "block": {},
+            }
+
+def _property_text(value: Dict[str, Any]) -> str:
+    """プロパティ値を比較用の文字列にする（title / rich_text / select / date）"""
+    ptype = value.get("type") or next((k for k in ("title", "rich_text", "select", "date") if k in value), "")
+    v = value.get(ptype)
+    if ptype in ("title", "rich_text"):
+        return "".join(t.get("plain_text") or t.get("text", {}).get("content", "") for t in v or [])
+    if ptype == "select":
+        return (v or {}).get("name", "")
+    if ptype == "date":
+        return (v or {}).get("start", "")
+    return ""
+
+def _matches(props: Dict[str, Any], filter_: Optional[Dict[str, Any]]) -> bool:
+    """データソースの filter（and / or と、title・rich_text・select・date の主な条件）を評価する"""
+    if not filter_:
+        return True
+    if "and" in filter_:
+        return all(_matches(props, f) for f in filter_["and"])
+    if "or" in filter_:
+        return any(_matches(props, f) for f in filter_["or"])
+    actual = _property_text(props.get(filter_["property"], {}))
+    cond = next(v for k, v in filter_.items() if k != "property")
+    op, expected = next(iter(cond.items()))
+    if op == "is_empty":
+        return not actual
+    if op == "is_not_empty":
+        return bool(actual)
+    if op == "equals":
+        return actual == expected
+    if op == "does_not_equal":
+        return actual != expected
+    if op == "contains":
+        return expected in actual
+    if op in ("before", "on_or_before", "after", "on_or_after"):
+        if not actual:
+            return False
+        a, e = actual[:10], expected[:10]
+        return {"before": a < e, "on_or_before": a <= e, "after": a > e, "on_or_after": a >= e}[op]
+    raise ValueError(f"unsupported filter: {filter_}")
+
+# =============================================================================
+# HTTP サーバー（notion_client の base_url に向けて使う）
+# =============================================================================
+
+_ROUTES: List[Tuple[str, "re.Pattern[str]", str]] = [
+    ("GET", re.compile(r"^/v1/blocks/([^/]+)/children$"), "blocks.children.list"),
+    ("PATCH", re.compile(r"^/v1/blocks/([^/]+)/children$"), "blocks.children.append"),
+    ("GET", re.compile(r"^/v1/blocks/([^/]+)$"), "blocks.retrieve"),
+    ("DELETE", re.compile(r"^/v1/blocks/([^/]+)$"), "blocks.delete"),
+    ("POST", re.compile(r"^/v1/pages$"), "pages.create"),
+    ("GET", re.compile(r"^/v1/pages/([^/]+)$"), "pages.retrieve"),
+    ("PATCH", re.compile(r"^/v1/pages/([^/]+)$"), "pages.update"),
+    ("POST", re.compile(r"^/v1/pages/([^/]+)/move$"), "pages.move"),
+    ("POST", re.compile(r"^/v1/databases$"), "databases.create"),
+    ("GET", re.compile(r"^/v1/databases/([^/]+)$"), "databases.retrieve"),
+    ("POST", re.compile(r"^/v1/data_sources/([^/]+)/query$"), "data_sources.query"),
+]
+
+class FakeNotionServer:
+    """
+    FakeNotionState を Notion REST API 互換の HTTP で公開するスレッド実行サーバー。
+    latency で全リクエストに遅延を入れ、rate_limit_every で N 回に1回 429 を返す。
+    connect_latency で新規接続ごとに遅延を入れる（TCP + TLS ハンドシェイク相当。keep-alive の効果を測る）。
+    """
+
+    def __init__(
+        self,
+        state: Optional[FakeNotionState] = None,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after: float = 0.0,
+        connect_latency: float = 0.0,
+        gzip_min_bytes: int = GZIP_MIN_BYTES,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.state = state or FakeNotionState()
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.connect_latency = connect_latency
+        self.gzip_min_bytes = gzip_min_bytes
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.stats: Dict[str, Any] = {
+                "requests": 0, "rate_limited": 0, "connections": 0,
+                "bytes_received": 0, "bytes_sent": 0,
+                "calls": {},
+            }
+
+    def start(self) -> "FakeNotionServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeNotionServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # --- ハンドラ ---
+    def _make_handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # ヘッダとボディの分割送信で遅延 ACK 待ちにならないように
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server._stats_lock:
+                    server.stats["connections"] += 1
+                if server.connect_latency:
+                    time.sleep(server.connect_latency)
+
+            def do_GET(self) -> None:
+                server._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                server._dispatch(self, "POST")
+
+            def do_PATCH(self) -> None:
+                server._dispatch(self, "PATCH")
+
+            def do_DELETE(self) -> None:
+                server._dispatch(self, "DELETE")
+
+        return Handler
+
+    def _record(self, endpoint: str, received: int) -> int:
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_received"] += received
+            self.stats["calls"][endpoint] = self.stats["calls"].get(endpoint, 0) + 1
+            return self.stats["requests"]
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw = handler.rfile.read(length) if length else b""
+        if len(raw) > MAX_BODY_BYTES:
+            self._respond(handler, 413, {
+                "object": "error", "status": 413, "code": "payload_too_large",
+                "message": f"Request body too large (> {MAX_BODY_BYTES} bytes)",
+            })
+            return
+        body = json.loads(raw) if raw else {}
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        for route_method, pattern, endpoint in _ROUTES:
+            m = pattern.match(parsed.path)
+            if route_method == method and m:
+                break
+        else:
+            self._respond(handler, 400, {
+                "object": "error", "status": 400, "code": "invalid_request_url",
+                "message": f"unsupported: {method} {parsed.path}",
+            })
+            return
+
+        n = self._record(endpoint, len(raw))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_every and n % self.rate_limit_every == 0:
+            with self._stats_lock:
+                self.stats["rate_limited"] += 1
+            self._respond(handler, 429, {
+                "object": "error", "status": 429, "code": "rate_limited",
+                "message": "You have been rated limited. Please try again in a few minutes.",
+            }, {"Retry-After": str(self.retry_after)})
+            return
+
+        try:
+            status, payload = getattr(self, "_" + endpoint.replace(".", "_"))(m.groups(), query, body)
+        except KeyError as e:
+            status, payload = 404, {
+                "object": "error", "status": 404, "code": "object_not_found",
+                "message": f"Could not find block with ID: {e}",
+            }
+        self._respond(handler, status, payload)
+
+    def _respond(
+        self,
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        compress = len(data) >= self.gzip_min_bytes and "gzip" in handler.headers.get("Accept-Encoding", "")
+        if compress:
+            data = gzip.compress(data, compresslevel=1)
+        with self._stats_lock:
+            self.stats["bytes_sent"] += len(data)
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        if compress:
+            handler.send_header("Content-Encoding", "gzip")
+        handler.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            handler.send_header(k, v)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    # --- エンドポイント ---
+    def _blocks_children_list(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        block_id = groups[0]
+        if block_id not in self.state.children:
+            raise KeyError(block_id)
+        page_size = min(int(query.get("page_size") or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        return 200, self.state.list_children(block_id, query.get("start_cursor") or None, page_size)
+
+    def _blocks_children_append(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        block_id = groups[0]
+        if block_id not in self.state.children:
+            raise KeyError(block_id)
+        children = body.get("children", [])
+        invalid = _validate_children(children)
+        if invalid:
+            return invalid
+        ids = self.state.add_blocks(block_id, children, body.get("after"))
+        return 200, {"object": "list", "results": [self.state.blocks[i] for i in ids],
+                     "next_cursor": None, "has_more": False, "type": "block", "block": {}}
+
+    def _blocks_retrieve(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return 200, self.state.blocks[groups[0]]
+
+    def _blocks_delete(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self.state.lock:
+            blk = self.state.blocks[groups[0]]
+            blk["archived"] = blk["in_trash"] = True  # 本物と同じくゴミ箱扱い（一覧には出ない）
+            self.state.touch(groups[0])
+        return 200, blk
+
+    def _pages_create(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        parent = body.get("parent", {})
+        children = body.get("children", [])
+        invalid = _validate_children(children)
+        if invalid:
+            return invalid
+        ds_id = parent.get("data_source_id")
+        if parent.get("database_id"):
+            ds_id = self.state.databases[parent["database_id"]]["data_source_id"]
+        if ds_id:
+            if ds_id not in self.state.data_sources:
+                raise KeyError(ds_id)
+            with self.state.lock:
+                page_id = self.state.add_db_page(ds_id, body.get("properties", {}))
+                if children:
+                    self.state.add_blocks(page_id, children)
+            return 200, self.state.page_object(page_id)
+
+        parent_id = parent.get("page_id") or parent.get("block_id")
+        if parent_id not in self.state.children:
+            raise KeyError(parent_id)
+        title_prop = body.get("properties", {}).get("title", [])
+        title = "".join(t.get("text", {}).get("content", "") for t in title_prop)
+        with self.state.lock:
+            page_id = self.state.add_page(parent_id, title)
+            if children:
+                self.state.add_blocks(page_id, children)
+        return 200, {"object": "page", "id": page_id, "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+                     "parent": parent, "properties": body.get("properties", {})}
+
+    def _pages_retrieve(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return 200, self.state.page_object(groups[0])
+
+    def _pages_update(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        page_id = groups[0]
+        with self.state.lock:
+            blk = self.state.blocks[page_id]
+            if "properties" in body:
+                self.state.properties.setdefault(page_id, {}).update(body["properties"])
+            for key in ("archived", "in_trash"):
+                if key in body:
+                    blk["archived"] = blk["in_trash"] = bool(body[key])
+            self.state.touch(page_id)
+        return 200, self.state.page_object(page_id)
+
+    def _pages_move(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        self.state.move(groups[0], body.get("parent", {}))
+        return 200, self.state.page_object(groups[0])
+
+    def _databases_create(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        parent_id = body.get("parent", {}).get("page_id")
+        if parent_id not in self.state.children:
+            raise KeyError(parent_id)
+        title = "".join(t.get("text", {}).get("content", "") for t in body.get("title", []))
+        properties = body.get("initial_data_source", {}).get("properties") or body.get("properties", {})
+        db_id = self.state.add_database(parent_id, title, properties)
+        return self._databases_retrieve((db_id,), query, {})
+
+    def _databases_retrieve(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        db = self.state.databases[groups[0]]
+        return 200, {"object": "database", "id": groups[0],
+                     "title": [{"type": "text", "text": {"content": db["title"]}, "plain_text": db["title"]}],
+                     "data_sources": [{"id": db["data_source_id"], "name": db["title"]}]}
+
+    def _data_sources_query(self, groups: Tuple[str, ...], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if groups[0] not in self.state.data_sources:
+            raise KeyError(groups[0])
+        page_size = min(int(body.get("page_size") or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        return 200, self.state.query(
+            groups[0], body.get("filter"), body.get("sorts") or [], body.get("start_cursor"), page_size
+        )
+
+# =============================================================================
+# 合成データ
+# =============================================================================
+
+def seed_parent(state: FakeNotionState, weekly_pages: int, next_monday: datetime) -> str:
+    """next_monday の前週までの週次ページを weekly_pages 件持つ親ページを作る（古い順に並ぶ）"""
+    parent_id = state.add_page(None, "parent")
+    for w in range(weekly_pages, 0, -1):
+        mon = next_monday - timedelta(weeks=w)
+        title = f"{mon.strftime('%m%d')}-{(mon + timedelta(days=6)).strftime('%m%d')}"
+        page_id = state.add_page(parent_id, title)
+        state.blocks[page_id]["created_time"] = mon.strftime("%Y-%m-%dT00:00:00.000Z")
+        state.add_blocks(page_id, [{
+            "type": "toggle",
+            "toggle": {
+                "rich_text": [{"type": "text", "text": {"content": "Monthly TASK"}}],
+                "children": [
+                    {"type": "to_do", "to_do": {"rich_text": [{"type": "text", "text": {"content": f"task {i}"}}], "checked": i % 2 == 0}}
+                    for i in range(5)
+                ],
+            },
+        }])
+    return parent_id
+
+def seed_template(state: FakeNotionState, blocks: int) -> str:
+    """XXXX を含む見出し + 箇条書きで blocks 件のテンプレページを作る"""
+    template_id = state.add_page(None, "template")
+    items: List[Dict[str, Any]] = [
+        {"type": "heading_3", "heading_3": {"rich_text": [{"type": "text", "text": {"content": "XXXX"}}]}}
+    ]
+    for i in range(blocks - 1):
+        items.append({"type": "bulleted_list_item", "bulleted_list_item": {
+            "rich_text": [{"type": "text", "text": {"content": f"item {i}"}}]}})
+    for i in range(0, len(items), MAX_PAGE_SIZE):
+        state.add_blocks(template_id, items[i : i + MAX_PAGE_SIZE])
+    return template_id
@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+MAX_CONNECTIONS = 10       # 同時に張る接続の上限（3 req/s 制限下ではワーカー数ぶんあれば足りる）
+MAX_KEEPALIVE = 10         # 使い終わっても閉じずに残す接続数
+KEEPALIVE_EXPIRY = 60.0    # アイドル接続を残す秒数（httpx 既定の 5 秒だとペース待ちの間に切れる）
+TIMEOUT = 60.0             # 読み書きのタイムアウト（notion_client 既定の timeout_ms と同じ）
+CONNECT_TIMEOUT = 10.0     # 接続（TCP + TLS）のタイムアウト
+POOL_TIMEOUT = 30.0        # 空き接続を待つタイムアウト
+
+# =============================================================================
+# 接続プール
+# =============================================================================
+
+def http2_available() -> bool:
+    """HTTP/2 には h2 パッケージが必要（pip install httpx[http2]）。無ければ HTTP/1.1 の keep-alive だけ使う"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _SharedTransport(httpx.HTTPTransport):
+    """複数のクライアントで共有するトランスポート。個々のクライアントの close では閉じない（HttpPool.close で閉じる）"""
+
+    def close(self) -> None:
+        pass
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def close_pool(self) -> None:
+        super().close()
+
+class HttpPool:
+    """
+    Notion への HTTP 接続を、プロセス内のすべての Client で1つの keep-alive プールにまとめる。
+    attach(notion) で notion_client の Client / AsyncClient の内部 httpx クライアントを差し替える
+    （認証ヘッダ等は notion_client がクライアントごとに設定するので、トークンが違うクライアント同士でも共有できる）。
+    HTTP/2 は TLS の ALPN で合意したときだけ使われ（api.notion.com は対応）、同じ接続に並行リクエストを多重化する。
+    レスポンスの gzip は httpx が Accept-Encoding を付けて自動で展開する。
+    httpcore の trace 拡張で新規接続とリクエストを数え、接続の再利用率を出す。
+    非同期クライアントの接続はイベントループに結び付くため、attach ごとに専用のプールを作る（設定と統計は共有）。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive: int = MAX_KEEPALIVE,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        timeout: float = TIMEOUT,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        pool_timeout: float = POOL_TIMEOUT,
+        http2: Optional[bool] = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout)
+        self.http2 = http2_available() if http2 is None else http2
+        self.transport = _SharedTransport(limits=self.limits, http2=self.http2)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": 0, "connections": 0, "gzip": 0, "versions": {}}
+
+    # --- 計測 ---
+    def _count(self, event: str) -> None:
+        prefix, _, name = event.partition(".")
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self.stats["connections"] += 1
+            elif name == "send_request_headers.started":  # http11.* / http2.*
+                version = "HTTP/2" if prefix == "http2" else "HTTP/1.1"
+                self.stats["requests"] += 1
+                self.stats["versions"][version] = self.stats["versions"].get(version, 0) + 1
+
+    def _count_response(self, response: httpx.Response) -> None:
+        if response.headers.get("content-encoding") == "gzip":
+            with self._lock:
+                self.stats["gzip"] += 1
+
+    def _hooks(self) -> Dict[str, Any]:
+        def trace(event: str, info: Dict[str, Any]) -> None:
+            self._count(event)
+
+        def on_request(request: httpx.Request) -> None:
+            request.extensions["trace"] = trace
+
+        return {"request": [on_request], "response": [self._count_response]}
+
+    def _async_hooks(self) -> Dict[str, Any]:
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            self._count(event)
+
+        async def on_request(request: httpx.Request) -> None:
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response) -> None:
+            self._count_response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    # --- 取り付け ---
+    def attach(self, notion: Any) -> Any:
+        """notion の httpx クライアントをこのプールを使うものに差し替える（Client / AsyncClient どちらも可）"""
+        from notion_client import AsyncClient
+
+        if isinstance(notion, AsyncClient):
+            transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+            client: Any = httpx.AsyncClient(transport=transport, event_hooks=self._async_hooks())
+        else:
+            client = httpx.Client(transport=self.transport, event_hooks=self._hooks())
+        replaced = notion.client
+        notion.client = client          # base_url・ヘッダ・認証は notion_client の setter が設定する
+        client.timeout = self.timeout   # setter が1つの値で上書きするため、接続・待ちを分けて設定し直す
+        if not isinstance(notion, AsyncClient):
+            replaced.close()            # 差し替え前の（まだ接続していない）既定クライアント
+        return notion
+
+    def summary(self) -> str:
+        s = self.stats
+        requests, connections = s["requests"], s["connections"]
+        reused = max(0, requests - connections)
+        rate = reused / requests * 100 if requests else 0.0
+        versions = " / ".join(f"{v} {n}回" for v, n in sorted(s["versions"].items())) or "-"
+        return (
+            f"🔌 HTTP 接続 {connections}本 / リクエスト {requests}回（再利用 {reused}回 = {rate:.0f}%）"
+            f" / {versions} / gzip 応答 {s['gzip']}回"
+        )
+
+    def close(self) -> None:
+        self.transport.close_pool()
+
+def pool_from_env() -> HttpPool:
+    """
+    環境変数で調整したプール。
+    NOTION_HTTP_MAX_CONNECTIONS / NOTION_HTTP_KEEPALIVE（秒）/ NOTION_HTTP_TIMEOUT（秒）/ NOTION_HTTP2=0 で HTTP/2 を使わない
+    """
+    max_connections = int(os.getenv("NOTION_HTTP_MAX_CONNECTIONS") or MAX_CONNECTIONS)
+    http2 = None if os.getenv("NOTION_HTTP2") is None else os.getenv("NOTION_HTTP2") != "0"
+    return HttpPool(
+        max_connections=max_connections,
+        max_keepalive=max_connections,
+        keepalive_expiry=float(os.getenv("NOTION_HTTP_KEEPALIVE") or KEEPALIVE_EXPIRY),
+        timeout=float(os.getenv("NOTION_HTTP_TIMEOUT") or TIMEOUT),
+        http2=http2,
+    )
+
+_shared: Optional[HttpPool] = None
+_shared_lock = threading.Lock()
+
+def shared_pool() -> HttpPool:
+    """プロセス内で共有するプール（初回に環境変数から作る）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = pool_from_env()
+        return _shared
@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import inspect
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from rate_limit import current_attempt
+
+# =============================================================================
+# パイプラインのステップ名
+# =============================================================================
+
+current_step: contextvars.ContextVar[str] = contextvars.ContextVar("current_step", default="-")
+
+@contextmanager
+def api_step(name: str) -> Iterator[None]:
+    """この中で発生した API 呼び出しに name を付ける"""
+    token = current_step.set(name)
+    try:
+        yield
+    finally:
+        current_step.reset(token)
+
+def traced_step(func: Callable[..., Any]) -> Callable[..., Any]:
+    """関数名をステップ名として API 呼び出しに付けるデコレータ"""
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with api_step(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+# =============================================================================
+# 記録
+# =============================================================================
+
+_ID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+
+def endpoint_name(method: str, path: str) -> str:
+    """'GET blocks/{id}/children' のようにIDを伏せたエンドポイント名"""
+    parts = ["{id}" if _ID_SEGMENT.match(p) else p for p in path.strip("/").split("/")]
+    return f"{method.upper()} {'/'.join(parts)}"
+
+def _size(obj: Any) -> int:
+    if obj is None:
+        return 0
+    return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+# 呼び出し中の HTTP 応答のステータス（notion.request は本文しか返さないので httpx の応答フックで受け取る）
+_response_status: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("_response_status", default=None)
+
+def _capture_status(response: Any) -> None:
+    holder = _response_status.get()
+    if holder is not None:
+        holder.append(response.status_code)
+
+async def _capture_status_async(response: Any) -> None:
+    _capture_status(response)
+
+def _install_status_hook(notion: Any, hook: Callable[[Any], Any]) -> None:
+    """
+    notion の httpx クライアントに応答フックを足す（attach 後に http_pool がクライアントを差し替えても付くよう、呼び出しごとに確かめる）。
+    同じクライアントを複数の Client で共有していてもフックは1つで、値は呼び出しごとの holder に入る
+    """
+    hooks = getattr(getattr(notion, "client", None), "event_hooks", None)
+    if hooks is not None and hook not in hooks["response"]:
+        hooks["response"].append(hook)
+
+def _status_of(holder: List[int], error: Optional[Exception] = None) -> int:
+    """
+    実際の応答ステータス。例外なら例外の status（APIResponseError）、無ければ最後の応答、
+    応答が無い（接続失敗・タイムアウト）なら 0。フックの無いクライアントで成功したときは 200 とみなす
+    """
+    if error is not None:
+        return getattr(error, "status", None) or (holder[-1] if holder else 0)
+    return holder[-1] if holder else 200
+
+def _is_error(status: int) -> bool:
+    return not 200 <= status < 300
+
+class ApiRecorder:
+    """
+    Client.request を包み、1回の HTTP 呼び出しごとに
+    エンドポイント・ステップ・所要時間・ステータス・再送か否か・送受信サイズを記録する。
+    RequestScheduler より先に attach すると、再送の1回ずつも記録される。
+    notion_client 内蔵の再送は notion.request の内側で起きて記録されないため、
+    Client は retry=False（daily_plan.client_options）で作ること。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.records: List[Dict[str, Any]] = []
+        self.started = time.time()
+
+    def _record(self, method: str, path: str, body: Any, result: Any, status: int, elapsed: float) -> None:
+        rec = {
+            "ts": round(time.time() - self.started, 4),
+            "step": current_step.get(),
+            "endpoint": endpoint_name(method, path),
+            "status": status,
+            "retry": current_attempt.get() > 0,
+            "latency_sec": round(elapsed, 4),
+            "request_bytes": _size(body),
+            "response_bytes": _size(result),
+        }
+        with self._lock:
+            self.records.append(rec)
+
+    def attach(self, notion: Any) -> "ApiRecorder":
+        original = notion.request
+        recorder = self
+
+        if inspect.iscoroutinefunction(original):
+            async def recorded_async(path: str, method: str, **kwargs: Any) -> Any:
+                _install_status_hook(notion, _capture_status_async)
+                holder: List[int] = []
+                token = _response_status.set(holder)
+                start = time.perf_counter()
+                try:
+                    result = await original(path=path, method=method, **kwargs)
+                except Exception as e:
+                    recorder._record(method, path, kwargs.get("body"), None, _status_of(holder, e), time.perf_counter() - start)
+                    raise
+                finally:
+                    _response_status.reset(token)
+                recorder._record(method, path, kwargs.get("body"), result, _status_of(holder), time.perf_counter() - start)
+                return result
+
+            notion.request = recorded_async
+            return self
+
+        def recorded(path: str, method: str, **kwargs: Any) -> Any:
+            _install_status_hook(notion, _capture_status)
+            holder: List[int] = []
+            token = _response_status.set(holder)
+            start = time.perf_counter()
+            try:
+                result = original(path=path, method=method, **kwargs)
+            except Exception as e:
+                recorder._record(method, path, kwargs.get("body"), None, _status_of(holder, e), time.perf_counter() - start)
+                raise
+            finally:
+                _response_status.reset(token)
+            recorder._record(method, path, kwargs.get("body"), result, _status_of(holder), time.perf_counter() - start)
+            return result
+
+        notion.request = recorded
+        return self
+
+    # =========================================================================
+    # 集計・出力
+    # =========================================================================
+
+    def _groups(self) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        with self._lock:
+            for r in self.records:
+                groups.setdefault((r["step"], r["endpoint"]), []).append(r)
+        return groups
+
+    def summary_table(self) -> str:
+        header = f"{'step':<44} {'endpoint':<28} {'calls':>5} {'err':>4} {'retry':>5} {'total':>8} {'avg':>7} {'p95':>7} {'sent':>9} {'recv':>9}"
+        lines = [header, "-" * len(header)]
+        for (step, endpoint), recs in sorted(self._groups().items()):
+            lat = sorted(r["latency_sec"] for r in recs)
+            p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+            lines.append(
+                f"{step:<44} {endpoint:<28} {len(recs):>5}"
+                f" {sum(1 for r in recs if _is_error(r['status'])):>4}"
+                f" {sum(1 for r in recs if r['retry']):>5}"
+                f" {sum(lat):>7.2f}s {sum(lat) / len(lat):>6.3f}s {p95:>6.3f}s"
+                f" {sum(r['request_bytes'] for r in recs):>9} {sum(r['response_bytes'] for r in recs):>9}"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, path: str) -> None:
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"started": self.started, "calls": records}, f, ensure_ascii=False, indent=2)
+
+    def prometheus_text(self, extra: Optional[Dict[str, float]] = None) -> str:
+        """
+        Prometheus テキスト形式（textfile collector などでそのまま読める）。
+        所要時間は summary（同じ TYPE の下に _sum と _count）として出す
+        """
+        Samples = List[Tuple[str, Callable[[List[Dict[str, Any]]], float]]]  # (名前の接尾辞, 集計)
+        metrics: List[Tuple[str, str, str, Samples]] = [
+            ("notion_api_requests_total", "counter", "Notion API calls", [("", len)]),
+            ("notion_api_retries_total", "counter", "Notion API calls that were retries",
+             [("", lambda recs: sum(1 for r in recs if r["retry"]))]),
+            ("notion_api_request_duration_seconds", "summary", "Latency of Notion API calls",
+             [("_sum", lambda recs: sum(r["latency_sec"] for r in recs)), ("_count", len)]),
+            ("notion_api_request_bytes_total", "counter", "Request body bytes sent",
+             [("", lambda recs: sum(r["request_bytes"] for r in recs))]),
+            ("notion_api_response_bytes_total", "counter", "Response body bytes received",
+             [("", lambda recs: sum(r["response_bytes"] for r in recs))]),
+        ]
+        by_status: Dict[Tuple[str, str, int], List[Dict[str, Any]]] = {}
+        for (step, endpoint), recs in self._groups().items():
+            for r in recs:
+                by_status.setdefault((step, endpoint, r["status"]), []).append(r)
+
+        lines: List[str] = []
+        for name, mtype, help_text, samples in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {mtype}")
+            for (step, endpoint, status), recs in sorted(by_status.items()):
+                labels = f'step="{step}",endpoint="{endpoint}",status="{status}"'
+                for suffix, agg in samples:
+                    lines.append(f"{name}{suffix}{{{labels}}} {agg(recs):g}")
+        for key, value in (extra or {}).items():
+            name = f"notion_scheduler_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, extra: Optional[Dict[str, float]] = None) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(extra))
@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from parent_map import rich_text_content
+from tree_writer import fetch_block_tree, map_in_context
+from week_database import (
+    ARCHIVE_TITLE,
+    KIND_MONTH,
+    KIND_PROPERTY,
+    KIND_WEEK,
+    MONTH_TITLE,
+    MONTHLY_TOGGLE_TEXT,
+    TITLE_PROPERTY,
+    WEEK_TITLE,
+    WeekDatabase,
+)
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_EXPORT_DIR = "notion_export"
+EXPORT_WORKERS = 8       # 同時に取得するページ数（実際のペースはクライアントのスケジューラで決まる）
+TREE_WORKERS = 2         # 1ページ内で同じ階層の子を並行取得する数
+MANIFEST_FILE = "manifest.json"
+JSONL_FILE = "pages.jsonl"
+KIND_PAGE = "page"       # 週次・月次以外の子ページ
+UNSAFE_FILENAME = re.compile(r'[\x00-\x1f/\\:*?"<>|]')  # パス区切り・制御文字と Windows で使えない文字
+
+Block = Dict[str, Any]
+Target = Dict[str, str]  # {"id", "title", "kind", "created_time", "last_edited_time"}
+
+# =============================================================================
+# 対象ページの列挙
+# =============================================================================
+
+def _kind_of(title: str) -> str:
+    if WEEK_TITLE.match(title):
+        return KIND_WEEK
+    if MONTH_TITLE.match(title):
+        return KIND_MONTH
+    return KIND_PAGE
+
+def _target(block: Block) -> Target:
+    title = block["child_page"].get("title", "")
+    return {
+        "id": block["id"], "title": title, "kind": _kind_of(title),
+        "created_time": block["created_time"], "last_edited_time": block["last_edited_time"],
+    }
+
+def list_targets(list_children: Callable[[str], List[Block]], parent_id: str) -> List[Target]:
+    """
+    親ページ直下の子ページと「月別」トグル内の月次ページ、年別アーカイブページ（Archive YYYY）の下の
+    週次ページを列挙する（ページの中身は読まない）。アーカイブ先も辿るので、week_retention の move で
+    移した週も削除扱いにならず書き出し済みのファイルが残る。
+    一覧の child_page ブロックの last_edited_time はページ本体の編集で更新されるので、それを版として使う。
+    """
+    children = list_children(parent_id)
+    targets = [_target(b) for b in children if b.get("type") == "child_page"]
+    for b in children:
+        if b.get("type") == "toggle" and rich_text_content(b).strip() == MONTHLY_TOGGLE_TEXT and b.get("has_children"):
+            targets.extend(_target(c) for c in list_children(b["id"]) if c.get("type") == "child_page")
+        elif b.get("type") == "child_page" and ARCHIVE_TITLE.match(b["child_page"].get("title", "")):
+            targets.extend(_target(c) for c in list_children(b["id"]) if c.get("type") == "child_page")
+    return targets
+
+def list_database_targets(database: WeekDatabase) -> List[Target]:
+    """データベースモード: 全件の絞り込みなし検索1回（ページ送りあり）で列挙する"""
+    targets: List[Target] = []
+    for page in database.query_all():
+        props = page.get("properties", {})
+        title = "".join(
+            t.get("plain_text") or t.get("text", {}).get("content", "")
+            for t in props.get(TITLE_PROPERTY, {}).get("title", [])
+        )
+        kind = (props.get(KIND_PROPERTY, {}).get("select") or {}).get("name") or _kind_of(title)
+        targets.append({
+            "id": page["id"], "title": title, "kind": kind,
+            "created_time": page["created_time"], "last_edited_time": page["last_edited_time"],
+        })
+    return targets
+
+# =============================================================================
+# マニフェスト（ページID → 書き出した時点の last_edited_time）
+# =============================================================================
+
+def load_manifest(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"exported_at": None, "pages": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(out_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # 途中で止まっても前回のマニフェストが残る
+
+def plan_export(
+    targets: List[Target], manifest: Dict[str, Any], full: bool = False
+) -> Tuple[List[Target], List[str]]:
+    """
+    取得し直すページと、削除されたページIDを返す。
+    last_edited_time は分単位のため、前回書き出した分と同じ分に編集されたページも取得し直す。
+    戻り値: (取得するページ, 削除されたページID)
+    """
+    pages = manifest.get("pages", {})
+    boundary = (manifest.get("exported_at") or "")[:16]  # "YYYY-MM-DDTHH:MM"
+    changed = [
+        t for t in targets
+        if full
+        or t["id"] not in pages
+        or pages[t["id"]]["last_edited_time"] != t["last_edited_time"]
+        or t["last_edited_time"][:16] >= boundary
+    ]
+    alive = {t["id"] for t in targets}
+    removed = [page_id for page_id in pages if page_id not in alive]
+    return changed, removed
+
+# =============================================================================
+# Markdown
+# =============================================================================
+
+_MD_PREFIX = {
+    "heading_1": "# ",
+    "heading_2": "## ",
+    "heading_3": "### ",
+    "bulleted_list_item": "- ",
+    "numbered_list_item": "1. ",
+    "toggle": "- ",
+    "quote": "> ",
+    "callout": "> ",
+}
+
+def _markdown_line(block: Block) -> str:
+    btype = block.get("type", "")
+    obj = block.get(btype) or {}
+    text = rich_text_content(block)
+    if btype == "to_do":
+        return f"- [{'x' if obj.get('checked') else ' '}] {text}"
+    if btype == "divider":
+        return "---"
+    if btype == "code":
+        return f"```{obj.get('language', '')}\n{text}\n```"
+    if btype == "child_page":
+        return f"- 📄 {obj.get('title', '')}"
+    if btype == "link_to_page":
+        return f"- → {obj.get('page_id') or obj.get('database_id', '')}"
+    return _MD_PREFIX.get(btype, "") + text
+
+def blocks_to_markdown(blocks: List[Block], depth: int = 0) -> str:
+    """ブロックツリーを Markdown にする（子は2スペースずつ字下げ）。未対応の種類は本文だけ出す"""
+    lines: List[str] = []
+    for block in blocks:
+        indent = "  " * depth
+        lines.extend(indent + line for line in _markdown_line(block).split("\n"))
+        obj = block.get(block.get("type", "")) or {}
+        if obj.get("children"):
+            lines.append(blocks_to_markdown(obj["children"], depth + 1))
+    return "\n".join(lines)
+
+# =============================================================================
+# 書き出し
+# =============================================================================
+
+def _safe_filename(title: str) -> str:
+    """
+    タイトルをファイル名に使える形にする（ページのタイトルは誰でも付けられるので、
+    "/" や "../" で out_dir の外に書き出さないよう区切り文字を "_" にし、先頭の "." を落とす）
+    """
+    return UNSAFE_FILENAME.sub("_", title).strip().lstrip(".") or "untitled"
+
+def _page_paths(out_dir: str, target: Target) -> Tuple[str, str]:
+    """タイトルに年が無く同名がありうるため、ファイル名にはページIDの先頭も付ける"""
+    json_path = os.path.join(out_dir, "pages", f"{_safe_filename(target['id'])}.json")
+    md_name = f"{_safe_filename(target['title'])}_{_safe_filename(target['id'][:8])}.md"
+    md_path = os.path.join(out_dir, "markdown", _safe_filename(target["kind"]), md_name)
+    return json_path, md_path
+
+def _write_text(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+def export_pages(
+    list_children: Callable[[str], List[Block]],
+    targets: List[Target],
+    out_dir: str,
+    full: bool = False,
+    max_workers: int = EXPORT_WORKERS,
+) -> Dict[str, Any]:
+    """
+    変更のあったページだけをブロックツリーごと取得し（ページ単位で並行、ページ内は階層ごとに並行）、
+    pages/<ID>.json と markdown/<種類>/<タイトル>_<ID>.md に書き出す。
+    削除されたページのファイルは消し、最後に全ページ分の pages.jsonl とマニフェストを書き直す。
+    失敗したページはマニフェストを更新しないので、次回の実行で取得し直す。
+    戻り値: 件数などの集計
+    """
+    started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    manifest = load_manifest(out_dir)
+    changed, removed = plan_export(targets, manifest, full)
+
+    def export(target: Target) -> Optional[str]:
+        try:
+            tree = fetch_block_tree(list_children, target["id"], TREE_WORKERS)
+            json_path, md_path = _page_paths(out_dir, target)
+            _write_text(json_path, json.dumps(dict(target, blocks=tree), ensure_ascii=False))
+            _write_text(md_path, f"# {target['title']}\n\n{blocks_to_markdown(tree)}\n")
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        errors = map_in_context(pool, export, changed)
+
+    pages = manifest.get("pages", {})
+    for page_id in removed:
+        old = pages.pop(page_id)
+        for path in _page_paths(out_dir, dict(old, id=page_id)):
+            _remove(path)
+    failed: Dict[str, str] = {}
+    for target, error in zip(changed, errors):
+        if error:
+            failed[target["title"]] = error
+            continue
+        previous = pages.get(target["id"])
+        if previous and previous["title"] != target["title"]:  # 改名されたら古い Markdown を消す
+            _remove(_page_paths(out_dir, dict(previous, id=target["id"]))[1])
+        pages[target["id"]] = {k: target[k] for k in ("title", "kind", "created_time", "last_edited_time")}
+
+    _write_jsonl(out_dir, pages)
+    save_manifest(out_dir, {"exported_at": started_at, "pages": pages})
+    return {
+        "pages": len(targets),
+        "fetched": len(changed) - len(failed),
+        "unchanged": len(targets) - len(changed),
+        "removed": len(removed),
+        "failed": failed,
+    }
+
+def _write_jsonl(out_dir: str, pages: Dict[str, Any]) -> None:
+    """保存済みの各ページ JSON を1行ずつ連結する（API は呼ばない）"""
+    lines: List[str] = []
+    for page_id in pages:
+        path = _page_paths(out_dir, dict(pages[page_id], id=page_id))[0]
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                lines.append(f.read())
+    _write_text(os.path.join(out_dir, JSONL_FILE), "".join(line + "\n" for line in lines))
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="週次・月次ページをローカルに書き出す（2回目以降は変更分だけ）")
+    parser.add_argument("--out", default=DEFAULT_EXPORT_DIR, help=f"出力先ディレクトリ（既定: {DEFAULT_EXPORT_DIR}）")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS, help="同時に取得するページ数")
+    parser.add_argument(
+        "--database", default=None,
+        help="週次・月次ページのデータベースID（既定: NOTION_WEEK_DATABASE_ID。未指定なら親ページ直下 / 月別トグル）",
+    )
+    parser.add_argument("--full", action="store_true", help="変更の有無にかかわらず全ページ取得し直す")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from daily_plan import init_client, paginate_children
+    from http_pool import shared_pool
+    from instrumentation import ApiRecorder
+    from rate_limit import attach_scheduler
+
+    args = parse_args(argv)
+    notion, parent_id = init_client()
+    recorder = ApiRecorder().attach(notion)
+    scheduler = attach_scheduler(notion)
+    list_children = lambda block_id: paginate_children(notion, block_id)
+
+    start = time.perf_counter()
+    database_id = args.database or os.getenv("NOTION_WEEK_DATABASE_ID")
+    if database_id:
+        targets = list_database_targets(WeekDatabase(notion, database_id))
+    else:
+        targets = list_targets(list_children, parent_id)
+    result = export_pages(list_children, targets, args.out, args.full, args.workers)
+
+    for title, error in result["failed"].items():
+        print(f"❌ {title}: {error}")
+    print(
+        f"📦 {args.out}: {result['pages']}ページ（取得 {result['fetched']} / 変更なし {result['unchanged']}"
+        f" / 削除 {result['removed']} / 失敗 {len(result['failed'])}）{time.perf_counter() - start:.2f}s"
+    )
+    print(scheduler.summary())
+    print(shared_pool().summary())
+    print(recorder.summary_table())
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
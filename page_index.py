@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from block_cache import DEFAULT_CACHE_PATH
+
+# =============================================================================
+# タイトル → ページID インデックス
+# =============================================================================
+
+class PageIndex:
+    """
+    コンテナ（親ページ / 月別トグル）配下の child_page を
+    (コンテナID, タイトル) → ページID で引けるようにするローカルインデックス。
+    ページ作成時に record で追記し、未登録タイトルのときだけ呼び出し側が再走査して replace する。
+    コンテナの版（last_edited_time）も保存し、版が変わっていなければ未登録タイトルは「無い」と答えられる
+    （別プロセスの再実行でも再走査しない。is_current）。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._rescanned: set = set()  # このプロセスで再走査済みのコンテナ
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_titles ("
+                " container_id TEXT NOT NULL,"
+                " title TEXT NOT NULL,"
+                " page_id TEXT NOT NULL,"
+                " PRIMARY KEY (container_id, title))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS container_versions ("
+                " container_id TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL)"
+            )
+
+    def get(self, container_id: str, title: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_id FROM page_titles WHERE container_id = ? AND title = ?",
+                (container_id, title),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, container_id: str, title: str, page_id: str) -> None:
+        """ページ作成時にインデックスへ追記"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_titles (container_id, title, page_id) VALUES (?, ?, ?)",
+                (container_id, title, page_id),
+            )
+
+    def replace(self, container_id: str, entries: Iterable[Tuple[str, str]], version: Optional[str] = None) -> None:
+        """
+        再走査結果 [(タイトル, ページID), ...] でコンテナ分を置き換える。
+        タイトルに年が無いため同名ページは年をまたいで重複しうる。後に出てきたもの（最新）を残す。
+        version は走査前に取ったコンテナの last_edited_time（無ければ版の記録を消す）。
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM page_titles WHERE container_id = ?", (container_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO page_titles (container_id, title, page_id) VALUES (?, ?, ?)",
+                [(container_id, title, page_id) for title, page_id in entries],
+            )
+            self._set_version(container_id, version)
+            self._rescanned.add(container_id)
+
+    def mark_current(self, container_id: str, version: str) -> None:
+        """
+        走査済みのコンテナに自分で書き込んだ（record した）後の版を記録する。
+        このプロセスで走査・確認していないコンテナは、手で作られたページを取りこぼしうるので記録しない。
+        """
+        with self._lock, self._conn:
+            if container_id in self._rescanned:
+                self._set_version(container_id, version)
+
+    def is_current(self, container_id: str, version: str) -> bool:
+        """
+        保存した版から変わっていなければ True（インデックスは全件そろっている）。
+        True のときはこのプロセスでは走査済みとして扱う。
+        ※ last_edited_time は分単位のため、記録と同じ分の中の編集は検知できない（BlockCache と同じ）。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM container_versions WHERE container_id = ?", (container_id,)
+            ).fetchone()
+            if row is None or row[0] != version:
+                return False
+            self._rescanned.add(container_id)
+            return True
+
+    def _set_version(self, container_id: str, version: Optional[str]) -> None:
+        if version is None:
+            self._conn.execute("DELETE FROM container_versions WHERE container_id = ?", (container_id,))
+        else:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO container_versions (container_id, version) VALUES (?, ?)",
+                (container_id, version),
+            )
+
+    def rescanned(self, container_id: str) -> bool:
+        """このプロセスで既に再走査した（または版が変わっていないと確かめた）か（同じ実行中に何度も全走査しないため）"""
+        return container_id in self._rescanned
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def child_page_entries(blocks: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """子ブロック一覧から (タイトル, ページID) を取り出す"""
+    return [
+        (b["child_page"].get("title", ""), b["id"])
+        for b in blocks
+        if b.get("type") == "child_page"
+    ]
@@ -0,0 +1,76 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+Block = Dict[str, Any]
+
+# =============================================================================
+# 親ページの構造マップ（1回の全件走査で作り、実行中の検索はすべてここから引く）
+# =============================================================================
+
+def rich_text_content(block: Block) -> str:
+    """ブロックの rich_text を連結した本文"""
+    obj = block.get(block.get("type", ""), {})
+    return "".join(
+        rt.get("plain_text") or rt.get("text", {}).get("content", "")
+        for rt in obj.get("rich_text", [])
+    )
+
+class ParentMap:
+    """
+    親ページ直下の 週次ページ（タイトル → ID）・トグル（本文 → ID）と、
+    指定トグル（"月別" など）内の月次ページ（タイトル → ID）を保持する。
+    タイトルに年が無いため同名ページは後に出てきたもの（最新）を、同名トグルは先頭のものを使う。
+    実行中に作成したページ・トグルは record_* で反映する。
+    """
+
+    def __init__(self, parent_id: str) -> None:
+        self.parent_id = parent_id
+        self.pages: Dict[str, str] = {}
+        self.toggles: Dict[str, str] = {}
+        self.toggle_pages: Dict[str, Dict[str, str]] = {}
+
+    def page(self, title: str) -> Optional[str]:
+        return self.pages.get(title)
+
+    def toggle(self, text: str) -> Optional[str]:
+        return self.toggles.get(text)
+
+    def page_in_toggle(self, toggle_id: str, title: str) -> Optional[str]:
+        return self.toggle_pages.get(toggle_id, {}).get(title)
+
+    def record_page(self, title: str, page_id: str) -> None:
+        self.pages[title] = page_id
+
+    def record_toggle(self, text: str, toggle_id: str) -> None:
+        self.toggles.setdefault(text, toggle_id)
+        self.toggle_pages.setdefault(toggle_id, {})
+
+    def record_page_in_toggle(self, toggle_id: str, title: str, page_id: str) -> None:
+        self.toggle_pages.setdefault(toggle_id, {})[title] = page_id
+
+def _page_titles(blocks: List[Block]) -> Dict[str, str]:
+    return {b["child_page"].get("title", ""): b["id"] for b in blocks if b.get("type") == "child_page"}
+
+def build_parent_map(
+    list_children: Callable[[str], List[Block]],
+    parent_id: str,
+    toggle_texts: Iterable[str] = (),
+) -> ParentMap:
+    """
+    親ページ直下を1回だけ全件走査し、toggle_texts のトグルは中身も1回ずつ走査して ParentMap を作る。
+    list_children は1ブロック分の子一覧を全件返す関数（daily_plan.paginate_children など）。
+    """
+    structure = ParentMap(parent_id)
+    children = list_children(parent_id)
+    structure.pages = _page_titles(children)
+    for b in children:
+        if b.get("type") == "toggle":
+            structure.toggles.setdefault(rich_text_content(b).strip(), b["id"])
+
+    for text in toggle_texts:
+        toggle_id = structure.toggle(text)
+        if toggle_id is None:
+            continue
+        block = next(b for b in children if b["id"] == toggle_id)
+        inner = list_children(toggle_id) if block.get("has_children") else []
+        structure.toggle_pages[toggle_id] = _page_titles(inner)
+    return structure
@@ -0,0 +1,243 @@
+import contextvars
+import heapq
+import inspect
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_RATE = 3.0   # Notion API の平均上限（req/s, インテグレーション単位）。NOTION_RATE_LIMIT で上書き可
+DEFAULT_BURST = 3    # バケット容量
+MIN_RATE = 0.5       # 429 を受けて絞るときの下限
+RECOVERY_STEP = 0.1  # 成功ごとに戻すレート（AIMD の加算分）
+
+PRIORITY_READ = 0    # 小さいほど先に通す
+PRIORITY_WRITE = 1
+
+MAX_RETRIES = 6
+BASE_BACKOFF = 1.0   # Retry-After が無いときの初期待ち秒
+MAX_BACKOFF = 30.0
+RETRYABLE_READ_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_WRITE_STATUSES = {429}  # 書き込みは未処理が確実な 429 だけ再送（5xx は二重作成の恐れ）
+
+current_attempt: contextvars.ContextVar[int] = contextvars.ContextVar("current_attempt", default=0)  # 0: 初回, 1以上: 再送
+
+# =============================================================================
+# トークンバケット（優先度付き待ち行列）
+# =============================================================================
+
+class TokenBucket:
+    """
+    スレッドセーフなトークンバケット。待ちが複数あるときは priority の小さい順に通す。
+    429 を受けたら pause でバケット全体を止め、レートを半減して成功ごとに少しずつ戻す。
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> None:
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority: int = PRIORITY_READ) -> float:
+        """トークンを1つ取得する。戻り値: 待った秒数"""
+        start = time.monotonic()
+        with self._cond:
+            me = (priority, next(self._seq))
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == me and now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return time.monotonic() - start
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    else:
+                        timeout = max((1 - self._tokens) / self.rate, 0.001)
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(me)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Retry-After 分だけ全リクエストを止め、レートを半減する"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._tokens = 0.0
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + RECOVERY_STEP)
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(token: str, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> TokenBucket:
+    """インテグレーショントークンごとに1つのバケットを共有する"""
+    with _buckets_lock:
+        if token not in _buckets:
+            _buckets[token] = TokenBucket(rate, burst)
+        return _buckets[token]
+
+# =============================================================================
+# リクエストスケジューラ
+# =============================================================================
+
+def _is_read(method: str, path: str) -> bool:
+    # search / databases.query は POST だが読み取り扱い
+    return method.upper() == "GET" or path.endswith("/query") or path == "search"
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class RequestScheduler:
+    """
+    Client.request を包んでレート制御・再送を行う。
+    attach(notion) すると blocks / pages など全エンドポイントの呼び出しがここを通る。
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        max_retries: int = MAX_RETRIES,
+        base_backoff: float = BASE_BACKOFF,
+        max_backoff: float = MAX_BACKOFF,
+    ) -> None:
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.stats: Dict[str, float] = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "throttled_sec": 0.0,  # バケット待ち
+            "backoff_sec": 0.0,    # 429/5xx 後の待ち
+        }
+
+    def _add(self, key: str, value: float) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        # 同時に待っているスレッドが一斉に再送しないようジッターを足す
+        return delay + random.uniform(0, delay * 0.25)
+
+    def _should_retry(self, error: Exception, method: str, path: str, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        status = getattr(error, "status", None)
+        allowed = RETRYABLE_READ_STATUSES if _is_read(method, path) else RETRYABLE_WRITE_STATUSES
+        return status in allowed
+
+    def wrap(self, request: Callable[..., Any]) -> Callable[..., Any]:
+        def scheduled(path: str, method: str, **kwargs: Any) -> Any:
+            priority = PRIORITY_READ if _is_read(method, path) else PRIORITY_WRITE
+            attempt = 0
+            while True:
+                self._add("throttled_sec", self.bucket.acquire(priority))
+                self._add("requests", 1)
+                current_attempt.set(attempt)
+                try:
+                    result = request(path=path, method=method, **kwargs)
+                except Exception as e:
+                    if not self._should_retry(e, method, path, attempt):
+                        raise
+                    delay = self._backoff(e, attempt)
+                    if getattr(e, "status", None) == 429:
+                        self._add("rate_limited", 1)
+                        self.bucket.pause(delay)
+                    self._add("retries", 1)
+                    self._add("backoff_sec", delay)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.bucket.on_success()
+                return result
+
+        return scheduled
+
+    def wrap_async(self, request: Callable[..., Any]) -> Callable[..., Any]:
+        import asyncio  # 同期クライアントだけの実行（cron 等）では読み込まない
+
+        async def scheduled(path: str, method: str, **kwargs: Any) -> Any:
+            priority = PRIORITY_READ if _is_read(method, path) else PRIORITY_WRITE
+            attempt = 0
+            while True:
+                self._add("throttled_sec", await asyncio.to_thread(self.bucket.acquire, priority))
+                self._add("requests", 1)
+                current_attempt.set(attempt)
+                try:
+                    result = await request(path=path, method=method, **kwargs)
+                except Exception as e:
+                    if not self._should_retry(e, method, path, attempt):
+                        raise
+                    delay = self._backoff(e, attempt)
+                    if getattr(e, "status", None) == 429:
+                        self._add("rate_limited", 1)
+                        self.bucket.pause(delay)
+                    self._add("retries", 1)
+                    self._add("backoff_sec", delay)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self.bucket.on_success()
+                return result
+
+        return scheduled
+
+    def attach(self, notion: Any) -> Any:
+        """notion.request を差し替える（Client / AsyncClient どちらも可）"""
+        original = notion.request
+        if inspect.iscoroutinefunction(original):
+            notion.request = self.wrap_async(original)
+        else:
+            notion.request = self.wrap(original)
+        return notion
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"📊 API {int(s['requests'])}回 / 再送 {int(s['retries'])}回"
+            f"（429: {int(s['rate_limited'])}回）/ 待機 {s['throttled_sec']:.1f}s"
+            f" / バックオフ {s['backoff_sec']:.1f}s"
+        )
+
+def attach_scheduler(notion: Any, rate: Optional[float] = None, burst: int = DEFAULT_BURST) -> RequestScheduler:
+    """クライアントのトークンに対応するバケットでスケジューラを作って取り付ける"""
+    if rate is None:
+        rate = float(os.getenv("NOTION_RATE_LIMIT") or DEFAULT_RATE)
+    scheduler = RequestScheduler(bucket_for(notion.options.auth or "", rate, burst))
+    scheduler.attach(notion)
+    return scheduler
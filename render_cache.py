@@ -0,0 +1,152 @@
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from template_renderer import RENDERER_VERSION
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_MAX_WEEKS = 64  # 保持する展開済みの週の数（メモリ・ディスクそれぞれ。超えたら最近使っていないものから捨てる）
+MAX_DIGESTS = 8         # ハッシュ計算済みとして覚えておくテンプレの数
+
+Block = Dict[str, Any]
+
+# =============================================================================
+# 展開済み週ブロックのキャッシュ
+# =============================================================================
+
+def template_hash(blocks: List[Block]) -> str:
+    """
+    テンプレ内容 + 展開処理のバージョンのハッシュ。
+    テンプレを編集する・展開処理を変える（RENDERER_VERSION を上げる）とハッシュが変わり、古い展開結果は使われなくなる
+    """
+    text = json.dumps(blocks, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{RENDERER_VERSION}:{text}".encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """
+    (テンプレのハッシュ, 週の月曜) → 展開済みの1週間分ブロック をプロセス内に保持する（LRU）。
+    展開結果はテンプレ内容と日付だけで決まるため、複数ワークスペース・常駐プロセスの繰り返し実行で使い回せる。
+    path を渡すと SQLite（BlockCache と同じファイル）にも1行1ブロックの JSON で保存し、stream で読み書きする
+    （別プロセスの再実行・dry-run 用。既定では使わない: コンパイル済みテンプレの展開は速く、
+    読み書きのほうが重いことが多い。ディスク側も最終使用時刻で max_weeks 週までに絞る）。
+    返すブロックは共有されるので書き換えないこと（materialize_week_blocks_from_template の戻り値と同じ）。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_weeks: int = DEFAULT_MAX_WEEKS) -> None:
+        self.path = path
+        self.max_weeks = max_weeks
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._weeks: "OrderedDict[Tuple[str, str], List[Block]]" = OrderedDict()
+        self._digests: Dict[int, Tuple[List[Block], str]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS rendered_weeks ("
+                    " template_hash TEXT NOT NULL,"
+                    " week TEXT NOT NULL,"
+                    " payload TEXT NOT NULL,"
+                    " last_used REAL NOT NULL,"
+                    " PRIMARY KEY (template_hash, week))"
+                )
+
+    def digest(self, template_blocks: List[Block]) -> str:
+        """template_hash を同じリストについては1回だけ計算する（リストは参照を保持するので ID は再利用されない）"""
+        with self._lock:
+            entry = self._digests.get(id(template_blocks))
+        if entry is not None:
+            return entry[1]
+        value = template_hash(template_blocks)
+        with self._lock:
+            self._digests[id(template_blocks)] = (template_blocks, value)
+            while len(self._digests) > MAX_DIGESTS:
+                del self._digests[next(iter(self._digests))]
+        return value
+
+    # --- メモリ（週全体のリスト） ---
+    def get(self, template_hash: str, week: str) -> Optional[List[Block]]:
+        with self._lock:
+            blocks = self._weeks.get((template_hash, week))
+            if blocks is None:
+                self.misses += 1
+                return None
+            self._weeks.move_to_end((template_hash, week))
+            self.hits += 1
+            return blocks
+
+    def put(self, template_hash: str, week: str, blocks: List[Block]) -> None:
+        with self._lock:
+            self._weeks[(template_hash, week)] = blocks
+            self._weeks.move_to_end((template_hash, week))
+            while len(self._weeks) > self.max_weeks:
+                self._weeks.popitem(last=False)
+
+    # --- ディスク（1ブロックずつ） ---
+    def stream(self, template_hash: str, week: str, render: Callable[[], Iterable[Block]]) -> Iterator[Block]:
+        """
+        ディスクにあれば保存済みのブロックを1つずつ読み出して返し、無ければ render() の結果を返しながら書き出す
+        （週全体をブロックのリストにしない）。最後まで読まれなかった展開は保存しない。path が無ければ render() のまま
+        """
+        if self._conn is None:
+            yield from render()
+            return
+        key = (template_hash, week)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT payload FROM rendered_weeks WHERE template_hash = ? AND week = ?", key
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE rendered_weeks SET last_used = ? WHERE template_hash = ? AND week = ?",
+                    (time.time(),) + key,
+                )
+                self.hits += 1
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        if row is not None:
+            for line in io.StringIO(row[0]):
+                yield json.loads(line)
+            return
+
+        lines: List[str] = []
+        for block in render():
+            lines.append(json.dumps(block, ensure_ascii=False, separators=(",", ":")))
+            yield block
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rendered_weeks (template_hash, week, payload, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                key + ("\n".join(lines), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM rendered_weeks WHERE rowid NOT IN"
+                " (SELECT rowid FROM rendered_weeks ORDER BY last_used DESC LIMIT ?)",
+                (self.max_weeks,),
+            )
+
+    def __len__(self) -> int:
+        return len(self._weeks)
+
+    def summary(self) -> str:
+        return (
+            f"🧩 展開キャッシュ: ヒット {self.hits}（うちディスク {self.disk_hits}）/ ミス {self.misses}"
+            f"（保持 {len(self)} 週）"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
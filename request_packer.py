@@ -0,0 +1,126 @@
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+# =============================================================================
+# 設定 / 定数（Notion API のリクエストサイズ上限）
+# =============================================================================
+
+MAX_CHILDREN = 100               # 1つの children 配列の要素数
+MAX_BLOCKS_PER_REQUEST = 1000    # 1リクエストに含められるブロック総数（入れ子含む）
+MAX_PAYLOAD_BYTES = 500_000      # 1リクエストのボディサイズ
+ENVELOPE_BYTES = 2_000           # parent / properties など children 以外に見込む分
+
+Block = Dict[str, Any]
+T = TypeVar("T")
+
+_ENCODER = json.JSONEncoder()  # ensure_ascii=True なので文字数 = バイト数
+
+# =============================================================================
+# 計測
+# =============================================================================
+
+def serialized_size(block: Any) -> int:
+    """
+    JSON にしたときのバイト数。HTTP クライアントの実装差（ASCII エスケープ・区切り空白）があるため、
+    大きく出る json.dumps の既定設定で測る。
+    """
+    return len(_ENCODER.encode(block))
+
+def _children(block: Block) -> List[Block]:
+    btype = block.get("type")
+    obj = block.get(btype) if btype else None
+    if not isinstance(obj, dict):
+        return []
+    return obj.get("children") or []
+
+def nested_block_count(block: Block) -> int:
+    """自身を含む入れ子ブロックの総数"""
+    return 1 + sum(nested_block_count(c) for c in _children(block))
+
+def _arrays_within_limit(block: Block) -> bool:
+    children = _children(block)
+    return len(children) <= MAX_CHILDREN and all(_arrays_within_limit(c) for c in children)
+
+def fits_in_one_request(block: Block, reserve_bytes: int = ENVELOPE_BYTES) -> bool:
+    """子孫ごと1リクエストに載るか（どの children 配列も件数上限内で、総数・サイズも上限内）"""
+    if not _children(block):
+        return True  # 子のないブロック1つがサイズ上限を超えることはない（rich_text 自体に上限がある）
+    return (
+        _arrays_within_limit(block)
+        and nested_block_count(block) <= MAX_BLOCKS_PER_REQUEST
+        and serialized_size(block) + 2 <= MAX_PAYLOAD_BYTES - reserve_bytes
+    )
+
+# =============================================================================
+# 詰め込み
+# =============================================================================
+
+def pack_ranges(blocks: List[Block], reserve_bytes: int = ENVELOPE_BYTES) -> List[Tuple[int, int]]:
+    """
+    blocks を順序を保ったまま、件数・入れ子込みブロック数・バイト数の上限いっぱいまで詰めた
+    リクエスト単位に分け、(開始, 終了) の範囲で返す。
+    先頭から貪欲に詰めるのが、順序を保つ分割ではリクエスト数最小になる。
+    サイズはまず候補の範囲をまとめて1回で測り、超えたときだけ1ブロックずつ測って縮める。
+    単体で上限を超えるブロックはそれだけで1リクエストにする（API 側でエラーになる）。
+    """
+    ranges: List[Tuple[int, int]] = []
+    budget = MAX_PAYLOAD_BYTES - reserve_bytes
+    start = 0
+    while start < len(blocks):
+        # 件数・ブロック数で取れるところまで
+        end = start
+        count = 0
+        while end < len(blocks) and end - start < MAX_CHILDREN:
+            blk_count = nested_block_count(blocks[end])
+            if count + blk_count > MAX_BLOCKS_PER_REQUEST and end > start:
+                break
+            count += blk_count
+            end += 1
+        # サイズで縮める（配列の JSON は "[" + 要素を ", " で連結 + "]"。iter_packed と同じ数え方）
+        if end - start > 1 and serialized_size(blocks[start:end]) > budget:
+            size = 2 + serialized_size(blocks[start])
+            cut = start + 1
+            while cut < end:
+                size += 2 + serialized_size(blocks[cut])
+                if size > budget:
+                    break
+                cut += 1
+            end = cut
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def pack_blocks(blocks: List[Block], reserve_bytes: int = ENVELOPE_BYTES) -> List[List[Block]]:
+    """pack_ranges の範囲でブロックを分割したリスト"""
+    return [blocks[s:e] for s, e in pack_ranges(blocks, reserve_bytes)]
+
+def iter_packed(
+    items: Iterable[T],
+    request_form: Callable[[T], Block] = lambda blk: blk,
+    reserve_bytes: int = ENVELOPE_BYTES,
+) -> Iterator[List[T]]:
+    """
+    pack_ranges の逐次版。items を先頭から1つずつ読み、実際に送る形 request_form(item) が
+    件数・入れ子込みブロック数・バイト数の上限に収まる単位で items のリストを返す。
+    分割位置は pack_ranges と同じ（どちらも先頭から貪欲に詰める）。
+    手元に持つのは作りかけの1リクエスト分だけなので、items が遅延生成なら全体を展開しない。
+    """
+    budget = MAX_PAYLOAD_BYTES - reserve_bytes
+    batch: List[T] = []
+    count = size = 0
+    for item in items:
+        blk = request_form(item)
+        blk_count = nested_block_count(blk)
+        blk_size = serialized_size(blk)
+        if batch and (
+            len(batch) >= MAX_CHILDREN
+            or count + blk_count > MAX_BLOCKS_PER_REQUEST
+            or size + 2 + blk_size > budget
+        ):
+            yield batch
+            batch, count, size = [], 0, 0
+        batch.append(item)
+        count += blk_count
+        size += 2 + blk_size
+    if batch:
+        yield batch
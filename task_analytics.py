@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from daily_plan import MONTHLY_TASK_TITLE, format_mmdd
+from parent_map import rich_text_content
+from week_database import KIND_WEEK, infer_week_monday
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+DEFAULT_STORE_PATH = "task_store.npz"
+NO_DAY = -1              # 日の見出しより前（Monthly TASK など）
+TODO_TYPE = "to_do"
+WEEKDAY_LABELS = ["月", "火", "水", "木", "金", "土", "日"]
+
+Block = Dict[str, Any]
+
+def _numpy() -> Any:
+    """numpy は集計を使うときだけ読み込む（無ければ導入方法を示して止める）"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("集計には numpy が必要です（pip install numpy）。") from None
+    return numpy
+
+# =============================================================================
+# ブロックツリー → 行
+# =============================================================================
+
+def _children(block: Block) -> List[Block]:
+    obj = block.get(block.get("type", "")) or {}
+    return obj.get("children") or []
+
+def week_rows(monday: datetime, blocks: List[Block]) -> List[Tuple[int, str, bool, bool]]:
+    """
+    週次ページのブロックツリー（paginate_children / fetch_block_tree の結果）を
+    (曜日 0〜6 または NO_DAY, ブロック種別, チェック済みか, Monthly TASK 内か) の行にする。
+    日の区切りは、その週の各日の mmdd を含む直下ブロック（テンプレの "XXXX" 見出し）で判定する。
+    """
+    day_marks = [format_mmdd(monday + timedelta(days=i)) for i in range(7)]
+    rows: List[Tuple[int, str, bool, bool]] = []
+
+    def walk(block: Block, day: int, monthly: bool) -> None:
+        btype = block.get("type", "")
+        checked = bool((block.get(btype) or {}).get("checked")) if btype == TODO_TYPE else False
+        rows.append((day, btype, checked, monthly))
+        for child in _children(block):
+            walk(child, day, monthly)
+
+    day = NO_DAY
+    for block in blocks:
+        text = rich_text_content(block)
+        if day < 6 and day_marks[day + 1] in text:
+            day += 1
+        monthly = block.get("type") == "toggle" and text.strip() == MONTHLY_TASK_TITLE
+        walk(block, day if not monthly else NO_DAY, monthly)
+    return rows
+
+# =============================================================================
+# 列指向ストア
+# =============================================================================
+
+class TaskStore:
+    """
+    全週次ページのブロックを1ブロック1行の列（NumPy 配列）で持つ。
+    列: week（週の月曜。1970-01-01 からの日数） / day（曜日、NO_DAY） / type（種別コード） /
+        checked / monthly（Monthly TASK 内か） / page（ページ番号）
+    ページごとに取得時の last_edited_time を覚えておき、変わったページの行だけ入れ替える。
+    集計はすべて配列演算（マスク + bincount）で行う。
+    """
+
+    COLUMNS = ("week", "day", "type", "checked", "monthly", "page")
+
+    def __init__(self) -> None:
+        np = _numpy()
+        self.week = np.zeros(0, dtype=np.int32)
+        self.day = np.zeros(0, dtype=np.int8)
+        self.type = np.zeros(0, dtype=np.int16)
+        self.checked = np.zeros(0, dtype=bool)
+        self.monthly = np.zeros(0, dtype=bool)
+        self.page = np.zeros(0, dtype=np.int32)
+        self.types: List[str] = []
+        self.page_ids: List[str] = []
+        self.page_versions: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.week)
+
+    # --- 保存 / 読み込み ---
+    @classmethod
+    def load(cls, path: str) -> "TaskStore":
+        np = _numpy()
+        store = cls()
+        if not os.path.exists(path):
+            return store
+        with np.load(path) as data:
+            for name in cls.COLUMNS:
+                setattr(store, name, data[name])
+            store.types = data["types"].tolist()
+            store.page_ids = data["page_ids"].tolist()
+            store.page_versions = data["page_versions"].tolist()
+        return store
+
+    def save(self, path: str) -> None:
+        np = _numpy()
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            **{name: getattr(self, name) for name in self.COLUMNS},
+            types=np.array(self.types, dtype=str),
+            page_ids=np.array(self.page_ids, dtype=str),
+            page_versions=np.array(self.page_versions, dtype=str),
+        )
+        os.replace(tmp, path)
+
+    # --- 取り込み ---
+    def version(self, page_id: str) -> Optional[str]:
+        try:
+            return self.page_versions[self.page_ids.index(page_id)]
+        except ValueError:
+            return None
+
+    def ingest(self, pages: Iterable[Tuple[str, str, datetime, List[Block]]], removed: Iterable[str] = ()) -> int:
+        """
+        (ページID, last_edited_time, 週の月曜, ブロックツリー) の各ページの行を入れ替え、removed のページの行を消す。
+        既存行の削除と追加はまとめて1回の配列演算で行う。戻り値: 取り込んだページ数
+        """
+        np = _numpy()
+        codes = {t: i for i, t in enumerate(self.types)}
+        page_codes = {p: i for i, p in enumerate(self.page_ids)}
+        drop: List[int] = [page_codes[p] for p in removed if p in page_codes]
+        new_cols: Dict[str, List[Any]] = {name: [] for name in self.COLUMNS}
+        count = 0
+        for page_id, version, monday, blocks in pages:
+            if page_id in page_codes:
+                code = page_codes[page_id]
+                drop.append(code)
+                self.page_versions[code] = version
+            else:
+                code = page_codes[page_id] = len(self.page_ids)
+                self.page_ids.append(page_id)
+                self.page_versions.append(version)
+            week = (monday.date() - date(1970, 1, 1)).days
+            for day, btype, checked, monthly in week_rows(monday, blocks):
+                if btype not in codes:
+                    codes[btype] = len(self.types)
+                    self.types.append(btype)
+                new_cols["week"].append(week)
+                new_cols["day"].append(day)
+                new_cols["type"].append(codes[btype])
+                new_cols["checked"].append(checked)
+                new_cols["monthly"].append(monthly)
+                new_cols["page"].append(code)
+            count += 1
+
+        keep = ~np.isin(self.page, np.array(drop, dtype=np.int32)) if drop else slice(None)
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate([old[keep], np.array(new_cols[name], dtype=old.dtype)]))
+        if removed:
+            gone = set(removed)
+            self.page_versions = [("" if p in gone else v) for p, v in zip(self.page_ids, self.page_versions)]
+        return count
+
+    # --- 集計 ---
+    def _mask(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Any:
+        np = _numpy()
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.week >= np.datetime64(since, "D").astype(np.int64)
+        if until is not None:
+            mask &= self.week <= np.datetime64(until, "D").astype(np.int64)
+        return mask
+
+    def _todo(self) -> Any:
+        try:
+            return self.type == self.types.index(TODO_TYPE)
+        except ValueError:
+            return self.type < 0  # to_do が1件も無い
+
+    def _by_week(self, mask: Any, weights: Any) -> Tuple[Any, Any, Any]:
+        """
+        mask の行を週ごとに数える（週の月曜は7日おきなので、並べ替えずに bincount で済む）。
+        戻り値: (行のある週, 件数, weights の合計)
+        """
+        np = _numpy()
+        weeks = self.week[mask]
+        if len(weeks) == 0:
+            return weeks.astype("datetime64[D]"), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first = int(weeks.min())
+        slot = (weeks - first) // 7
+        total = np.bincount(slot)
+        summed = np.bincount(slot, weights=weights).astype(np.int64)
+        present = np.flatnonzero(total)
+        return (first + 7 * present).astype("datetime64[D]"), total[present], summed[present]
+
+    def completion_by_week(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Dict[str, Any]:
+        """週ごとの日別 to_do（Monthly TASK 以外）の件数・完了数・完了率"""
+        np = _numpy()
+        mask = self._mask(since, until) & self._todo() & ~self.monthly
+        weeks, total, done = self._by_week(mask, self.checked[mask])
+        return {
+            "week": weeks,
+            "total": total,
+            "done": done,
+            "rate": np.divide(done, total, out=np.zeros(len(weeks)), where=total > 0),
+        }
+
+    def monthly_carry_over(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Dict[str, Any]:
+        """週ごとの Monthly TASK 内 to_do の件数と、未完了（次週へ持ち越される）件数"""
+        mask = self._mask(since, until) & self._todo() & self.monthly
+        weeks, total, open_ = self._by_week(mask, ~self.checked[mask])
+        return {"week": weeks, "total": total, "open": open_}
+
+    def weekday_load(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Dict[str, Any]:
+        """曜日ごとの to_do 件数・完了数（忙しい曜日の把握用）"""
+        np = _numpy()
+        mask = self._mask(since, until) & self._todo() & (self.day >= 0)
+        total = np.bincount(self.day[mask], minlength=7)
+        done = np.bincount(self.day[mask], weights=self.checked[mask], minlength=7).astype(np.int64)
+        return {"weekday": np.array(WEEKDAY_LABELS), "total": total, "done": done}
+
+    def type_counts(self, since: Optional[Any] = None, until: Optional[Any] = None) -> Dict[str, int]:
+        np = _numpy()
+        counts = np.bincount(self.type[self._mask(since, until)], minlength=len(self.types))
+        return {t: int(c) for t, c in zip(self.types, counts)}
+
+# =============================================================================
+# 書き出し済みページ（page_export）からの取り込み
+# =============================================================================
+
+def ingest_export(store: TaskStore, export_dir: str) -> Dict[str, int]:
+    """
+    page_export の出力（manifest.json と pages/<ID>.json）から週次ページを取り込む（API は呼ばない）。
+    last_edited_time が前回取り込み時と同じページは読まない。
+    """
+    from page_export import load_manifest
+
+    manifest = load_manifest(export_dir)
+    weeks = {pid: p for pid, p in manifest["pages"].items() if p["kind"] == KIND_WEEK}
+    changed = [pid for pid, p in weeks.items() if store.version(pid) != p["last_edited_time"]]
+    removed = [pid for pid, v in zip(store.page_ids, store.page_versions) if v and pid not in weeks]
+
+    def pages() -> Iterable[Tuple[str, str, datetime, List[Block]]]:
+        for pid in changed:
+            with open(os.path.join(export_dir, "pages", f"{pid}.json"), encoding="utf-8") as f:
+                page = json.load(f)
+            monday = infer_week_monday(page["title"], page.get("created_time") or page["last_edited_time"])
+            if monday is not None:
+                yield pid, page["last_edited_time"], monday, page["blocks"]
+
+    ingested = store.ingest(pages(), removed)
+    return {"weeks": len(weeks), "ingested": ingested, "removed": len(removed)}
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="週次ページの to_do を集計する（page_export の出力から）")
+    parser.add_argument("--export", default="notion_export", help="page_export の出力先ディレクトリ")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help=f"列指向ストア（既定: {DEFAULT_STORE_PATH}）")
+    parser.add_argument("--since", default=None, help="集計する最初の週 YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help="集計する最後の週 YYYY-MM-DD")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = TaskStore.load(args.store)
+    result = ingest_export(store, args.export)
+    store.save(args.store)
+    print(f"📥 週次ページ {result['weeks']} 件（取り込み {result['ingested']} / 削除 {result['removed']}）{len(store)} 行")
+
+    start = time.perf_counter()
+    completion = store.completion_by_week(args.since, args.until)
+    carry = store.monthly_carry_over(args.since, args.until)
+    load = store.weekday_load(args.since, args.until)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print("\n週        to_do  完了  完了率")
+    for week, total, done, rate in zip(completion["week"], completion["total"], completion["done"], completion["rate"]):
+        print(f"{week}  {total:>5} {done:>5}  {rate:6.1%}")
+    print("\n週        Monthly TASK  持ち越し")
+    for week, total, open_ in zip(carry["week"], carry["total"], carry["open"]):
+        print(f"{week}  {total:>12} {open_:>9}")
+    print("\n曜日  to_do  完了")
+    for label, total, done in zip(load["weekday"], load["total"], load["done"]):
+        print(f"{label}    {total:>5} {done:>5}")
+    print(f"\n⏱ 集計 {elapsed:.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 展開結果の形が変わる変更をしたら上げる（展開キャッシュのキーに含まれ、古い展開結果が使われなくなる）
+RENDERER_VERSION = 1
+
+# =============================================================================
+# テンプレートのコンパイル
+# =============================================================================
+# テンプレを一度だけ走査して「どの深さの、どの rich_text スパンにプレースホルダーがあるか」を記録し、
+# 描画時はその経路だけを浅くコピーする。プレースホルダーを含まない部分木は全日で同じオブジェクトを共有するため、
+# 描画結果は読み取り専用として扱うこと（API に渡して JSON 化するだけなら問題ない）。
+
+_Parts = List[str]  # 偶数番目: リテラル / 奇数番目: プレースホルダー名
+
+class _BlockPatch:
+    __slots__ = ("spans", "children")
+
+    def __init__(self) -> None:
+        self.spans: List[Tuple[int, _Parts]] = []                 # (rich_text の位置, 分割済みテキスト)
+        self.children: List[Tuple[int, "_BlockPatch"]] = []       # (children の位置, 子のパッチ)
+
+class CompiledTemplate:
+    """compile_template の結果。render(values) で1日分のブロック列を返す"""
+
+    def __init__(self, blocks: List[Dict[str, Any]], patches: List[Optional[_BlockPatch]]) -> None:
+        self.blocks = blocks
+        self.patches = patches
+
+    def render(self, values: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [
+            blk if patch is None else _render_block(blk, patch, values)
+            for blk, patch in zip(self.blocks, self.patches)
+        ]
+
+def compile_template(blocks: List[Dict[str, Any]], placeholders: Iterable[str]) -> CompiledTemplate:
+    """サニタイズ済みテンプレブロック群をコンパイルする"""
+    keys = sorted(placeholders, key=len, reverse=True)  # 長いものを優先してマッチ
+    pattern = re.compile("(" + "|".join(re.escape(k) for k in keys) + ")") if keys else None
+    return CompiledTemplate(blocks, [_compile_block(b, pattern) for b in blocks])
+
+def _compile_block(block: Dict[str, Any], pattern: Optional["re.Pattern[str]"]) -> Optional[_BlockPatch]:
+    btype = block.get("type")
+    obj = block.get(btype) if btype else None
+    if pattern is None or not isinstance(obj, dict):
+        return None
+
+    patch = _BlockPatch()
+    for i, rt in enumerate(obj.get("rich_text", [])):
+        if rt.get("type") != "text":
+            continue
+        parts = pattern.split(rt["text"]["content"])
+        if len(parts) > 1:
+            patch.spans.append((i, parts))
+
+    for i, child in enumerate(obj.get("children", [])):
+        child_patch = _compile_block(child, pattern)
+        if child_patch is not None:
+            patch.children.append((i, child_patch))
+
+    if not patch.spans and not patch.children:
+        return None
+    return patch
+
+# =============================================================================
+# 描画
+# =============================================================================
+
+def _render_block(block: Dict[str, Any], patch: _BlockPatch, values: Dict[str, str]) -> Dict[str, Any]:
+    btype = block["type"]
+    obj = dict(block[btype])
+
+    if patch.spans:
+        rich_text = list(obj["rich_text"])
+        for i, parts in patch.spans:
+            content = "".join(values[p] if k % 2 else p for k, p in enumerate(parts))
+            span = dict(rich_text[i])
+            span["text"] = dict(span["text"], content=content)
+            if "plain_text" in span:
+                span["plain_text"] = content
+            rich_text[i] = span
+        obj["rich_text"] = rich_text
+
+    if patch.children:
+        children = list(obj["children"])
+        for i, child_patch in patch.children:
+            children[i] = _render_block(children[i], child_patch, values)
+        obj["children"] = children
+
+    rendered = dict(block)
+    rendered[btype] = obj
+    return rendered
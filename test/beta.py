@@ -1,14 +1,49 @@
+import argparse
+import json
 import os
-import copy
+import sys
 from datetime import datetime, timedelta
-from notion_client import Client
 from dotenv import load_dotenv
 
-# --- 環境設定 ---
-load_dotenv()
-notion = Client(auth=os.getenv("NOTION_TOKEN"))
-PARENT_PAGE_ID = os.getenv("PARENT_PAGE_ID")
-TEMPLATE_PAGE_ID = os.getenv("TEMPLATE_PAGE_ID")
+# リポジトリ直下のモジュール（キャッシュ等）を使う
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from block_cache import DEFAULT_CACHE_PATH, BlockCache
+from daily_plan import (
+    append_week_blocks,
+    build_monthly_task_toggle_from_last_week,
+    build_synced_monthly_task_toggle,
+    client_options,
+    compile_week_template,
+    load_template_blocks,
+    paginate_children,
+    placeholder_values,
+    sanitize_blocks,
+    start_week_page,
+    stream_week_blocks,
+)
+from instrumentation import ApiRecorder, api_step, traced_step
+from page_index import PageIndex
+from parent_map import build_parent_map
+from rate_limit import attach_scheduler
+from render_cache import RenderCache
+from request_packer import pack_ranges
+from tree_writer import split_for_request
+from week_database import WeekDatabase, month_properties, week_properties
+from write_journal import WriteJournal
+
+MONTHLY_TOGGLE_TEXT = "月別"
+MONTHLY_TASK_TEXT = "Monthly TASK"
+
+# --- クライアント（notion_client は重いので API を呼ぶときだけ読み込む） ---
+def init_notion():
+    from notion_client import Client
+
+    from http_pool import shared_pool
+
+    notion = shared_pool().attach(Client(**client_options(os.getenv("NOTION_TOKEN"))))  # 共有 keep-alive プール
+    recorder = ApiRecorder().attach(notion)  # API 呼び出しの計測（ステップ別）
+    scheduler = attach_scheduler(notion)  # 3 req/s 制限に合わせてペース配分・429 再送
+    return notion, recorder, scheduler
 
 # --- 日付関連 ---
 def format_day(d): return d.strftime("%m%d")
@@ -18,40 +53,21 @@ def get_week_range_str(base_date):
     return f"{format_day(monday)}-{format_day(sunday)}", monday, sunday
 def get_month_str(d): return d.strftime("%Y-%m")
 
-today = datetime.today()
-this_week_title, this_monday, _ = get_week_range_str(today)
-last_week_title, _, _ = get_week_range_str(this_monday - timedelta(days=1))
-this_month_title = get_month_str(this_monday)
-
-# --- 子ページ検索 ---
-def find_child_page_by_title(parent_id, title):
-    children = notion.blocks.children.list(parent_id, page_size=100)["results"]
-    for block in children:
-        if block["type"] == "child_page" and block["child_page"]["title"] == title:
-            return block["id"]
-    return None
-
-# --- toggle内のページ検索 ---
-def find_page_inside_toggle(toggle_block_id, title):
-    children = notion.blocks.children.list(toggle_block_id)["results"]
-    for block in children:
-        if block["type"] == "child_page" and block["child_page"]["title"] == title:
-            return block["id"]
-    return None
-
-# --- toggleブロック検索（例："月別"） ---
-def find_toggle_block_by_text(parent_id, text):
-    blocks = notion.blocks.children.list(parent_id)["results"]
-    for block in blocks:
-        if block["type"] == "toggle":
-            for rt in block["toggle"].get("rich_text", []):
-                if rt["type"] == "text" and rt["text"]["content"] == text:
-                    return block["id"]
-    return None
+# --- 親ページの構造マップ（週次ページ・トグル・月別トグル内の月次ページを1回の全件走査で取得） ---
+@traced_step
+def load_parent_map(notion, parent_id, index):
+    structure = build_parent_map(
+        lambda block_id: paginate_children(notion, block_id), parent_id, [MONTHLY_TOGGLE_TEXT]
+    )
+    index.replace(parent_id, structure.pages.items())
+    for toggle_id, pages in structure.toggle_pages.items():
+        index.replace(toggle_id, pages.items())
+    return structure
 
 # --- toggleブロックがなければ作成 ---
-def ensure_toggle_block(parent_id, toggle_text):
-    toggle_id = find_toggle_block_by_text(parent_id, toggle_text)
+@traced_step
+def ensure_toggle_block(notion, parent_map, parent_id, toggle_text):
+    toggle_id = parent_map.toggle(toggle_text)
     if toggle_id:
         return toggle_id
     block = {
@@ -63,112 +79,231 @@ def ensure_toggle_block(parent_id, toggle_text):
         }
     }
     res = notion.blocks.children.append(parent_id, children=[block])
-    return res["results"][0]["id"]
+    toggle_id = res["results"][0]["id"]
+    parent_map.record_toggle(toggle_text, toggle_id)
+    return toggle_id
 
 # --- 月次ページの作成 ---
-def create_month_page_under_toggle(toggle_id, month_title):
+@traced_step
+def create_month_page_under_toggle(notion, parent_map, index, toggle_id, month_title):
     page = notion.pages.create(
         parent={"type": "block_id", "block_id": toggle_id},
         properties={"title": [{"type": "text", "text": {"content": month_title}}]},
-        children=[
-            {
-                "object": "block",
-                "type": "toggle",
-                "toggle": {
-                    "rich_text": [{"type": "text", "text": {"content": "Monthly TASK"}}],
-                    "children": []
-                }
-            }
-        ]
+        children=[monthly_task_block()]
+    )
+    parent_map.record_page_in_toggle(toggle_id, month_title, page["id"])
+    index.record(toggle_id, month_title, page["id"])
+    return page["id"]
+
+# --- 月次ページの作成（データベース） ---
+@traced_step
+def create_month_page_in_database(notion, database, month_title, monday):
+    page = notion.pages.create(
+        parent=database.parent(),
+        properties=month_properties(month_title, monday),
+        children=[monthly_task_block()]
     )
     return page["id"]
 
-# --- 前週のMonthly TASKトグルをコピー ---
-def copy_monthly_task_from_page(page_id):
-    blocks = notion.blocks.children.list(page_id, page_size=100)["results"]
-    for block in blocks:
-        if block["type"] == "toggle":
-            for rt in block["toggle"].get("rich_text", []):
-                if rt["type"] == "text" and rt["text"]["content"].strip() == "Monthly TASK":
-                    toggle_id = block["id"]
-                    children = notion.blocks.children.list(toggle_id)["results"]
-                    copied = [copy.deepcopy(b) for b in children]
-                    return {
-                        "object": "block",
-                        "type": "toggle",
-                        "toggle": {
-                            "rich_text": [{"type": "text", "text": {"content": "Monthly TASK"}}],
-                            "children": copied
-                        }
-                    }
+# --- Monthly TASKトグル ---
+def monthly_task_block(children=None):
     return {
         "object": "block",
         "type": "toggle",
         "toggle": {
-            "rich_text": [{"type": "text", "text": {"content": "Monthly TASK"}}],
-            "children": []
+            "rich_text": [{"type": "text", "text": {"content": MONTHLY_TASK_TEXT}}],
+            "children": children or []
         }
     }
 
+# --- 前週のMonthly TASKトグルをコピー（daily_plan.py と同じ: 全件・全階層取得し、読み取り専用の項目を除く） ---
+@traced_step
+def copy_monthly_task_from_page(notion, page_id, cache=None):
+    return build_monthly_task_toggle_from_last_week(notion, page_id, cache)
+
 # --- Weeklyテンプレから日付差し替え ---
-def generate_week_blocks(template_id, monday):
+def render_week_blocks(template_blocks, monday):
     dates = [monday + timedelta(days=i) for i in range(7)]
-    template_blocks = notion.blocks.children.list(template_id, page_size=100)["results"]
+    compiled = compile_week_template(template_blocks)  # 置換箇所はここで一度だけ走査
     result = []
     for d in dates:
-        day_str = format_day(d)
-        for b in template_blocks:
-            new_b = copy.deepcopy(b)
-            t = new_b[new_b["type"]]
-            if "rich_text" in t:
-                for rt in t["rich_text"]:
-                    if rt["type"] == "text":
-                        rt["text"]["content"] = rt["text"]["content"].replace("XXXX", day_str)
-            result.append(new_b)
+        result.extend(compiled.render(placeholder_values(d)))
     return result
 
-# --- ✅ 実行開始！ ---
-# 1. 前週からMonthly TASKコピー
-last_page_id = find_child_page_by_title(PARENT_PAGE_ID, last_week_title)
-monthly_task_block = copy_monthly_task_from_page(last_page_id) if last_page_id else {
-    "object": "block",
-    "type": "toggle",
-    "toggle": {
-        "rich_text": [{"type": "text", "text": {"content": "Monthly TASK"}}],
-        "children": []
-    }
-}
-
-# 2. 今週ページ作成（先頭にMonthly TASK）
-week_blocks = [monthly_task_block] + generate_week_blocks(TEMPLATE_PAGE_ID, this_monday)
-first_100 = week_blocks[:100]
-page = notion.pages.create(
-    parent={"page_id": PARENT_PAGE_ID},
-    properties={"title": [{"type": "text", "text": {"content": this_week_title}}]},
-    children=first_100
-)
-page_id = page["id"]
-print(f"✅ 今週ページ作成: {this_week_title}")
-
-# 3. 残りのブロックを追記
-remaining = week_blocks[100:]
-for i in range(0, len(remaining), 100):
-    chunk = remaining[i:i+100]
-    notion.blocks.children.append(page_id, children=chunk)
-
-# 4. 月別トグル内に月次ページがなければ作成
-monthly_toggle_id = ensure_toggle_block(PARENT_PAGE_ID, "月別")
-month_page_id = find_page_inside_toggle(monthly_toggle_id, this_month_title)
-if not month_page_id:
-    month_page_id = create_month_page_under_toggle(monthly_toggle_id, this_month_title)
-    print(f"📄 月次ページ作成: {this_month_title}")
-
-# 5. 月次ページに週次ページへのリンク追加
-notion.blocks.children.append(month_page_id, children=[
-    {
-        "object": "block",
-        "type": "link_to_page",
-        "link_to_page": {"type": "page_id", "page_id": page_id}
+# --- 展開キャッシュ経由（--render-cache 指定時。テンプレ内容と週が同じなら前回の展開結果を使う） ---
+def render_week_blocks_cached(template_blocks, monday, render_cache=None):
+    if render_cache is None:
+        return render_week_blocks(template_blocks, monday)
+    return stream_week_blocks(template_blocks, monday, render_cache=render_cache)
+
+@traced_step
+def generate_week_blocks(notion, cache, template_id, monday, render_cache=None):
+    return render_week_blocks_cached(load_template_blocks(notion, template_id, cache), monday, render_cache)
+
+# --- dry-run: キャッシュ済みテンプレから送信内容を組み立てる（通信なし） ---
+def build_dry_run_payload(cache, parent_id, template_id, base_date, render_cache=None):
+    cached = cache.get(template_id)
+    if cached is None:
+        raise SystemExit(f"テンプレ {template_id} がキャッシュにありません。一度通常実行してください。")
+    title, monday, _ = get_week_range_str(base_date)
+    # 前週の Monthly TASK は API でしか読めないため、dry-run では空のトグルを置く
+    blocks = [monthly_task_block()] + list(render_week_blocks_cached(sanitize_blocks(cached[1]), monday, render_cache))
+    payload, deferred = split_for_request(blocks)
+    requests = []
+    for n, (start, end) in enumerate(pack_ranges(payload)):
+        requests.append({
+            "method": "pages.create" if n == 0 else "blocks.children.append",
+            "children": payload[start:end],
+        })
+    return {
+        "parent_page_id": parent_id,
+        "title": title,
+        "month": get_month_str(monday),
+        "template_version": cached[0],
+        "deferred_subtrees": len(deferred),
+        "requests": requests,
     }
-])
-print(f"🔗 週次ページ {this_week_title} を月次ページに追加")
+
+# --- 実行 ---
+def run(notion, parent_id, template_id, base_date, cache, index, journal, database=None, synced_monthly=False,
+        append_workers=1, render_cache=None):
+    """
+    database を渡すと週次・月次ページはそのデータベースに作り、
+    前週・今月のページは週キー / 月キーの絞り込み1回で探す（親ページは走査しない）。
+    synced_monthly なら Monthly TASK は複製せず、月ごとの同期ブロックを参照する（月替わりは未完了だけ持ち越し）。
+    append_workers > 1 なら残りのブロックはチャンクごとのアンカーの後ろへ並行に追記する。
+    """
+    this_week_title, this_monday, _ = get_week_range_str(base_date)
+    last_week_title, last_monday, _ = get_week_range_str(this_monday - timedelta(days=1))
+    this_month_title = get_month_str(this_monday)
+
+    # 0. 親ページの構造を取得（以降の検索はすべてこのマップから）
+    parent_map = load_parent_map(notion, parent_id, index) if database is None else None
+
+    # 1. 前週からMonthly TASKコピー
+    if database is not None:
+        with api_step("find_last_week_in_database"):
+            last_page_id = database.find_week(last_monday)
+    else:
+        last_page_id = parent_map.page(last_week_title)
+    if synced_monthly:
+        monthly_task = build_synced_monthly_task_toggle(notion, last_page_id, last_monday, this_monday, cache)
+    else:
+        monthly_task = copy_monthly_task_from_page(notion, last_page_id, cache) if last_page_id else monthly_task_block()
+
+    # 2. 今週ページ作成（先頭にMonthly TASK。前回途中で失敗していれば作成済みページを再利用）
+    week_blocks = generate_week_blocks(notion, cache, template_id, this_monday, render_cache)
+    if database is not None:
+        page_id, remaining = start_week_page(
+            notion, database.database_id, this_week_title, monthly_task, week_blocks, journal,
+            parent=database.parent(), properties=week_properties(this_week_title, this_monday),
+            monday=this_monday,
+        )
+    else:
+        page_id, remaining = start_week_page(
+            notion, parent_id, this_week_title, monthly_task, week_blocks, journal, monday=this_monday
+        )
+        parent_map.record_page(this_week_title, page_id)
+        index.record(parent_id, this_week_title, page_id)
+
+    # 3. 残りのブロックを追記（追記済みチャンクは飛ばす）
+    append_week_blocks(notion, page_id, remaining, journal, append_workers)
+
+    # 4. 月別トグル内（データベースモードではデータベース）に月次ページがなければ作成
+    if database is not None:
+        with api_step("find_month_in_database"):
+            month_page_id = database.find_month(this_monday)
+        if not month_page_id:
+            month_page_id = create_month_page_in_database(notion, database, this_month_title, this_monday)
+            print(f"📄 月次ページ作成: {this_month_title}")
+    else:
+        monthly_toggle_id = ensure_toggle_block(notion, parent_map, parent_id, MONTHLY_TOGGLE_TEXT)
+        month_page_id = parent_map.page_in_toggle(monthly_toggle_id, this_month_title)
+        if not month_page_id:
+            month_page_id = create_month_page_under_toggle(
+                notion, parent_map, index, monthly_toggle_id, this_month_title
+            )
+            print(f"📄 月次ページ作成: {this_month_title}")
+
+    # 5. 月次ページに週次ページへのリンク追加（リンク済みなら追加しない）
+    link_step = f"link:{page_id}"
+    if journal.is_done(month_page_id, link_step):
+        print(f"⏭ 週次ページ {this_week_title} は月次ページにリンク済み")
+    else:
+        with api_step("link_week_to_month_page"):
+            notion.blocks.children.append(month_page_id, children=[
+                {
+                    "object": "block",
+                    "type": "link_to_page",
+                    "link_to_page": {"type": "page_id", "page_id": page_id}
+                }
+            ])
+        journal.mark_done(month_page_id, link_step)
+        print(f"🔗 週次ページ {this_week_title} を月次ページに追加")
+    return page_id
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="週次ページ + 月別トグル内の月次ページを作成する")
+    parser.add_argument(
+        "--date", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), default=None,
+        help="対象週に含まれる日付 YYYY-MM-DD（既定: 今日）",
+    )
+    parser.add_argument("--parent", default=None, help="親ページID（既定: PARENT_PAGE_ID）")
+    parser.add_argument("--template", default=None, help="テンプレページID（既定: TEMPLATE_PAGE_ID）")
+    parser.add_argument(
+        "--database", default=None,
+        help="週次・月次ページを作るデータベースID（既定: NOTION_WEEK_DATABASE_ID。未指定なら親ページ直下 / 月別トグル）",
+    )
+    parser.add_argument(
+        "--synced-monthly", action="store_true",
+        help="Monthly TASK を月ごとの同期ブロック（元1つ + 各週は参照）で持ち越す",
+    )
+    parser.add_argument(
+        "--append-workers", type=int, default=1,
+        help="追記の並行数（2以上でチャンクごとのアンカーを先に置き、after 指定で並行に追記）",
+    )
+    parser.add_argument(
+        "--render-cache", action="store_true",
+        help="展開済みの週をローカルキャッシュに保存して再実行・dry-run で使い回す（既定: 毎回展開）",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="キャッシュ済みテンプレから送信内容（JSON）を出力するだけで API は呼ばない",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from http_pool import shared_pool
+
+    args = parse_args(argv)
+    load_dotenv()
+    parent_id = args.parent or os.getenv("PARENT_PAGE_ID")
+    template_id = args.template or os.getenv("TEMPLATE_PAGE_ID")
+    database_id = args.database or os.getenv("NOTION_WEEK_DATABASE_ID")
+    base_date = args.date or datetime.today()
+    cache_path = os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH)
+    cache = BlockCache(cache_path)
+    render_cache = RenderCache(cache_path) if args.render_cache else None  # 展開済みの週（dry-run と通常実行で共有）
+
+    if args.dry_run:
+        payload = build_dry_run_payload(cache, parent_id, template_id, base_date, render_cache)
+        json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+
+    notion, recorder, scheduler = init_notion()
+    index = PageIndex(cache_path)  # 週次/月次ページの タイトル→ID インデックス（daily_plan.py と共有）
+    journal = WriteJournal(cache_path)  # 途中失敗時の再開用（作成済みページ・追記済みチャンク・リンク）
+    database = WeekDatabase(notion, database_id) if database_id else None
+    run(
+        notion, parent_id, template_id, base_date, cache, index, journal, database, args.synced_monthly,
+        args.append_workers, render_cache,
+    )
+    if render_cache is not None:
+        print(render_cache.summary())
+    print(scheduler.summary())
+    print(shared_pool().summary())
+    print(recorder.summary_table())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import random
+import unittest
+
+from request_packer import (
+    ENVELOPE_BYTES,
+    MAX_BLOCKS_PER_REQUEST,
+    MAX_CHILDREN,
+    MAX_PAYLOAD_BYTES,
+    fits_in_one_request,
+    iter_packed,
+    nested_block_count,
+    pack_blocks,
+    pack_ranges,
+    serialized_size,
+)
+
+# 実行: リポジトリ直下で python -m unittest discover -s test -p "test_*.py"
+
+# =============================================================================
+# ブロックの生成
+# =============================================================================
+
+def paragraph(text: str = "x"):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+
+def toggle(children):
+    return {"object": "block", "type": "toggle", "toggle": {"rich_text": [], "children": children}}
+
+def random_blocks(rng: random.Random, n: int):
+    """葉・子つき・大きい本文が混ざったブロック列"""
+    blocks = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            blocks.append(paragraph("a" * rng.randint(1, 200)))
+        elif kind < 0.9:
+            blocks.append(toggle([paragraph() for _ in range(rng.randint(1, 60))]))
+        else:
+            blocks.append(paragraph("b" * rng.randint(20_000, 60_000)))
+    return blocks
+
+# =============================================================================
+# テスト
+# =============================================================================
+
+class FitsInOneRequestTest(unittest.TestCase):
+    def test_leaf_always_fits(self):
+        self.assertTrue(fits_in_one_request(paragraph("z" * 10_000)))
+
+    def test_too_many_children(self):
+        self.assertTrue(fits_in_one_request(toggle([paragraph() for _ in range(MAX_CHILDREN)])))
+        self.assertFalse(fits_in_one_request(toggle([paragraph() for _ in range(MAX_CHILDREN + 1)])))
+
+    def test_too_many_nested_blocks(self):
+        # 各配列は上限内でも、入れ子込みの総数が上限を超えれば載らない
+        block = toggle([toggle([paragraph() for _ in range(20)]) for _ in range(60)])
+        self.assertGreater(nested_block_count(block), MAX_BLOCKS_PER_REQUEST)
+        self.assertFalse(fits_in_one_request(block))
+
+    def test_too_large(self):
+        block = toggle([paragraph("c" * 60_000) for _ in range(10)])
+        self.assertFalse(fits_in_one_request(block))
+
+class PackRangesTest(unittest.TestCase):
+    def test_children_limit(self):
+        blocks = [paragraph() for _ in range(250)]
+        self.assertEqual(pack_ranges(blocks), [(0, 100), (100, 200), (200, 250)])
+
+    def test_nested_block_limit(self):
+        blocks = [toggle([paragraph() for _ in range(99)]) for _ in range(25)]  # 1ブロックあたり入れ子込み 100
+        ranges = pack_ranges(blocks)
+        self.assertEqual(ranges[0], (0, MAX_BLOCKS_PER_REQUEST // 100))
+        for start, end in ranges:
+            self.assertLessEqual(sum(nested_block_count(b) for b in blocks[start:end]), MAX_BLOCKS_PER_REQUEST)
+
+    def test_byte_limit(self):
+        blocks = [paragraph("d" * 40_000) for _ in range(40)]
+        ranges = pack_ranges(blocks)
+        self.assertGreater(len(ranges), 1)
+        for start, end in ranges:
+            self.assertLessEqual(serialized_size(blocks[start:end]), MAX_PAYLOAD_BYTES - ENVELOPE_BYTES)
+        # 貪欲に詰めているので、次の1件を足すと上限を超える
+        for (start, end), _ in zip(ranges, ranges[1:]):
+            self.assertGreater(serialized_size(blocks[start:end + 1]), MAX_PAYLOAD_BYTES - ENVELOPE_BYTES)
+
+    def test_oversized_block_is_alone(self):
+        huge = toggle([paragraph("e" * 60_000) for _ in range(10)])
+        blocks = [paragraph(), huge, paragraph()]
+        self.assertEqual(pack_ranges(blocks), [(0, 1), (1, 2), (2, 3)])
+
+    def test_pack_blocks_keeps_order(self):
+        blocks = random_blocks(random.Random(1), 300)
+        batches = pack_blocks(blocks)
+        self.assertEqual([b for batch in batches for b in batch], blocks)
+
+    def test_empty(self):
+        self.assertEqual(pack_ranges([]), [])
+        self.assertEqual(list(iter_packed([])), [])
+
+class IterPackedTest(unittest.TestCase):
+    def test_same_split_as_pack_ranges(self):
+        for seed in range(5):
+            blocks = random_blocks(random.Random(seed), 400)
+            expected = [blocks[s:e] for s, e in pack_ranges(blocks)]
+            self.assertEqual(list(iter_packed(iter(blocks))), expected, f"seed={seed}")
+
+    def test_lazy(self):
+        # 最初のリクエスト分を返すまでに読むのは、次のリクエストの先頭1件まで
+        consumed = []
+
+        def source():
+            for i in range(1_000):
+                consumed.append(i)
+                yield paragraph(str(i))
+
+        first = next(iter(iter_packed(source())))
+        self.assertEqual(len(first), MAX_CHILDREN)
+        self.assertEqual(len(consumed), MAX_CHILDREN + 1)
+
+    def test_request_form_is_measured(self):
+        # 送る形（子を外した形）で測り、返すのは元のブロック
+        items = [toggle([paragraph("f" * 60_000) for _ in range(10)]) for _ in range(3)]
+        stripped = lambda blk: {"object": "block", "type": "toggle", "toggle": {"rich_text": []}}
+        batches = list(iter_packed(items, stripped))
+        self.assertEqual(batches, [items])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import copy
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from request_packer import MAX_CHILDREN, pack_blocks
+from tree_writer import (
+    MAX_NESTING,
+    append_tree,
+    fetch_block_tree,
+    iter_request_batches,
+    nesting_depth,
+    prefetch,
+    resolve_created_ids,
+    split_for_request,
+)
+from write_journal import WriteJournal
+
+# 実行: リポジトリ直下で python -m unittest discover -s test -p "test_*.py"
+
+# =============================================================================
+# ブロックの生成
+# =============================================================================
+
+def _rich_text(text: str):
+    return [{"type": "text", "text": {"content": text}}]
+
+def paragraph(text: str):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": _rich_text(text)}}
+
+def toggle(text: str, children):
+    return {"object": "block", "type": "toggle", "toggle": {"rich_text": _rich_text(text), "children": children}}
+
+def tree(label: str, depth: int, width: int):
+    """depth 段の入れ子（各段 width 個の子）"""
+    if depth == 0:
+        return paragraph(label)
+    return toggle(label, [tree(f"{label}.{i}", depth - 1, width) for i in range(width)])
+
+def outline(blocks):
+    """比較用: (本文, 子の outline) のリスト"""
+    result = []
+    for blk in blocks:
+        obj = blk[blk["type"]]
+        text = "".join(t["text"]["content"] for t in obj.get("rich_text", []))
+        result.append((text, outline(obj.get("children") or [])))
+    return result
+
+# =============================================================================
+# メモリ上の代用クライアント（blocks.children.append / list だけ）
+# =============================================================================
+
+class StubNotion:
+    """
+    append は API と同じく1リクエストの children 件数と入れ子の深さを検証し、after の直後に挿入する。
+    fail_after 回の append の後は ConnectionError を送出する（途中失敗の再現用）。
+    """
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.appends = 0
+        self.lists = 0
+        self.store = {}
+        self.children = {}
+        self._lock = threading.Lock()
+        self.blocks = SimpleNamespace(children=SimpleNamespace(append=self._append, list=self._list))
+
+    def _create(self, block):
+        block_id = f"blk-{len(self.store)}"
+        btype = block["type"]
+        kids = block[btype].get("children") or []
+        self.store[block_id] = {
+            "object": "block", "id": block_id, "type": btype,
+            btype: {k: v for k, v in block[btype].items() if k != "children"},
+            "has_children": bool(kids),
+        }
+        self.children[block_id] = [self._create(c) for c in kids]
+        return block_id
+
+    def _append(self, block_id, children, after=None):
+        with self._lock:
+            if self.fail_after is not None and self.appends >= self.fail_after:
+                raise ConnectionError("stub failure")
+            if len(children) > MAX_CHILDREN or any(nesting_depth(c) > MAX_NESTING for c in children):
+                raise ValueError("request too large")
+            self.appends += 1
+            ids = [self._create(c) for c in children]
+            siblings = self.children.setdefault(block_id, [])
+            pos = siblings.index(after) + 1 if after else len(siblings)
+            siblings[pos:pos] = ids
+            if block_id in self.store:
+                self.store[block_id]["has_children"] = True
+            return {"results": [copy.deepcopy(self.store[i]) for i in ids]}
+
+    def _list(self, block_id, page_size=100, start_cursor=None):
+        with self._lock:
+            self.lists += 1
+            ids = self.children.get(block_id, [])
+            start = int(start_cursor or 0)
+            more = start + page_size < len(ids)
+            return {
+                "results": [copy.deepcopy(self.store[i]) for i in ids[start:start + page_size]],
+                "has_more": more,
+                "next_cursor": str(start + page_size) if more else None,
+            }
+
+    def list_all(self, block_id):
+        results, cursor = [], None
+        while True:
+            resp = self._list(block_id, start_cursor=cursor)
+            results.extend(resp["results"])
+            if not resp["has_more"]:
+                return results
+            cursor = resp["next_cursor"]
+
+    def outline(self, block_id):
+        return outline(fetch_block_tree(self.list_all, block_id, max_workers=1))
+
+def sample_blocks():
+    """1リクエストに載るもの・深すぎるもの・子が多すぎるものの混在（最上位 130 件）"""
+    blocks = [paragraph(f"p{i}") for i in range(120)]
+    blocks[3] = tree("shallow", 2, 3)
+    blocks[10] = tree("deep", 5, 2)
+    blocks[50] = toggle("wide", [tree(f"w{i}", 1, 2) for i in range(150)])
+    blocks += [tree(f"tail{i}", 4, 2) for i in range(10)]
+    return blocks
+
+# =============================================================================
+# テスト
+# =============================================================================
+
+class SplitForRequestTest(unittest.TestCase):
+    def test_shallow_block_is_sent_as_is(self):
+        blocks = [tree("a", MAX_NESTING, 3)]
+        payload, deferred = split_for_request(blocks)
+        self.assertIs(payload[0], blocks[0])
+        self.assertEqual(deferred, [])
+
+    def test_deep_and_wide_blocks_are_deferred(self):
+        deep = tree("deep", MAX_NESTING + 1, 2)
+        wide = toggle("wide", [paragraph(str(i)) for i in range(MAX_CHILDREN + 1)])
+        payload, deferred = split_for_request([paragraph("x"), deep, wide])
+        self.assertNotIn("children", payload[1]["toggle"])
+        self.assertNotIn("children", payload[2]["toggle"])
+        self.assertEqual([i for i, _ in deferred], [1, 2])
+        self.assertIs(deferred[0][1], deep["toggle"]["children"])
+        self.assertIn("children", deep["toggle"])  # 元のブロックは書き換えない
+
+    def test_iter_request_batches_matches_pack_blocks(self):
+        blocks = sample_blocks()
+        payload, _ = split_for_request(blocks)
+        expected = [len(batch) for batch in pack_blocks(payload)]
+        batches = list(iter_request_batches(iter(blocks)))
+        self.assertEqual([len(batch) for batch in batches], expected)
+        self.assertEqual([b for batch in batches for b in batch], blocks)
+
+class AppendTreeTest(unittest.TestCase):
+    def test_round_trip(self):
+        for workers in (1, 4):
+            notion = StubNotion()
+            blocks = sample_blocks()
+            created = append_tree(notion, "page", blocks, max_workers=workers)
+            self.assertEqual(len(created), len(blocks))
+            self.assertEqual(notion.outline("page"), outline(blocks), f"workers={workers}")
+
+    def test_after_keeps_order(self):
+        notion = StubNotion()
+        first, _ = append_tree(notion, "page", [paragraph("first"), paragraph("last")])
+        blocks = [tree(f"m{i}", 3, 2) for i in range(5)] + [paragraph(f"m{i}") for i in range(5, 250)]
+        append_tree(notion, "page", blocks, after=first)
+        self.assertEqual(notion.outline("page"), outline([paragraph("first")] + blocks + [paragraph("last")]))
+
+class JournalResumeTest(unittest.TestCase):
+    def test_resume_after_every_failure_point(self):
+        blocks = [
+            paragraph("head"),
+            tree("deep", 4, 2),
+            toggle("wide", [paragraph(str(i)) for i in range(130)]),
+            tree("tail", 3, 3),
+        ] + [paragraph(f"p{i}") for i in range(110)]
+        total = StubNotion()
+        append_tree(total, "page", blocks)
+        for workers in (1, 4):
+            for fail_after in range(1, total.appends):
+                with tempfile.TemporaryDirectory() as tmp:
+                    journal = WriteJournal(os.path.join(tmp, "journal.sqlite"))
+                    notion = StubNotion(fail_after=fail_after)
+                    with self.assertRaises(ConnectionError):
+                        append_tree(notion, "page", blocks, max_workers=workers, journal=journal, scope="chunk:0/")
+                    notion.fail_after = None
+                    append_tree(notion, "page", blocks, max_workers=workers, journal=journal, scope="chunk:0/")
+                    journal.close()
+                    self.assertEqual(
+                        notion.outline("page"), outline(blocks), f"workers={workers} fail_after={fail_after}"
+                    )
+                    self.assertEqual(notion.appends, total.appends)  # 済んだリクエストは送り直さない
+
+class ResolveCreatedIdsTest(unittest.TestCase):
+    def test_paginates_up_to_count(self):
+        notion = StubNotion()
+        created = append_tree(notion, "page", [paragraph(str(i)) for i in range(250)])
+        notion.lists = 0
+        self.assertEqual(resolve_created_ids(notion, "page", 230), created[:230])
+        self.assertEqual(notion.lists, 3)
+
+class PrefetchTest(unittest.TestCase):
+    def test_order(self):
+        self.assertEqual(list(prefetch(iter(range(50)), depth=3)), list(range(50)))
+
+    def test_error_is_raised_in_order(self):
+        def source():
+            yield 1
+            yield 2
+            raise RuntimeError("render failed")
+
+        received = []
+        with self.assertRaises(RuntimeError):
+            for item in prefetch(source()):
+                received.append(item)
+        self.assertEqual(received, [1, 2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+import asyncio
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from request_packer import fits_in_one_request, iter_packed, pack_blocks
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+PAGE_SIZE = 100    # 一覧取得1回あたりの上限
+MAX_NESTING = 2    # 1リクエストで送れる入れ子の深さ（ブロック → 子 → 孫 まで）
+MAX_WORKERS = 4
+PREFETCH_DEPTH = 2  # prefetch で先に用意しておく件数
+NO_DESCEND_TYPES = {"child_page", "child_database"}  # 子ページの中身はツリーとして辿らない
+
+Block = Dict[str, Any]
+Job = Tuple[str, List[Block]]  # (書き込み先ブロックID, 追加する子ブロック)
+
+# =============================================================================
+# ツリー操作ヘルパー
+# =============================================================================
+
+def block_children(block: Block) -> List[Block]:
+    btype = block.get("type")
+    obj = block.get(btype) if btype else None
+    if not isinstance(obj, dict):
+        return []
+    return obj.get("children") or []
+
+def nesting_depth(block: Block) -> int:
+    """子を持たないブロックを 0 とした入れ子の深さ"""
+    children = block_children(block)
+    return 1 + max(nesting_depth(c) for c in children) if children else 0
+
+def _without_children(block: Block) -> Block:
+    btype = block["type"]
+    obj = {k: v for k, v in block[btype].items() if k != "children"}
+    return dict(block, **{btype: obj})
+
+def split_for_request(blocks: List[Block]) -> Tuple[List[Block], List[Tuple[int, List[Block]]]]:
+    """
+    1リクエストで送れる形に分ける。
+    入れ子が MAX_NESTING 以内で子孫ごと1リクエストに収まるブロックはそのまま、
+    深い・大きいブロックは子を外して送り、
+    外した子は (blocks 内の位置, 子ブロック) として返す（作成後のIDに追記するため）。
+    """
+    payload: List[Block] = []
+    deferred: List[Tuple[int, List[Block]]] = []
+    for i, blk in enumerate(blocks):
+        sent = request_form(blk)
+        payload.append(sent)
+        if sent is not blk:
+            deferred.append((i, block_children(blk)))
+    return payload, deferred
+
+def request_form(block: Block) -> Block:
+    """split_for_request で実際に送る形（1リクエストに収まらない部分木は子を外す）"""
+    if nesting_depth(block) <= MAX_NESTING and fits_in_one_request(block):
+        return block
+    return _without_children(block)
+
+def iter_request_batches(blocks: Iterable[Block]) -> Iterator[List[Block]]:
+    """
+    blocks を先頭から順に読み、split_for_request した形で1リクエストに載る単位の（元の）ブロック列を返す。
+    分割位置は split_for_request + pack_ranges と同じ。blocks が遅延生成なら全体を展開しない。
+    """
+    return iter_packed(blocks, request_form)
+
+def prefetch(items: Iterable[Any], depth: int = PREFETCH_DEPTH) -> Iterator[Any]:
+    """
+    items を別スレッドで最大 depth 件まで先読みしながら返す（描画・詰め込みを送信待ちと重ねる）。
+    items 側の例外は取り出した時点で送出する。呼び出し側が途中でやめると先読みも止まる。
+    """
+    buffer: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry: Tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((False, item)):
+                    return
+        except BaseException as e:
+            put((True, e))
+            return
+        put((True, None))
+
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True).start()
+    try:
+        while True:
+            finished, value = buffer.get()
+            if finished:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+
+def map_in_context(pool: ThreadPoolExecutor, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+    """pool.map と同じだが、呼び出し元のコンテキスト（計測のステップ名など）をワーカーに引き継ぐ"""
+    futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [f.result() for f in futures]
+
+# =============================================================================
+# 再帰取得
+# =============================================================================
+
+def fetch_block_tree(
+    list_children: Callable[[str], List[Block]],
+    block_id: str,
+    max_workers: int = MAX_WORKERS,
+) -> List[Block]:
+    """
+    block_id 配下を全階層取得し、各ブロックの <type>.children に子を埋め込んで返す。
+    同じ階層の兄弟ブロックの子は並行して取得する（幅優先）。
+    list_children は1ブロック分の子一覧を返す関数（daily_plan.paginate_children など）。
+    """
+    roots = list_children(block_id)
+    frontier = _expandable(roots)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while frontier:
+            results = map_in_context(pool, lambda b: list_children(b["id"]), frontier)
+            frontier = _embed_children(frontier, results)
+    return roots
+
+def _expandable(blocks: List[Block]) -> List[Block]:
+    """子を取得しに行くブロック（子ページの中身は辿らない）"""
+    return [b for b in blocks if b.get("has_children") and b.get("type") not in NO_DESCEND_TYPES]
+
+def _embed_children(frontier: List[Block], results: List[List[Block]]) -> List[Block]:
+    """取得した子を各ブロックの <type>.children に埋め込み、次の階層で辿るブロックを返す"""
+    next_frontier: List[Block] = []
+    for blk, children in zip(frontier, results):
+        blk[blk["type"]]["children"] = children
+        next_frontier.extend(_expandable(children))
+    return next_frontier
+
+# =============================================================================
+# 深いツリーの書き込み
+# =============================================================================
+
+def _append_level(
+    notion: Any,
+    parent_id: str,
+    blocks: List[Block],
+    after: Optional[str] = None,
+    journal: Any = None,
+    scope: str = "",
+) -> Tuple[List[str], List[Job]]:
+    """
+    1つの親に blocks を上限いっぱいのリクエスト単位で順に追記する（after を渡すとそのブロックの直後から）。
+    journal（write_journal.WriteJournal）を渡すと、リクエストごとに「親ブロックID + scope + 番号」で
+    作成されたIDを記録し、再実行では記録済みのリクエストを送らずにそのIDを使う（深い部分木の途中から再開できる）。
+    scope は同じ親へ別々に追記する呼び出しを区別する接頭辞（"chunk:3/" など）。
+    戻り値: (追記したブロックのID, 次の階層で書き込むジョブ)
+    """
+    payload, deferred = split_for_request(blocks)
+    created_ids: List[str] = []
+    for n, batch in enumerate(pack_blocks(payload)):
+        step = f"{scope}batch:{n}:"
+        recorded = journal.done_steps(parent_id, step) if journal is not None else []
+        if recorded:
+            created_ids.extend(recorded[0][len(step):].split(","))
+        else:
+            position = {"after": after} if after else {}
+            resp = notion.blocks.children.append(block_id=parent_id, children=batch, **position)
+            ids = [r["id"] for r in resp.get("results", [])]
+            if journal is not None:
+                journal.mark_done(parent_id, step + ",".join(ids))
+            created_ids.extend(ids)
+        if after and created_ids:
+            after = created_ids[-1]  # 2リクエスト目以降は直前に追記した末尾の後ろへ
+    return created_ids, [(created_ids[i], children) for i, children in deferred]
+
+def write_deferred(notion: Any, jobs: List[Job], max_workers: int = MAX_WORKERS, journal: Any = None) -> None:
+    """
+    後回しにした子ブロックを幅優先で書き込む。
+    同じ親への追記は順序を守って直列、別の親への追記（独立した兄弟の部分木）は並行。
+    journal を渡すとリクエストごとに記録し、再実行では済んだリクエストを飛ばす（_append_level）。
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while jobs:
+            results = map_in_context(pool, lambda job: _append_level(notion, *job, journal=journal)[1], jobs)
+            jobs = [job for level in results for job in level]
+
+def append_tree(
+    notion: Any,
+    parent_id: str,
+    blocks: List[Block],
+    max_workers: int = MAX_WORKERS,
+    after: Optional[str] = None,
+    journal: Any = None,
+    scope: str = "",
+) -> List[str]:
+    """
+    任意の深さのブロックツリーを parent_id の末尾（after を渡すとそのブロックの直後）に追記する。
+    journal / scope を渡すとリクエスト単位で再開できる（_append_level）。
+    戻り値: 追記した最上位ブロックのID
+    """
+    created_ids, jobs = _append_level(notion, parent_id, blocks, after, journal, scope)
+    write_deferred(notion, jobs, max_workers, journal)
+    return created_ids
+
+def resolve_created_ids(notion: Any, page_id: str, count: int) -> List[str]:
+    """
+    pages.create は子ブロックのIDを返さないため、先頭 count 件のIDを一覧から取る。
+    """
+    ids: List[str] = []
+    cursor: Optional[str] = None
+    while len(ids) < count:
+        resp = notion.blocks.children.list(
+            block_id=page_id, page_size=min(PAGE_SIZE, count - len(ids)), start_cursor=cursor
+        )
+        ids.extend(r["id"] for r in resp.get("results", []))
+        cursor = resp.get("next_cursor")
+        if not resp.get("has_more"):
+            break
+    return ids
+
+# =============================================================================
+# コルーチン版（AsyncClient 用。分割・詰め込みは同期版と同じ関数を使う）
+# =============================================================================
+
+async def fetch_block_tree_async(list_children: Callable[[str], Any], block_id: str) -> List[Block]:
+    """fetch_block_tree のコルーチン版。list_children はコルーチン関数で、同じ階層の兄弟の子は gather で並行取得"""
+    roots = await list_children(block_id)
+    frontier = _expandable(roots)
+    while frontier:
+        results = await asyncio.gather(*(list_children(b["id"]) for b in frontier))
+        frontier = _embed_children(frontier, list(results))
+    return roots
+
+async def _append_level_async(notion: Any, parent_id: str, blocks: List[Block]) -> List[Job]:
+    """_append_level のコルーチン版（同じ親への追記は順に）"""
+    payload, deferred = split_for_request(blocks)
+    created_ids: List[str] = []
+    for batch in pack_blocks(payload):
+        resp = await notion.blocks.children.append(block_id=parent_id, children=batch)
+        created_ids.extend(r["id"] for r in resp.get("results", []))
+    return [(created_ids[i], children) for i, children in deferred]
+
+async def write_deferred_async(notion: Any, jobs: List[Job]) -> None:
+    """write_deferred のコルーチン版（別の親への追記は gather で並行）"""
+    while jobs:
+        results = await asyncio.gather(*(_append_level_async(notion, *job) for job in jobs))
+        jobs = [job for level in results for job in level]
+
+async def resolve_created_ids_async(notion: Any, page_id: str, count: int) -> List[str]:
+    """resolve_created_ids のコルーチン版"""
+    ids: List[str] = []
+    cursor: Optional[str] = None
+    while len(ids) < count:
+        resp = await notion.blocks.children.list(
+            block_id=page_id, page_size=min(PAGE_SIZE, count - len(ids)), start_cursor=cursor
+        )
+        ids.extend(r["id"] for r in resp.get("results", []))
+        cursor = resp.get("next_cursor")
+        if not resp.get("has_more"):
+            break
+    return ids
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from block_cache import DEFAULT_CACHE_PATH, BlockCache
+from daily_plan import (
+    TEMPLATE_PAGE_ID,
+    build_monthly_task_toggle_from_last_week,
+    cached_week_blocks,
+    compile_week_template,
+    empty_monthly_task_toggle,
+    find_child_page_by_title,
+    generate_weeks,
+    load_template_blocks,
+    monday_of,
+    week_title_and_range,
+)
+from page_index import PageIndex
+from render_cache import RenderCache
+from tree_writer import iter_request_batches
+from week_database import WeekDatabase
+from write_journal import WriteJournal
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+STAGE_LEAD = timedelta(hours=12)          # 月曜 0:00 の何時間前から準備するか（既定: 日曜 12:00）
+RESTAGE_INTERVAL = timedelta(minutes=60)  # 準備後もこの間隔で準備し直す（テンプレ編集を拾う）
+RETRY_INTERVAL = timedelta(minutes=1)     # 作成に失敗したときの再試行間隔（ジャーナルで途中から再開）
+
+Clock = Callable[[], datetime]
+
+# =============================================================================
+# 準備（ステージング）と公開
+# =============================================================================
+
+def next_boundary(now: datetime) -> datetime:
+    """now より後の最初の月曜 0:00"""
+    return monday_of(now).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(weeks=1)
+
+class WeekStager:
+    """
+    常駐プロセス用。クライアント・キャッシュを持ち続け、次週ページの材料を前もって揃えておく。
+    stage: テンプレ取得・展開、親ページのインデックス化、前週ページと Monthly TASK の取得（キャッシュを温める）
+    publish: 前週の Monthly TASK を最新化（変化が無ければ版の確認だけ）して作成・追記する。
+    インデックスは公開時に作り直す（準備から数時間のあいだに手で作られたページを拾い、重複して作らない）
+    """
+
+    def __init__(
+        self,
+        notion: Any,
+        parent_id: str,
+        template_page_id: str = TEMPLATE_PAGE_ID,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        database: Optional[WeekDatabase] = None,
+        clock: Clock = datetime.now,
+    ) -> None:
+        self.notion = notion
+        self.parent_id = parent_id
+        self.template_page_id = template_page_id
+        self.cache_path = cache_path
+        self.database = database
+        self.clock = clock
+        self.cache = BlockCache(cache_path)
+        self.journal = WriteJournal(cache_path)
+        self.render_cache = RenderCache()
+        self.staged: Optional[Dict[str, Any]] = None
+        self.published: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, monday: datetime) -> Dict[str, Any]:
+        # 準備のたびにインデックスを作り直す（常駐中に手で作られたページも拾う）
+        index = PageIndex(self.cache_path)
+        template_blocks = load_template_blocks(self.notion, self.template_page_id, self.cache)
+        compiled = compile_week_template(template_blocks)
+        digest = self.render_cache.digest(template_blocks)
+        blocks = cached_week_blocks(template_blocks, monday, compiled, self.render_cache, digest)
+
+        title, _, _ = week_title_and_range(monday)
+        last_title, last_monday, _ = week_title_and_range(monday - timedelta(days=1))
+        if self.database is not None:
+            last_page_id = self.database.find_week(last_monday)
+            existing = self.database.find_week(monday)
+        else:
+            last_page_id = find_child_page_by_title(self.notion, self.parent_id, last_title, self.cache, index)
+            existing = find_child_page_by_title(self.notion, self.parent_id, title, self.cache, index)
+        build_monthly_task_toggle_from_last_week(self.notion, last_page_id, self.cache)
+
+        staged = {
+            "monday": monday,
+            "title": title,
+            "staged_at": self.clock(),
+            "template_hash": digest,
+            "template_blocks": template_blocks,
+            "compiled": compiled,
+            "blocks": blocks,
+            "last_week_page_id": last_page_id,
+            "existing_page_id": existing,
+        }
+        with self._lock:
+            self.staged = staged
+        return staged
+
+    def needs_stage(self, monday: datetime, now: datetime, restage: timedelta = RESTAGE_INTERVAL) -> bool:
+        staged = self.staged
+        return staged is None or staged["monday"] != monday or now - staged["staged_at"] >= restage
+
+    def publish(self, monday: datetime) -> Dict[str, str]:
+        """
+        monday の週のページを作成する。準備済みならテンプレ・展開結果はそれを使い、
+        API を呼ぶのは親ページの版と前週の Monthly TASK の確認と作成・追記だけ。準備が無ければここで準備する。
+        インデックスは準備時のものを使わず新しく開く（このプロセスでの走査済み扱いを引き継がない）。
+        親ページが準備後に変わっていれば走査し直すので、その間に手で作られた同名ページを見つけてスキップする。
+        """
+        staged = self.staged
+        if staged is None or staged["monday"] != monday:
+            staged = self.stage(monday)
+        page_ids = generate_weeks(
+            self.notion, self.parent_id, [monday],
+            template_page_id=self.template_page_id, cache=self.cache, index=PageIndex(self.cache_path),
+            journal=self.journal, template_blocks=staged["template_blocks"], compiled=staged["compiled"],
+            database=self.database, render_cache=self.render_cache,
+        )
+        with self._lock:
+            self.published.update(page_ids)
+            self.staged = None
+        return page_ids
+
+    def snapshot(self) -> Dict[str, Any]:
+        """準備済みの内容（確認用 JSON）。先頭の Monthly TASK は公開時に前週から取り直すため空で示す"""
+        staged = self.staged
+        if staged is None:
+            return {"staged": False, "published": dict(self.published)}
+        batches = iter_request_batches([empty_monthly_task_toggle()] + staged["blocks"])
+        return {
+            "staged": True,
+            "title": staged["title"],
+            "monday": staged["monday"].strftime("%Y-%m-%d"),
+            "staged_at": staged["staged_at"].isoformat(timespec="seconds"),
+            "template_hash": staged["template_hash"],
+            "last_week_page_id": staged["last_week_page_id"],
+            "existing_page_id": staged["existing_page_id"],
+            "blocks": len(staged["blocks"]),
+            "requests": [
+                {"method": "pages.create" if n == 0 else "blocks.children.append", "children": batch}
+                for n, batch in enumerate(batches)
+            ],
+            "published": dict(self.published),
+        }
+
+# =============================================================================
+# 常駐ループ
+# =============================================================================
+
+def run_daemon(
+    stager: WeekStager,
+    stop: threading.Event,
+    lead: timedelta = STAGE_LEAD,
+    restage: timedelta = RESTAGE_INTERVAL,
+    on_stage: Optional[Callable[[WeekStager], None]] = None,
+) -> None:
+    """
+    stop が立つまで、月曜 0:00 の lead 前から準備（restage ごとに準備し直し）、0:00 を過ぎたら公開する。
+    準備・公開の失敗はログに出して続ける（公開は RETRY_INTERVAL ごとに再試行し、ジャーナルで途中から再開）。
+    """
+    clock = stager.clock
+    target = next_boundary(clock())
+    while not stop.is_set():
+        now = clock()
+        if now >= target:
+            try:
+                page_ids = stager.publish(target)
+                print(f"🚀 {', '.join(page_ids)} を公開")
+                target = next_boundary(now)
+            except Exception as e:
+                print(f"❌ 公開失敗（{RETRY_INTERVAL} 後に再試行）: {type(e).__name__}: {e}")
+                stop.wait(RETRY_INTERVAL.total_seconds())
+            continue
+
+        if now >= target - lead and stager.needs_stage(target, now, restage):
+            try:
+                staged = stager.stage(target)
+                print(f"📦 {staged['title']} を準備（{len(staged['blocks'])} ブロック）")
+                if on_stage is not None:
+                    on_stage(stager)
+            except Exception as e:
+                print(f"⚠️ 準備失敗（公開時に取り直します）: {type(e).__name__}: {e}")
+
+        wake = target - lead if now < target - lead else min(target, now + restage)
+        stop.wait(max(0.0, (wake - clock()).total_seconds()))
+
+# =============================================================================
+# 確認用の出力（ファイル / localhost HTTP）
+# =============================================================================
+
+def write_stage_file(stager: WeekStager, path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stager.snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def serve_snapshot(stager: WeekStager, port: int) -> ThreadingHTTPServer:
+    """127.0.0.1:port の GET /staged で準備済みの内容を返す（別スレッドで待ち受け）"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") != "/staged":
+                self.send_error(404)
+                return
+            data = json.dumps(stager.snapshot(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="常駐して次週ページを前もって準備し、月曜 0:00 に作成する")
+    parser.add_argument("--lead-hours", type=float, default=STAGE_LEAD.total_seconds() / 3600,
+                        help="月曜 0:00 の何時間前から準備するか")
+    parser.add_argument("--restage-minutes", type=float, default=RESTAGE_INTERVAL.total_seconds() / 60,
+                        help="準備し直す間隔（分）")
+    parser.add_argument("--stage-file", default=None, help="準備した内容（JSON）を書き出すファイル")
+    parser.add_argument("--http-port", type=int, default=None, help="準備した内容を 127.0.0.1 の GET /staged で返す")
+    parser.add_argument(
+        "--database", default=None,
+        help="週次ページを作るデータベースID（既定: NOTION_WEEK_DATABASE_ID。未指定なら親ページ直下）",
+    )
+    parser.add_argument("--stage-only", action="store_true", help="次週分を1回準備して内容を出力し、終了する")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from daily_plan import init_client
+    from rate_limit import attach_scheduler
+
+    args = parse_args(argv)
+    notion, parent_id = init_client()
+    attach_scheduler(notion)
+    database_id = args.database or os.getenv("NOTION_WEEK_DATABASE_ID")
+    stager = WeekStager(
+        notion, parent_id,
+        cache_path=os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH),
+        database=WeekDatabase(notion, database_id) if database_id else None,
+    )
+
+    if args.stage_only:
+        stager.stage(next_boundary(datetime.now()))
+        if args.stage_file:
+            write_stage_file(stager, args.stage_file)
+        else:
+            json.dump(stager.snapshot(), sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        return 0
+
+    if args.http_port is not None:
+        serve_snapshot(stager, args.http_port)
+        print(f"🔎 http://127.0.0.1:{args.http_port}/staged")
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    print(f"⏳ 常駐開始（次の公開: {next_boundary(datetime.now()):%Y-%m-%d %H:%M}）")
+    run_daemon(
+        stager, stop,
+        lead=timedelta(hours=args.lead_hours),
+        restage=timedelta(minutes=args.restage_minutes),
+        on_stage=(lambda s: write_stage_file(s, args.stage_file)) if args.stage_file else None,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from parent_map import rich_text_content
+from tree_writer import map_in_context
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+TITLE_PROPERTY = "Name"
+DATE_PROPERTY = "Date"   # 週: 月曜〜日曜 / 月: 1日〜末日
+KEY_PROPERTY = "Key"     # 週: 2026-W29（ISO 週） / 月: 2026-07。年を含むので年をまたいでも一意
+KIND_PROPERTY = "Kind"
+KIND_WEEK = "week"
+KIND_MONTH = "month"
+
+MONTHLY_TOGGLE_TEXT = "月別"
+WEEK_TITLE = re.compile(r"^(\d{2})(\d{2})-\d{4}$")
+MONTH_TITLE = re.compile(r"^(\d{4})-(\d{2})$")
+ARCHIVE_TITLE = re.compile(r"^Archive (\d{4})$")  # 年別アーカイブページ（親ページ直下。week_retention の move で作る）
+MIGRATE_WORKERS = 4
+
+# =============================================================================
+# キー / プロパティ
+# =============================================================================
+
+def week_key(monday: datetime) -> str:
+    iso_year, iso_week, _ = monday.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+def month_key(day: datetime) -> str:
+    return day.strftime("%Y-%m")
+
+def archive_title(year: int) -> str:
+    return f"Archive {year}"
+
+def _month_range(day: datetime) -> Tuple[datetime, datetime]:
+    first = day.replace(day=1)
+    next_first = (first + timedelta(days=32)).replace(day=1)
+    return first, next_first - timedelta(days=1)
+
+def database_schema() -> Dict[str, Any]:
+    return {
+        TITLE_PROPERTY: {"title": {}},
+        DATE_PROPERTY: {"date": {}},
+        KEY_PROPERTY: {"rich_text": {}},
+        KIND_PROPERTY: {"select": {"options": [{"name": KIND_WEEK}, {"name": KIND_MONTH}]}},
+    }
+
+def _index_properties(kind: str, key: str, start: datetime, end: datetime) -> Dict[str, Any]:
+    return {
+        DATE_PROPERTY: {"date": {"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d")}},
+        KEY_PROPERTY: {"rich_text": [{"type": "text", "text": {"content": key}}]},
+        KIND_PROPERTY: {"select": {"name": kind}},
+    }
+
+def _title_property(title: str) -> Dict[str, Any]:
+    return {TITLE_PROPERTY: {"title": [{"type": "text", "text": {"content": title}}]}}
+
+def week_properties(title: str, monday: datetime) -> Dict[str, Any]:
+    return dict(_title_property(title), **_index_properties(KIND_WEEK, week_key(monday), monday, monday + timedelta(days=6)))
+
+def month_properties(title: str, day: datetime) -> Dict[str, Any]:
+    first, last = _month_range(day)
+    return dict(_title_property(title), **_index_properties(KIND_MONTH, month_key(day), first, last))
+
+# =============================================================================
+# 週次 / 月次ページのデータベース
+# =============================================================================
+
+class WeekDatabase:
+    """
+    週次・月次ページを入れるデータベース。検索は Kind + Key の絞り込み1回で済む（子ページの走査なし）。
+    API 2025-09-03 以降（notion-client 3.x）は data_sources.query、それより前は databases.query を使う。
+    """
+
+    def __init__(self, notion: Any, database_id: str) -> None:
+        self.notion = notion
+        self.database_id = database_id
+        self._data_source_id: Optional[str] = None
+
+    @property
+    def uses_data_sources(self) -> bool:
+        return hasattr(self.notion, "data_sources")
+
+    def data_source_id(self) -> str:
+        if self._data_source_id is None:
+            db = self.notion.databases.retrieve(database_id=self.database_id)
+            self._data_source_id = db["data_sources"][0]["id"]
+        return self._data_source_id
+
+    def parent(self) -> Dict[str, Any]:
+        """pages.create / pages.move の parent"""
+        if self.uses_data_sources:
+            return {"type": "data_source_id", "data_source_id": self.data_source_id()}
+        return {"type": "database_id", "database_id": self.database_id}
+
+    def query(self, **kwargs: Any) -> Dict[str, Any]:
+        if self.uses_data_sources:
+            return self.notion.data_sources.query(data_source_id=self.data_source_id(), **kwargs)
+        return self.notion.databases.query(database_id=self.database_id, **kwargs)
+
+    def query_all(self, filter_: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {"page_size": 100}
+        if filter_:
+            kwargs["filter"] = filter_
+        while True:
+            resp = self.query(**kwargs)
+            results.extend(resp.get("results", []))
+            if not resp.get("has_more"):
+                return results
+            kwargs["start_cursor"] = resp["next_cursor"]
+
+    def find(self, kind: str, key: str) -> Optional[str]:
+        """
+        Kind + Key が一致するページのID。同じキーのページが複数あっても毎回同じもの
+        （作成日時の最も古いもの。plan_migration が移すのもそれ）を返すよう並び順を指定する。
+        """
+        resp = self.query(
+            filter={"and": [
+                {"property": KIND_PROPERTY, "select": {"equals": kind}},
+                {"property": KEY_PROPERTY, "rich_text": {"equals": key}},
+            ]},
+            sorts=[{"timestamp": "created_time", "direction": "ascending"}],
+            page_size=1,
+        )
+        results = resp.get("results", [])
+        return results[0]["id"] if results else None
+
+    def find_week(self, monday: datetime) -> Optional[str]:
+        return self.find(KIND_WEEK, week_key(monday))
+
+    def find_month(self, day: datetime) -> Optional[str]:
+        return self.find(KIND_MONTH, month_key(day))
+
+def create_week_database(notion: Any, parent_page_id: str, title: str = "Weekly") -> str:
+    """parent_page_id 配下に週次・月次ページ用のデータベースを作る。戻り値: データベースID"""
+    resp = notion.databases.create(
+        parent={"type": "page_id", "page_id": parent_page_id},
+        title=[{"type": "text", "text": {"content": title}}],
+        initial_data_source={"properties": database_schema()},  # API 2025-09-03 以降
+        properties=database_schema(),                            # それより前
+    )
+    return resp["id"]
+
+# =============================================================================
+# 既存の子ページからの移行
+# =============================================================================
+
+def infer_week_monday(title: str, created_time: str) -> Optional[datetime]:
+    """
+    "0708-0714" 形式のタイトルと作成日時から週の月曜を推定する。
+    タイトルに年が無いため、作成日時に最も近い年の日付を採用する（先行作成・埋め戻しは前後の年になりうる）。
+    """
+    m = WEEK_TITLE.match(title)
+    if not m:
+        return None
+    created = datetime.strptime(created_time[:10], "%Y-%m-%d")
+    candidates = []
+    for year in (created.year - 1, created.year, created.year + 1):
+        try:
+            candidates.append(datetime(year, int(m.group(1)), int(m.group(2))))
+        except ValueError:  # 2/29 など
+            continue
+    if not candidates:
+        return None
+    return min(candidates, key=lambda d: abs(d - created))
+
+def _plain_text(items: List[Dict[str, Any]]) -> str:
+    return "".join(t.get("plain_text") or t.get("text", {}).get("content", "") for t in items)
+
+def _scan_database(database: WeekDatabase) -> Tuple[Dict[Tuple[str, str], str], List[Dict[str, Any]]]:
+    """
+    データベースの全ページから {(Kind, Key): ページID}（同じキーが複数あれば最古のもの）と、Key の無いページを返す。
+    Key の無いページは前回の移行で pages.move の後 pages.update の前に失敗したもの（または手で足したもの）。
+    """
+    keys: Dict[Tuple[str, str], str] = {}
+    unkeyed: List[Dict[str, Any]] = []
+    for page in sorted(database.query_all(), key=lambda p: p["created_time"]):
+        props = page.get("properties", {})
+        kind = (props.get(KIND_PROPERTY, {}).get("select") or {}).get("name")
+        key = _plain_text(props.get(KEY_PROPERTY, {}).get("rich_text", []))
+        if key:
+            keys.setdefault((kind, key), page["id"])
+        else:
+            unkeyed.append(page)
+    return keys, unkeyed
+
+def _page_title(page: Dict[str, Any]) -> str:
+    """ページオブジェクトのタイトル（移動前の "title" / データベースのタイトル列のどちらでも）"""
+    for prop in page.get("properties", {}).values():
+        if prop.get("type") == "title" or "title" in prop:
+            return _plain_text(prop.get("title", []))
+    return ""
+
+def _plan_item(page_id: str, title: str, created_time: str, moved: bool = False) -> Optional[Dict[str, Any]]:
+    """タイトルから週 / 月を判定して移行計画の1件を作る（どちらでもなければ None）"""
+    monday = infer_week_monday(title, created_time)
+    if monday is not None:
+        return {"page_id": page_id, "title": title, "kind": KIND_WEEK, "key": week_key(monday),
+                "created_time": created_time, "properties": week_properties(title, monday),
+                "moved": moved, "duplicate_of": None}
+    m = MONTH_TITLE.match(title)
+    if m:
+        day = datetime(int(m.group(1)), int(m.group(2)), 1)
+        return {"page_id": page_id, "title": title, "kind": KIND_MONTH, "key": month_key(day),
+                "created_time": created_time, "properties": month_properties(title, day),
+                "moved": moved, "duplicate_of": None}
+    return None
+
+def _mark_duplicates(
+    items: List[Dict[str, Any]], existing: Dict[Tuple[str, str], str]
+) -> List[Dict[str, Any]]:
+    """
+    同じ Kind + Key になるページ（タイトルに年が無い同名の週や、手で重複して作った週）は、
+    作成日時の最も古いものだけを移し、残りは duplicate_of に残す側のページIDを入れる（移さずに報告する）。
+    データベースに同じキーのページが既にあれば、候補はすべてそのページの重複になる。
+    """
+    kept = dict(existing)
+    for item in sorted(items, key=lambda i: i["created_time"]):
+        key = (item["kind"], item["key"])
+        if key in kept:
+            item["duplicate_of"] = kept[key]
+        else:
+            kept[key] = item["page_id"]
+    return items
+
+def plan_migration(
+    list_children: Callable[[str], List[Dict[str, Any]]],
+    parent_id: str,
+    database: WeekDatabase,
+) -> List[Dict[str, Any]]:
+    """
+    親ページ直下の週次ページと「月別」トグル内の月次ページから移行計画を作る。
+    移行済みのページは親ページの下に無いので、データベースに同じ Kind + Key があるページは重複として
+    duplicate_of を付ける（再実行しても二重に移さない）。同じキーの候補が複数あるときも最古の1件だけを移す。
+    移動だけ済んで Key の無いデータベース内のページも拾い、プロパティの設定からやり直す（moved=True）。
+    list_children は1ブロック分の子一覧を全件返す関数（daily_plan.paginate_children など）。
+    """
+    existing, unkeyed = _scan_database(database)
+    children = list_children(parent_id)
+
+    plan: List[Dict[str, Any]] = []
+    for page in unkeyed:
+        item = _plan_item(page["id"], _page_title(page), page["created_time"], moved=True)
+        if item is not None:
+            plan.append(item)
+    for block in children:
+        if block.get("type") != "child_page":
+            continue
+        item = _plan_item(block["id"], block["child_page"].get("title", ""), block["created_time"])
+        if item is None or item["kind"] != KIND_WEEK:
+            continue
+        plan.append(item)
+
+    toggle = next(
+        (b for b in children if b.get("type") == "toggle" and rich_text_content(b).strip() == MONTHLY_TOGGLE_TEXT),
+        None,
+    )
+    for block in list_children(toggle["id"]) if toggle and toggle.get("has_children") else []:
+        if block.get("type") != "child_page":
+            continue
+        item = _plan_item(block["id"], block["child_page"].get("title", ""), block["created_time"])
+        if item is None or item["kind"] != KIND_MONTH:
+            continue
+        plan.append(item)
+    return _mark_duplicates(plan, existing)
+
+def migrate_pages(
+    notion: Any,
+    database: WeekDatabase,
+    plan: List[Dict[str, Any]],
+    max_workers: int = MIGRATE_WORKERS,
+) -> List[Dict[str, Any]]:
+    """
+    計画の各ページをデータベースへ移し（pages.move）、Date / Key / Kind を設定する。
+    pages.move はプロパティを受け付けないため2回に分かれるが、移動後に失敗したページは
+    Key の無いページとして次回の plan_migration が拾い、設定だけやり直す（moved=True なら移動は飛ばす）。
+    重複（duplicate_of のあるもの）は移さない（戻り値にも含めない）。
+    ページ単位で並行実行し（レートはクライアントのスケジューラで制御）、失敗したページは error に理由を入れて返す。
+    """
+    parent = database.parent()
+
+    def migrate(item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if not item.get("moved"):
+                notion.pages.move(page_id=item["page_id"], parent=parent)
+            notion.pages.update(page_id=item["page_id"], properties=item["properties"])
+            return dict(item, error=None)
+        except Exception as e:
+            return dict(item, error=f"{type(e).__name__}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return map_in_context(pool, migrate, [item for item in plan if not item["duplicate_of"]])
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="週次・月次ページのデータベース（作成 / 子ページからの移行）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="親ページ配下にデータベースを作る")
+    create.add_argument("--title", default="Weekly")
+    migrate = sub.add_parser("migrate", help="親ページ直下の週次ページ・月別トグル内の月次ページをデータベースへ移す")
+    migrate.add_argument("--database", default=None, help="データベースID（既定: NOTION_WEEK_DATABASE_ID）")
+    migrate.add_argument("--workers", type=int, default=MIGRATE_WORKERS)
+    migrate.add_argument("--dry-run", action="store_true", help="移行計画を表示するだけで移さない")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from daily_plan import init_client, paginate_children
+    from http_pool import shared_pool
+    from rate_limit import attach_scheduler
+
+    args = parse_args(argv)
+    notion, parent_id = init_client()
+    scheduler = attach_scheduler(notion)
+
+    if args.command == "create":
+        database_id = create_week_database(notion, parent_id, args.title)
+        print(f"✅ データベース作成: {database_id}（NOTION_WEEK_DATABASE_ID に設定してください）")
+        return 0
+
+    database_id = args.database or os.getenv("NOTION_WEEK_DATABASE_ID")
+    if not database_id:
+        raise RuntimeError("--database または NOTION_WEEK_DATABASE_ID を指定してください。")
+    database = WeekDatabase(notion, database_id)
+    plan = plan_migration(lambda block_id: paginate_children(notion, block_id), parent_id, database)
+    duplicates = [item for item in plan if item["duplicate_of"]]
+    for item in plan:
+        if item["duplicate_of"]:
+            continue
+        note = "（移動済み・プロパティのみ設定）" if item["moved"] else ""
+        print(f"{'🔎' if args.dry_run else '📦'} {item['kind']:<5} {item['key']:<8} {item['title']}{note}")
+    for item in duplicates:
+        print(f"⚠️ {item['kind']:<5} {item['key']:<8} {item['title']} は {item['duplicate_of']} と同じキーのため移しません")
+    if args.dry_run:
+        print(f"移行対象 {len(plan) - len(duplicates)} 件 / 重複 {len(duplicates)} 件（dry-run のため移していません）")
+        return 0
+
+    results = migrate_pages(notion, database, plan, args.workers)
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        print(f"❌ {r['title']}: {r['error']}")
+    print(f"✅ 移行 {len(results) - len(failed)}/{len(results)} 件")
+    print(scheduler.summary())
+    print(shared_pool().summary())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from daily_plan import monday_of, page_gone
+from page_index import child_page_entries
+from parent_map import rich_text_content
+from tree_writer import map_in_context
+from week_database import ARCHIVE_TITLE, MONTHLY_TOGGLE_TEXT, archive_title, infer_week_monday
+
+# =============================================================================
+# 設定 / 定数
+# =============================================================================
+
+RETENTION_WEEKS = 12      # 今週からこの週数より前の週次ページを片付ける
+RETENTION_WORKERS = 4     # 同時に処理するページ数（実際のペースはクライアントのスケジューラで決まる）
+MODE_MOVE = "move"        # 年別アーカイブページの下へ移す（リンクはそのまま使える）
+MODE_TRASH = "trash"      # ゴミ箱へ移す（in_trash。リンクは切れるので消す）
+
+Block = Dict[str, Any]
+
+# =============================================================================
+# 計画（読み取りのみ）
+# =============================================================================
+
+def plan_retention(
+    list_children: Callable[[str], List[Block]],
+    parent_id: str,
+    today: datetime,
+    keep_weeks: int = RETENTION_WEEKS,
+) -> Dict[str, Any]:
+    """
+    親ページ直下を1回走査し、今週の月曜の keep_weeks 週前（cutoff）より前の週次ページを拾う。
+    週はタイトルと作成日時から推定し（infer_week_monday）、アーカイブ先の年は週の月曜の年。
+    既存の年別アーカイブページと「月別」トグルも同じ走査で見つける。
+    list_children は1ブロック分の子一覧を全件返す関数（daily_plan.paginate_children など）。
+    """
+    cutoff = monday_of(today).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(weeks=keep_weeks)
+    children = list_children(parent_id)
+
+    weeks: List[Dict[str, Any]] = []
+    archives: Dict[int, str] = {}
+    for block in children:
+        if block.get("type") != "child_page":
+            continue
+        title = block["child_page"].get("title", "")
+        m = ARCHIVE_TITLE.match(title)
+        if m:
+            archives[int(m.group(1))] = block["id"]
+            continue
+        monday = infer_week_monday(title, block["created_time"])
+        if monday is not None and monday < cutoff:
+            weeks.append({"page_id": block["id"], "title": title, "monday": monday, "year": monday.year})
+
+    toggle = next(
+        (b for b in children if b.get("type") == "toggle" and rich_text_content(b).strip() == MONTHLY_TOGGLE_TEXT),
+        None,
+    )
+    return {
+        "parent_id": parent_id,
+        "cutoff": cutoff,
+        "weeks": weeks,
+        "archives": archives,
+        "toggle_id": toggle["id"] if toggle and toggle.get("has_children") else None,
+        "children": children,
+    }
+
+def find_stale_links(
+    notion: Any,
+    list_children: Callable[[str], List[Block]],
+    plan: Dict[str, Any],
+    removed_ids: Set[str],
+    max_workers: int = RETENTION_WORKERS,
+) -> List[Dict[str, Any]]:
+    """
+    「月別」トグル内の月次ページにある link_to_page のうち、リンク先が無くなる / 無いものを返す。
+    リンク先が removed_ids（今回ゴミ箱へ移す週）なら古いリンク、
+    親ページ直下・年別アーカイブ内のページなら有効なリンクとして API は呼ばない。
+    どちらでもないリンク先（以前にゴミ箱へ移した週・手で貼ったページ等）は1件ずつ取得し、
+    ゴミ箱 / 削除済みのときだけ古いリンクとする。月次ページの一覧と確認は並行に行う。
+    """
+    if plan["toggle_id"] is None:
+        return []
+    months = [b for b in list_children(plan["toggle_id"]) if b.get("type") == "child_page"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        listed = map_in_context(pool, list_children, [m["id"] for m in months] + list(plan["archives"].values()))
+        known = {b["id"] for b in plan["children"] if b.get("type") == "child_page"}
+        for blocks in listed[len(months):]:
+            known.update(b["id"] for b in blocks if b.get("type") == "child_page")
+        known -= removed_ids
+
+        links: List[Dict[str, Any]] = []
+        for month, blocks in zip(months, listed):
+            for b in blocks:
+                target = (b.get("link_to_page") or {}).get("page_id") if b.get("type") == "link_to_page" else None
+                if target:
+                    links.append({"block_id": b["id"], "month": month["child_page"].get("title", ""), "target": target})
+
+        unknown = sorted({l["target"] for l in links if l["target"] not in known and l["target"] not in removed_ids})
+        gone = dict(zip(unknown, map_in_context(pool, lambda page_id: page_gone(notion, page_id), unknown)))
+    return [l for l in links if l["target"] in removed_ids or gone.get(l["target"], False)]
+
+# =============================================================================
+# 実行
+# =============================================================================
+
+def apply_retention(
+    notion: Any,
+    plan: Dict[str, Any],
+    stale_links: List[Dict[str, Any]],
+    mode: str = MODE_MOVE,
+    max_workers: int = RETENTION_WORKERS,
+) -> Dict[str, Any]:
+    """
+    計画の週次ページを片付け（move: 年別アーカイブページの下へ移す / trash: ゴミ箱へ移す）、
+    その後で古いリンクのブロックを消す。無い年別アーカイブページは先に親ページ直下へ作る。
+    ページ・リンクとも並行に実行し（レートはクライアントのスケジューラで制御）、失敗したものは error に理由を入れて返す。
+    片付けに失敗した週へのリンクは消さない。
+    戻り値: {"weeks": 週ごとの結果, "links": リンクごとの結果, "archives": {年: アーカイブページID}}
+    """
+    archives = dict(plan["archives"])
+    if mode == MODE_MOVE:
+        for year in sorted({w["year"] for w in plan["weeks"]} - set(archives)):
+            resp = notion.pages.create(
+                parent={"page_id": plan["parent_id"]},
+                properties={"title": [{"type": "text", "text": {"content": archive_title(year)}}]},
+            )
+            archives[year] = resp["id"]
+            print(f"📁 {archive_title(year)} を作成")
+
+    def archive(item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if mode == MODE_MOVE:
+                notion.pages.move(page_id=item["page_id"], parent={"page_id": archives[item["year"]]})
+            else:
+                notion.pages.update(page_id=item["page_id"], in_trash=True)
+            return dict(item, error=None)
+        except Exception as e:
+            return dict(item, error=f"{type(e).__name__}: {e}")
+
+    def unlink(item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            notion.blocks.delete(block_id=item["block_id"])
+            return dict(item, error=None)
+        except Exception as e:
+            return dict(item, error=f"{type(e).__name__}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        weeks = map_in_context(pool, archive, plan["weeks"])
+        failed = {w["page_id"] for w in weeks if w["error"]}
+        links = map_in_context(pool, unlink, [l for l in stale_links if l["target"] not in failed])
+    return {"weeks": weeks, "links": links, "archives": archives}
+
+def remaining_entries(plan: Dict[str, Any], result: Dict[str, Any]) -> List[Any]:
+    """片付け後の親ページ直下の (タイトル, ページID)（PageIndex を作り直すため。API は呼ばない）"""
+    moved = {w["page_id"] for w in result["weeks"] if not w["error"]}
+    entries = [(title, page_id) for title, page_id in child_page_entries(plan["children"]) if page_id not in moved]
+    known = {page_id for _, page_id in entries}
+    entries.extend((archive_title(y), pid) for y, pid in sorted(result["archives"].items()) if pid not in known)
+    return entries
+
+# =============================================================================
+# メインフロー
+# =============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="古い週次ページを片付け、月次ページの古いリンクを消す")
+    parser.add_argument("--keep-weeks", type=int, default=RETENTION_WEEKS,
+                        help=f"今週からこの週数より前の週次ページを片付ける（既定: {RETENTION_WEEKS}）")
+    parser.add_argument("--mode", choices=[MODE_MOVE, MODE_TRASH], default=MODE_MOVE,
+                        help="move: 年別アーカイブページ（Archive YYYY）の下へ移す / trash: ゴミ箱へ移す")
+    parser.add_argument(
+        "--date", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), default=None,
+        help="基準日 YYYY-MM-DD（既定: 今日）",
+    )
+    parser.add_argument("--workers", type=int, default=RETENTION_WORKERS, help="同時に処理するページ数")
+    parser.add_argument("--dry-run", action="store_true", help="片付ける内容を表示するだけで変更しない")
+    args = parser.parse_args(argv)
+    if args.keep_weeks < 1:  # 0 以下だと先週（負なら今週以降）のページまで片付けてしまう
+        parser.error("--keep-weeks は 1 以上を指定してください")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from block_cache import DEFAULT_CACHE_PATH
+    from daily_plan import init_client, paginate_children
+    from http_pool import shared_pool
+    from page_index import PageIndex
+    from rate_limit import attach_scheduler
+
+    args = parse_args(argv)
+    notion, parent_id = init_client()
+    scheduler = attach_scheduler(notion)
+    list_children = lambda block_id: paginate_children(notion, block_id)
+
+    plan = plan_retention(list_children, parent_id, args.date or datetime.today(), args.keep_weeks)
+    removed = {w["page_id"] for w in plan["weeks"]} if args.mode == MODE_TRASH else set()
+    stale = find_stale_links(notion, list_children, plan, removed, args.workers)
+
+    mark = "🔎" if args.dry_run else ("📦" if args.mode == MODE_MOVE else "🗑")
+    for w in plan["weeks"]:
+        dest = archive_title(w["year"]) if args.mode == MODE_MOVE else "ゴミ箱"
+        print(f"{mark} {w['monday']:%Y-%m-%d} {w['title']} → {dest}")
+    for l in stale:
+        print(f"{mark} {l['month']} のリンク → {l['target']}")
+    print(
+        f"cutoff {plan['cutoff']:%Y-%m-%d}: 週次ページ {len(plan['weeks'])} 件"
+        f"（親ページ直下 {len(plan['children'])} ブロック中）/ 古いリンク {len(stale)} 件"
+    )
+    if args.dry_run:
+        print("dry-run のため変更していません")
+        return 0
+
+    result = apply_retention(notion, plan, stale, args.mode, args.workers)
+    PageIndex(os.getenv("NOTION_CACHE_PATH", DEFAULT_CACHE_PATH)).replace(parent_id, remaining_entries(plan, result))
+    failed = [r for r in result["weeks"] + result["links"] if r["error"]]
+    for r in failed:
+        print(f"❌ {r.get('title') or r['block_id']}: {r['error']}")
+    print(
+        f"✅ 週次ページ {sum(1 for w in result['weeks'] if not w['error'])}/{len(result['weeks'])} 件"
+        f" / リンク削除 {sum(1 for l in result['links'] if not l['error'])}/{len(result['links'])} 件"
+    )
+    print(scheduler.summary())
+    print(shared_pool().summary())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from block_cache import DEFAULT_CACHE_PATH
+
+# =============================================================================
+# 書き込みジャーナル（途中失敗からの再開用）
+# =============================================================================
+
+def week_run_key(parent_id: str, monday: datetime) -> str:
+    """週次ページ作成のジャーナルキー（タイトルには年が無いので、週の月曜の日付で区別する）"""
+    return f"week:{parent_id}:{monday:%Y-%m-%d}"
+
+class WriteJournal:
+    """
+    作成したページIDと、そのページへの書き込みで完了したステップ（チャンク等）を記録する。
+    再実行時は作成済みページを使い回し、未完了のステップだけを実行する。
+    ステップは API が成功を返した直後に記録するため、記録前に落ちたステップは再送される。
+    記録はリクエストごとにあるので WAL + synchronous=NORMAL で書く（プロセスが落ちても記録は残り、
+    失われうるのは OS ごと落ちたときの直前の記録だけ。その分は再送になる）。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal_pages ("
+                " run_key TEXT PRIMARY KEY,"
+                " page_id TEXT NOT NULL,"
+                " completed INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal_steps ("
+                " target_id TEXT NOT NULL,"
+                " step TEXT NOT NULL,"
+                " PRIMARY KEY (target_id, step))"
+            )
+
+    # --- ページ ---
+    def page_id(self, run_key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_id FROM journal_pages WHERE run_key = ?", (run_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_page(self, run_key: str, page_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO journal_pages (run_key, page_id, completed) VALUES (?, ?, 0)",
+                (run_key, page_id),
+            )
+
+    def is_complete(self, run_key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT completed FROM journal_pages WHERE run_key = ?", (run_key,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def complete_page(self, page_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE journal_pages SET completed = 1 WHERE page_id = ?", (page_id,)
+            )
+
+    # --- ステップ（対象ブロック/ページ単位） ---
+    def is_done(self, target_id: str, step: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM journal_steps WHERE target_id = ? AND step = ?", (target_id, step)
+            ).fetchone()
+        return row is not None
+
+    def done_steps(self, target_id: str, prefix: str = "") -> List[str]:
+        """target_id の完了済みステップのうち prefix で始まるもの"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step FROM journal_steps WHERE target_id = ? AND substr(step, 1, ?) = ?",
+                (target_id, len(prefix), prefix),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def mark_done(self, target_id: str, step: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO journal_steps (target_id, step) VALUES (?, ?)",
+                (target_id, step),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()